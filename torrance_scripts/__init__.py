@@ -0,0 +1,2 @@
+# Scripts for the Torrance precinct map and the iOS CI pipelines. Run them as `python -m torrance_scripts <command>`,
+# see `cli.py`.
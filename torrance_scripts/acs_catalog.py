@@ -0,0 +1,80 @@
+import os
+
+from . import http_client
+
+# ACS data profile variable catalog.
+# ------------------
+# The group metadata (`groups/DP0x.json`) only changes between ACS releases, so each group is downloaded once and
+# kept in the HTTP cache (see `http_client.py`). Cached groups are used as is for `METADATA_MAX_AGE` seconds, then
+# revalidated with their ETag, and used as a fallback when the API is unreachable. The data of a release doesn't
+# change either, and callers cache it for `DATA_MAX_AGE` seconds.
+#
+# Every variable is classified by its suffix:
+#   - "estimate" (E) and "percent" (PE): actual values
+#   - "moe" (M, PM): margins of error
+#   - "annotation" (EA, MA, PEA, PMA): annotations of the above
+#   - "other": e.g. GEO_ID and NAME
+# Only estimates and percents are worth fetching, which is about a quarter of each group.
+# ------------------
+
+CENSUS_API_URL = os.environ.get("CENSUS_API_URL", "https://api.census.gov/data")
+METADATA_MAX_AGE = int(os.environ.get("ACS_METADATA_MAX_AGE", 7 * 24 * 60 * 60))
+DATA_MAX_AGE = int(os.environ.get("ACS_DATA_MAX_AGE", 30 * 24 * 60 * 60))
+
+GROUPS = ["DP02", "DP03", "DP04", "DP05"]
+VINTAGE = 2022
+DATASET = "acs/acs5/profile"
+VALUE_KINDS = ("estimate", "percent")
+
+def classify(code):
+    if code.endswith("A"):
+        return "annotation"
+    if code.endswith("PE"):
+        return "percent"
+    if code.endswith("M"):
+        return "moe"
+    if code.endswith("E") and "_" in code:
+        return "estimate"
+    return "other"
+
+def dataset_url(vintage=VINTAGE, dataset=DATASET):
+    return f"{CENSUS_API_URL}/{vintage}/{dataset}"
+
+def group_url(group, vintage=VINTAGE, dataset=DATASET):
+    return f"{dataset_url(vintage, dataset)}/groups/{group}.json"
+
+def group_variables(group, vintage=VINTAGE, dataset=DATASET):
+    """Returns the `variables` metadata of an ACS group, from the cache whenever it is still valid."""
+    response = http_client.get(group_url(group, vintage, dataset), ttl=METADATA_MAX_AGE, stale_if_error=True)
+    response.raise_for_status()
+    return response.json()["variables"]
+
+class Catalog:
+    """Variables of a set of ACS groups, with their labels and kinds."""
+
+    def __init__(self, groups=GROUPS, vintage=VINTAGE, dataset=DATASET):
+        self.vintage = vintage
+        self.dataset = dataset
+        self.labels = {}
+        self.kinds = {}
+        self.groups = {}
+
+        for group in groups:
+            for code, info in group_variables(group, vintage, dataset).items():
+                self.labels[code] = info.get("label", code)
+                self.kinds[code] = classify(code)
+                self.groups[code] = group
+
+        self.codes = {}
+        for code, label in self.labels.items():
+            self.codes.setdefault(label, code)
+
+    def label(self, code):
+        return self.labels.get(code)
+
+    def code(self, label):
+        return self.codes.get(label)
+
+    def variables(self, kinds=VALUE_KINDS):
+        """Returns {code: label} for the variables of `kinds`, sorted by code."""
+        return {code: self.labels[code] for code in sorted(self.labels) if self.kinds[code] in kinds}
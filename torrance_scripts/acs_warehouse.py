@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import argparse
+import os
+
+from . import acs_catalog
+from . import http_client
+
+# Local ACS warehouse for comparing vintages and geographies.
+# ------------------
+# A job is a (vintage, dataset, geography) triple, e.g. (2022, "acs/acs5/profile", "tract:06:037"). Geographies are
+# written as `level:state[:county]` and fetched for every unit of that level at once (`for=tract:*`), so a whole
+# county, or every place in a state for neighboring cities, takes one request per chunk of variables. All chunks of
+# all jobs are fetched concurrently.
+#
+# Results are stored in long form (dataset, geoid, variable, value) as Parquet files partitioned by vintage and
+# geography under `ACS_WAREHOUSE_DIR` (default `~/.cache/acs_warehouse`):
+#   acs/vintage=2022/geography=tract_06037/acs_acs5_profile.parquet
+#   variables/vintage=2022/acs_acs5_profile.parquet
+# Jobs already in the warehouse are skipped unless refreshed. `connect()` opens a DuckDB connection with `acs` and
+# `acs_variables` views over every partition, which is what cross-vintage queries such as `change_over_time` use.
+#
+# DuckDB (and pandas, for writing) are optional dependencies: `pip install duckdb pandas`.
+# ------------------
+
+WAREHOUSE_DIR = os.environ.get("ACS_WAREHOUSE_DIR", os.path.join(Path.home(), ".cache", "acs_warehouse"))
+CENSUS_API_KEY = os.environ.get("CENSUS_API_KEY")
+MAX_VARIABLES_PER_REQUEST = 49
+MAX_FETCH_WORKERS = 8
+
+# Values the Census API uses for missing or suppressed estimates.
+MISSING_VALUES = {-111111111, -222222222, -333333333, -555555555, -666666666, -888888888, -999999999}
+
+def _require_duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise ImportError("acs_warehouse requires duckdb: pip install duckdb pandas") from None
+    return duckdb
+
+def _sql_string(value):
+    # Views and COPY statements can't take prepared parameters, so paths are quoted as SQL string literals.
+    return "'" + str(value).replace("'", "''") + "'"
+
+def parse_geography(geography):
+    """Returns the API `for` / `in` parameters and partition name of a `level:state[:county]` geography."""
+    level, state, *county = geography.split(":")
+    params = {"for": f"{level}:*", "in": f"state:{state}"}
+    if county:
+        params["in"] += f" county:{county[0]}"
+    return params, f"{level}_{state}{''.join(county)}"
+
+def _dataset_slug(dataset):
+    return dataset.replace("/", "_")
+
+def partition_path(vintage, dataset, geography):
+    return os.path.join(WAREHOUSE_DIR, "acs", f"vintage={vintage}", f"geography={parse_geography(geography)[1]}", f"{_dataset_slug(dataset)}.parquet")
+
+def variables_path(vintage, dataset):
+    return os.path.join(WAREHOUSE_DIR, "variables", f"vintage={vintage}", f"{_dataset_slug(dataset)}.parquet")
+
+def _value(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number in MISSING_VALUES else number
+
+def _fetch_chunk(vintage, dataset, geography, codes, refresh=False):
+    params, _ = parse_geography(geography)
+    params = {"get": ",".join(codes), **params}
+    if CENSUS_API_KEY:
+        params["key"] = CENSUS_API_KEY
+
+    response = http_client.get(acs_catalog.dataset_url(vintage, dataset), params=params, ttl=acs_catalog.DATA_MAX_AGE, cache=not refresh)
+    response.raise_for_status()
+    headers, *rows = response.json()
+
+    # Every column after the requested variables is a geography component, which together make up the GEOID.
+    codes = set(codes)
+    geography_columns = [i for i, header in enumerate(headers) if header not in codes]
+    records = []
+    for row in rows:
+        geoid = "".join(row[i] for i in geography_columns)
+        records.extend((dataset, geoid, code, _value(row[i])) for i, code in enumerate(headers) if code in codes)
+    return records
+
+def _write_parquet(path, df):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    connection = _require_duckdb().connect()
+    connection.register("df", df)
+    connection.execute(f"COPY df TO {_sql_string(temp_path)} (FORMAT PARQUET, COMPRESSION ZSTD)")
+    connection.close()
+    os.replace(temp_path, path)
+
+def run_jobs(jobs, groups=acs_catalog.GROUPS, refresh=False):
+    """Fetches every (vintage, dataset, geography) job that isn't in the warehouse yet and stores it."""
+    import pandas as pd
+
+    jobs = [job for job in jobs if refresh or not os.path.exists(partition_path(*job))]
+    if not jobs:
+        print("All jobs are already in the warehouse.")
+        return
+
+    catalogs = {}
+    for vintage, dataset, geography in jobs:
+        if (vintage, dataset) not in catalogs:
+            catalogs[vintage, dataset] = acs_catalog.Catalog(groups, vintage, dataset)
+
+    for (vintage, dataset), catalog in catalogs.items():
+        variables = pd.DataFrame(
+            [(dataset, code, label, catalog.kinds[code], catalog.groups[code]) for code, label in catalog.labels.items()],
+            columns=["dataset", "variable", "label", "kind", "group"],
+        )
+        _write_parquet(variables_path(vintage, dataset), variables)
+
+    # One task per chunk of variables per job, all fetched concurrently.
+    tasks = []
+    for job in jobs:
+        codes = list(catalogs[job[0], job[1]].variables())
+        tasks.extend((job, codes[i:i + MAX_VARIABLES_PER_REQUEST]) for i in range(0, len(codes), MAX_VARIABLES_PER_REQUEST))
+    print(f"Fetching {len(jobs)} jobs in {len(tasks)} requests...")
+
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        results = list(executor.map(lambda task: _fetch_chunk(*task[0], task[1], refresh), tasks))
+
+    records = {}
+    for (job, codes), chunk_records in zip(tasks, results):
+        records.setdefault(job, []).extend(chunk_records)
+
+    for job, job_records in records.items():
+        _write_parquet(partition_path(*job), pd.DataFrame(job_records, columns=["dataset", "geoid", "variable", "value"]))
+        print(f"✅ Stored {len(job_records)} values for {job[0]} {job[1]} {job[2]}")
+
+def connect():
+    """Returns a DuckDB connection with `acs` and `acs_variables` views over the whole warehouse."""
+    connection = _require_duckdb().connect()
+    connection.execute(f"""
+        CREATE VIEW acs AS
+        SELECT * FROM read_parquet({_sql_string(os.path.join(WAREHOUSE_DIR, "acs", "*", "*", "*.parquet"))}, hive_partitioning = true)
+    """)
+    connection.execute(f"""
+        CREATE VIEW acs_variables AS
+        SELECT * FROM read_parquet({_sql_string(os.path.join(WAREHOUSE_DIR, "variables", "*", "*.parquet"))}, hive_partitioning = true)
+    """)
+    return connection
+
+def resolve_variable(connection, variable, vintage):
+    """
+    Returns the (dataset, variable code) `variable` stands for in `vintage`: the code itself, or the only variable with
+    that label. Raises a ValueError if there is none, or if the label is shared by several variables.
+    """
+    matches = connection.execute("""
+        SELECT DISTINCT dataset, variable FROM acs_variables
+        WHERE vintage = $vintage AND (variable = $variable OR label = $variable)
+        ORDER BY variable = $variable DESC, dataset, variable
+    """, {"variable": variable, "vintage": vintage}).fetchall()
+    if not matches:
+        raise ValueError(f"No variable {variable!r} in the {vintage} vintage")
+    # An exact code wins over labels that happen to equal it.
+    codes = [match for match in matches if match[1] == variable] or matches
+    if len(codes) > 1:
+        raise ValueError(f"{variable!r} is ambiguous in the {vintage} vintage, pass one of: {', '.join(code for dataset, code in codes)}")
+    return codes[0]
+
+def change_over_time(connection, variable, from_vintage, to_vintage, geography):
+    """
+    Returns a DataFrame of (geoid, from value, to value, change) for `variable` between two vintages of a geography.
+    Profile variable codes move between releases, so `variable` can also be a label, which is resolved to one code in
+    each vintage (see `resolve_variable`).
+    """
+    from_dataset, from_code = resolve_variable(connection, variable, from_vintage)
+    to_dataset, to_code = resolve_variable(connection, variable, to_vintage)
+    partition = parse_geography(geography)[1]
+    return connection.execute("""
+        SELECT
+            before.geoid,
+            before.value AS from_value,
+            after.value AS to_value,
+            after.value - before.value AS change
+        FROM acs AS before
+        JOIN acs AS after USING (geoid, geography)
+        WHERE before.geography = $geography
+          AND before.vintage = $from_vintage AND before.dataset = $from_dataset AND before.variable = $from_code
+          AND after.vintage = $to_vintage AND after.dataset = $to_dataset AND after.variable = $to_code
+        ORDER BY before.geoid
+    """, {
+        "from_vintage": from_vintage, "from_dataset": from_dataset, "from_code": from_code,
+        "to_vintage": to_vintage, "to_dataset": to_dataset, "to_code": to_code,
+        "geography": partition,
+    }).df()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetches ACS vintages and geographies into the local warehouse.")
+    parser.add_argument("--vintages", type=int, nargs="+", default=[acs_catalog.VINTAGE])
+    parser.add_argument("--dataset", default=acs_catalog.DATASET)
+    parser.add_argument("--geographies", nargs="+", default=["tract:06:037"], help="level:state[:county], e.g. tract:06:037 or place:06")
+    parser.add_argument("--groups", nargs="+", default=acs_catalog.GROUPS)
+    parser.add_argument("--refresh", action="store_true", help="Fetch jobs again even if they are in the warehouse")
+    args = parser.parse_args(argv)
+
+    run_jobs(
+        [(vintage, args.dataset, geography) for vintage in args.vintages for geography in args.geographies],
+        groups=args.groups,
+        refresh=args.refresh,
+    )
+
+if __name__ == "__main__":
+    main()
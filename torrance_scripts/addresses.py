@@ -0,0 +1,88 @@
+import re
+
+# Normalized address keys.
+# ------------------
+# The CAMS points (`streets.py`), the OpenAddresses points (`open_address.py`) and the AtoZ residents
+# (`getids_final.py`) spell addresses differently, so they are matched on a normalized key:
+#
+#   NUMBER STREET TYPE [#UNIT] ZIP      e.g. "21515 HAWTHORNE BLVD #4 90503"
+#
+# Everything is uppercased, punctuation becomes spaces and runs of whitespace collapse. Street types, directions
+# and unit designators are abbreviated the USPS way (AVENUE → AVE, WEST → W, "APT 4" → "#4"), and a leading
+# direction is dropped, since the CAMS export doesn't have one ("W 190TH ST" → "190TH ST"). Only the first five
+# digits of the ZIP code are kept. Addresses without a number or street have an empty key, which matches nothing.
+#
+# Every function takes and returns pandas Series. Numbers, streets, units and ZIP codes repeat a lot, so each
+# function does its string work once per unique value and maps the results back, instead of once per row.
+# ------------------
+
+STREET_ABBREVIATIONS = {
+    "ALLEY": "ALY", "AVENUE": "AVE", "AV": "AVE", "BOULEVARD": "BLVD", "CIRCLE": "CIR", "COURT": "CT",
+    "DRIVE": "DR", "EXPRESSWAY": "EXPY", "FREEWAY": "FWY", "HIGHWAY": "HWY", "LANE": "LN", "PARKWAY": "PKWY",
+    "PLACE": "PL", "PLAZA": "PLZ", "ROAD": "RD", "SQUARE": "SQ", "STREET": "ST", "TERRACE": "TER", "TRAIL": "TRL",
+    "WALK": "WALK", "WAY": "WAY",
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+}
+DIRECTIONS = ("N", "S", "E", "W")
+UNIT_DESIGNATORS = ("APT", "APARTMENT", "UNIT", "STE", "SUITE", "SPC", "SPACE", "NO")
+
+_WORD = re.compile(r"\b(" + "|".join(STREET_ABBREVIATIONS) + r")\b")
+# Only when a street name and type follow, so "E ST" keeps its E.
+_LEADING_DIRECTION = re.compile(r"^(?:" + "|".join(DIRECTIONS) + r") (?=\S+ \S)")
+_DESIGNATOR = r"(?:" + "|".join(UNIT_DESIGNATORS) + r")\b"
+# `number street [unit designator unit]`, e.g. "21515 Hawthorne Blvd. Apt 4" or "21515 Hawthorne Blvd #4".
+_ADDRESS = r"^(?P<number>\d+[A-Z]?(?:-\d+)?) (?P<street>.*?)(?:(?: " + _DESIGNATOR + r" ?#?| ?#) ?(?P<unit>[A-Z0-9-]+))?$"
+
+def _per_unique(values, function):
+    """Applies the Series → Series `function` to the unique values only."""
+    import pandas as pd
+
+    codes, uniques = values.fillna("").astype(str).factorize()
+    results = function(uniques.to_series()).to_numpy()
+    return pd.Series(results[codes], index=values.index)
+
+def _normalize(values):
+    return values.str.upper().str.replace(r"[\s.,;]+", " ", regex=True).str.strip()
+
+def normalize(values):
+    """Uppercases, replaces punctuation with spaces and collapses whitespace. Missing values become ""."""
+    return _per_unique(values, _normalize)
+
+def _street(name):
+    name = _WORD.sub(lambda match: STREET_ABBREVIATIONS[match.group(1)], name)
+    return _LEADING_DIRECTION.sub("", name)
+
+def street(values):
+    """Normalizes street names, with abbreviated types and directions and no leading direction."""
+    return _per_unique(values, lambda names: _normalize(names).map(_street))
+
+def _unit(values):
+    values = _normalize(values).str.replace(r"^(?:" + _DESIGNATOR + r" ?#?|#) ?", "", regex=True).str.replace(" ", "")
+    return ("#" + values).where(values != "", "")
+
+def unit(values):
+    """Normalizes units to "#UNIT", or "" without one."""
+    return _per_unique(values, _unit)
+
+def zip_code(values):
+    # ZIP codes read as numbers come back as "90501.0", and ZIP+4 codes as "90501-1234".
+    return _per_unique(values, lambda codes: _normalize(codes).str.extract(r"^(\d{5})", expand=False).fillna(""))
+
+def parse(addresses):
+    """Splits free text `number street [unit]` addresses into a DataFrame of number, street and unit."""
+    parts = normalize(addresses).str.extract(_ADDRESS)
+    return parts.fillna("")
+
+def key(number, street_name, unit_name, zip_codes):
+    """
+    Returns the normalized `NUMBER STREET TYPE [#UNIT] ZIP` keys. `street_name` includes the street type. With
+    `unit_name=None`, the keys are the building's, which units are matched to when they have no point of their own.
+    Addresses without a number or street, e.g. ones `parse` didn't match, get an empty key.
+    """
+    numbers = normalize(number)
+    streets = street(street_name)
+    # Units come with their separator, so keys without one don't need their whitespace collapsed again.
+    units = _per_unique(unit_name, lambda units: (_unit(units) + " ").str.lstrip()) if unit_name is not None else ""
+    keys = (numbers + " " + streets + " " + units + zip_code(zip_codes)).str.strip()
+    # Otherwise the key would be little more than the ZIP code, and match an arbitrary address in it.
+    return keys.where((numbers != "") & (streets != ""), "")
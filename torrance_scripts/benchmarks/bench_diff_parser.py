@@ -0,0 +1,88 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from torrance_scripts import diff_parser
+import fixtures
+
+# Benchmark for `diff_parser.py`.
+# ------------------
+# Generates a multi-file unified diff of roughly `--megabytes` MB, then times splitting it per file, numbering every
+# file's diff, and parsing it into hunks. The numbering is also timed with the previous line-list implementation from
+# mr_summary_bot.py for comparison.
+#
+# Usage: python benchmarks/bench_diff_parser.py [--megabytes 8] [--repeat 3]
+# ------------------
+
+# mr_summary_bot.py before `diff_parser`.
+def parse_diff_lines_robust(diff_string):
+    current_line_num_new = 0
+    
+    for line in diff_string.split('\n'):
+        if line.startswith('@@'):
+            try:
+                match = re.search(r'\+(\d+)(,\d+)?', line)
+                if match:
+                    current_line_num_new = int(match.group(1))
+                else:
+                    current_line_num_new = 0
+            except (ValueError, IndexError):
+                current_line_num_new = 0
+            yield (0, line, '@@')
+            continue
+        
+        if not current_line_num_new:
+            continue
+
+        line_type = line[0] if len(line) > 0 else ' '
+        content = line[1:] if len(line) > 0 else ''
+
+        if line_type == '-':
+            yield (0, content, '-')
+        elif line_type == '+':
+            yield (current_line_num_new, content, '+')
+            current_line_num_new += 1
+        else:
+            yield (current_line_num_new, content, ' ')
+            current_line_num_new += 1
+
+def baseline_number_diff(diff_string):
+    formatted_lines = []
+    for line_num, content, line_type in parse_diff_lines_robust(diff_string):
+        if line_type == '@@':
+            formatted_lines.append(content)
+        elif line_type == '-':
+            formatted_lines.append(f"   : -{content}")
+        elif line_type in ['+', ' ']:
+            formatted_lines.append(f"{str(line_num).ljust(3)}: {line_type}{content}")
+    return "\n".join(formatted_lines)
+
+def timed(name, function, repeat, size):
+    best = min(_time(function) for _ in range(repeat))
+    print(f"{name:<28} {best * 1000:9.1f} ms  {size / best / 1_000_000:8.1f} MB/s")
+    return best
+
+def _time(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    diff = fixtures.unified_diff(args.megabytes)
+    size = len(diff)
+    diffs = diff_parser.split_git_diff(diff.splitlines(True))
+    print(f"Generated {size / 1_000_000:.1f} MB diff of {len(diffs)} files")
+
+    timed("split_git_diff", lambda: diff_parser.split_git_diff(diff.splitlines(True)), args.repeat, size)
+    timed("number_diff", lambda: [diff_parser.number_diff(file_diff) for file_diff in diffs.values()], args.repeat, size)
+    timed("number_diff (baseline)", lambda: [baseline_number_diff(file_diff) for file_diff in diffs.values()], args.repeat, size)
+    timed("iter_hunks", lambda: [list(diff_parser.iter_hunks(file_diff)) for file_diff in diffs.values()], args.repeat, size)
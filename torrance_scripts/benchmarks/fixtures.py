@@ -0,0 +1,493 @@
+import csv
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from torrance_scripts import diff_parser
+
+# Synthetic inputs for the benchmarks.
+# ------------------
+# Every generator is deterministic for a given size and seed, so timings from different commits are comparable.
+# The data only has to be realistic in shape and volume, not in content:
+#   - OpenAddresses dumps: gzipped GeoJSON lines, `torrance_share` of them in Torrance, plus a few malformed lines
+#   - CAMS address points and the Torrance boundary, served page by page by the ArcGIS stub
+#   - precinct polygons on a grid over Torrance (and beyond, as the county file does), with the overlay CSV
+#   - ACS group metadata and values, served by the Census stub, and full ACS overlays for `sort.py`
+#   - canvass CSVs for `walk_withQR_maps.py`
+#   - the address CSVs `streets.py` and `open_address.py` write, and AtoZ residents at those addresses, for
+#     `resident_join.py`
+#   - AtoZ search result pages
+#   - Swift repos for the metrics scripts, and merge requests on top of them for `mr_summary_bot.py`
+#   - unified diffs for `diff_parser.py`
+# ------------------
+
+# Torrance, roughly, and the grid the precincts, tracts and address points are laid out on.
+TORRANCE_BOUNDS = (-118.38, 33.79, -118.31, 33.88)
+COUNTY_BOUNDS = (-118.45, 33.72, -118.24, 33.95)
+PRECINCT_COLUMNS = 20
+TRACT_SIZE = 0.01
+ZIP_CODES = ["90501", "90502", "90503", "90504", "90505"]
+STREET_NAMES = [
+    "Torrance", "Crenshaw", "Hawthorne", "Sepulveda", "Del Amo", "Carson", "Madrona", "Anza", "Prairie", "Arlington",
+    "Maple", "Cabrillo", "Border", "Gramercy", "Western", "Van Ness", "Emerald", "Spencer", "Lomita", "Plaza Del Amo",
+]
+STREET_TYPES = ["AVE", "BLVD", "ST", "WAY", "DR", "LN", "PL"]
+OTHER_CITIES = ["Los Angeles", "Carson", "Gardena", "Redondo Beach", "Lomita", "Long Beach"]
+ACS_GROUPS = ["DP02", "DP03", "DP04", "DP05"]
+
+# Labels `sort.py` looks for, so its filter keeps some columns.
+RENT_BURDEN_LABELS = [
+    "Estimate!!GROSS RENT AS A PERCENTAGE OF HOUSEHOLD INCOME (GRAPI)!!35.0 percent or more",
+    "Percent!!GROSS RENT AS A PERCENTAGE OF HOUSEHOLD INCOME (GRAPI)!!Renters paying 30 percent or more of income",
+    "Estimate!!GROSS RENT!!Median gross rent (dollars)",
+    "Estimate!!SELECTED MONTHLY OWNER COSTS AS A PERCENTAGE OF HOUSEHOLD INCOME (SMOCAPI)!!35.0 percent or more",
+]
+
+def _point(rng, bounds):
+    west, south, east, north = bounds
+    return round(rng.uniform(west, east), 6), round(rng.uniform(south, north), 6)
+
+def _street(rng):
+    return rng.choice(STREET_NAMES), rng.choice(STREET_TYPES)
+
+# OpenAddresses
+def openaddresses_dump(path, features, torrance_share=0.1, seed=0):
+    """Writes a gzipped GeoJSON lines dump of `features` address points, as `open_address.py` reads it."""
+    rng = random.Random(seed)
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=1) as f:
+        for i in range(features):
+            if i % 5000 == 4999:
+                f.write('{"type": "Feature", "properties": {\n')
+                continue
+            torrance = rng.random() < torrance_share
+            lon, lat = _point(rng, TORRANCE_BOUNDS if torrance else COUNTY_BOUNDS)
+            name, street_type = _street(rng)
+            number = str(rng.randint(1, 25000))
+            unit = f"{rng.randint(1, 300)}" if rng.random() < 0.2 else ""
+            city = "TORRANCE" if torrance else rng.choice(OTHER_CITIES)
+            postcode = rng.choice(ZIP_CODES)
+            feature = {
+                "type": "Feature",
+                "properties": {
+                    "hash": f"{i:016x}",
+                    "number": number,
+                    "street": f"{name} {street_type}",
+                    "unit": unit,
+                    "city": city,
+                    "district": "",
+                    "region": "CA",
+                    "postcode": postcode,
+                    "id": "",
+                    "full": f"{number} {name} {street_type}{' #' + unit if unit else ''}, {city}, CA {postcode}",
+                },
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            }
+            f.write(json.dumps(feature) + "\n")
+    return path
+
+# CAMS
+def cams_features(count, inside_share=0.6, seed=0):
+    """Returns `count` CAMS address point features, `inside_share` of them within the Torrance boundary."""
+    rng = random.Random(seed)
+    features = []
+    for i in range(count):
+        lon, lat = _point(rng, TORRANCE_BOUNDS if rng.random() < inside_share else COUNTY_BOUNDS)
+        name, street_type = _street(rng)
+        features.append({
+            "type": "Feature",
+            "id": i + 1,
+            "properties": {
+                "OBJECTID": i + 1,
+                # Some addresses are listed more than once, which `streets.py` deduplicates.
+                "Number": rng.randint(1, 25000) if rng.random() > 0.05 else 100,
+                "StreetName": name.upper(),
+                "PostType": street_type,
+                "UnitName": str(rng.randint(1, 300)) if rng.random() < 0.2 else None,
+                "ZipCode": int(rng.choice(ZIP_CODES)),
+            },
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        })
+    return features
+
+def _rectangle(west, south, east, north):
+    return {"type": "Polygon", "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]]}
+
+def torrance_boundary():
+    return {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": {"NAME": "Torrance"}, "geometry": _rectangle(*TORRANCE_BOUNDS)}],
+    }
+
+# Precincts
+def precinct_id(i):
+    return f"TORR{i:04d}"
+
+def precinct_polygons(count, outside=None):
+    """
+    Returns a FeatureCollection of `count` precincts tiling Torrance in a grid, plus `outside` precincts (by default as
+    many again) elsewhere in the county, like the county file `scrape.py` filters.
+    """
+    outside = count if outside is None else outside
+    west, south, east, north = TORRANCE_BOUNDS
+    rows = -(-count // PRECINCT_COLUMNS)
+    width, height = (east - west) / PRECINCT_COLUMNS, (north - south) / rows
+
+    features = []
+    for i in range(count):
+        row, column = divmod(i, PRECINCT_COLUMNS)
+        cell = (west + column * width, south + row * height, west + (column + 1) * width, south + (row + 1) * height)
+        features.append({"type": "Feature", "properties": {"PRECINCT": precinct_id(i)}, "geometry": _rectangle(*cell)})
+
+    # Precincts outside the city are laid out west of it.
+    for i in range(outside):
+        row, column = divmod(i, PRECINCT_COLUMNS)
+        cell = (COUNTY_BOUNDS[0] + column * 0.003, south + row * 0.003, COUNTY_BOUNDS[0] + (column + 1) * 0.003, south + (row + 1) * 0.003)
+        features.append({"type": "Feature", "properties": {"PRECINCT": f"LA{i:05d}"}, "geometry": _rectangle(*cell)})
+
+    return {"type": "FeatureCollection", "features": features}
+
+def write_precinct_files(directory, count):
+    """Writes the county precinct GeoJSON and the Torrance overlay CSV that `scrape.py` reads."""
+    with open(os.path.join(directory, "RegistrarRecorder_Precincts-simple.geojson"), "w") as f:
+        json.dump(precinct_polygons(count), f)
+    with open(os.path.join(directory, "Torrance_Precincts_Overlay.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Precinct_ID"])
+        writer.writerows([precinct_id(i)] for i in range(count))
+
+# Census
+def tract_geoid(lon, lat):
+    """The tract of a point, as the FCC stub resolves it: one tract per `TRACT_SIZE` degree cell."""
+    column = int((lon - COUNTY_BOUNDS[0]) / TRACT_SIZE)
+    row = int((lat - COUNTY_BOUNDS[1]) / TRACT_SIZE)
+    return f"06037{6000 + row * 100 + column:04d}00"
+
+def county_tracts():
+    west, south, east, north = COUNTY_BOUNDS
+    return sorted({
+        tract_geoid(west + (column + 0.5) * TRACT_SIZE, south + (row + 0.5) * TRACT_SIZE)
+        for column in range(int((east - west) / TRACT_SIZE))
+        for row in range(int((north - south) / TRACT_SIZE))
+    })
+
+def acs_groups(items_per_group=150):
+    """
+    Returns {group: variables metadata} shaped like the API's `groups/DP0x.json`. Every item has an estimate, a
+    percent and their margins of error and annotations, so estimates and percents are a quarter of the variables.
+    """
+    groups = {}
+    for g, group in enumerate(ACS_GROUPS):
+        variables = {
+            "GEO_ID": {"label": "Geography", "predicateOnly": True},
+            "NAME": {"label": "Geographic Area Name"},
+        }
+        for item in range(1, items_per_group + 1):
+            code = f"{group}_{item:04d}"
+            topic = f"{group} TOPIC {item // 10}!!Item {item}"
+            if group == "DP04" and item <= len(RENT_BURDEN_LABELS):
+                topic = RENT_BURDEN_LABELS[item - 1].split("!!", 1)[1]
+            for suffix, prefix in (("E", "Estimate"), ("PE", "Percent"), ("M", "Margin of Error"), ("PM", "Percent Margin of Error")):
+                variables[f"{code}{suffix}"] = {"label": f"{prefix}!!{topic}", "group": group}
+                variables[f"{code}{suffix}A"] = {"label": f"Annotation of {prefix}!!{topic}", "group": group}
+        groups[group] = {"variables": variables}
+    return groups
+
+def acs_value(code, geoid):
+    """A stable pseudo-random value for a variable of a tract."""
+    value = zlib.crc32(f"{code}|{geoid}".encode()) % 100000
+    return f"{value / 1000:.1f}" if "PE" in code else str(value)
+
+def acs_overlay(precincts, items_per_group=150):
+    """Returns a full ACS overlay in the shape `scrape.py` writes, for `precincts` precincts."""
+    labels = {
+        code: info["label"]
+        for group in acs_groups(items_per_group).values()
+        for code, info in group["variables"].items()
+        if code.endswith(("E", "PE")) and "_" in code
+    }
+    tracts = county_tracts()
+    overlay = []
+    for i in range(precincts):
+        tract = tracts[i % len(tracts)]
+        overlay.append({
+            "Precinct_ID": precinct_id(i),
+            "Census_Tract": tract,
+            "ACS_2022": {label: acs_value(code, tract) for code, label in labels.items()},
+        })
+    return overlay
+
+# Canvassing
+def canvass_csv(path, rows, seed=0):
+    """Writes a `torrance_canvass_map.csv` of `rows` addresses on a few streets per ZIP code."""
+    rng = random.Random(seed)
+    streets = [_street(rng) for _ in range(max(rows // 25, 2))]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["full_label", "lat", "lon"])
+        for _ in range(rows):
+            name, street_type = rng.choice(streets)
+            lon, lat = _point(rng, TORRANCE_BOUNDS)
+            writer.writerow([f"{rng.randint(1, 25000)} {name} {street_type}, Torrance, CA {rng.choice(ZIP_CODES)}", lat, lon])
+    return path
+
+# Residents
+def address_csvs(directory, count, seed=0):
+    """
+    Writes the CAMS and OpenAddresses CSVs `streets.py` and `open_address.py` write, `count` addresses each, and
+    returns the CAMS features.
+    """
+    features = cams_features(count, inside_share=1, seed=seed)
+    with open(os.path.join(directory, "torrance_knockable_addresses.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["HOUSE_NUM", "STREET_NAME", "STREET_TYPE", "UNIT_NUM", "ZIP_CODE", "geometry", "addr_key"])
+        for feature in features:
+            properties, (lon, lat) = feature["properties"], feature["geometry"]["coordinates"]
+            writer.writerow([
+                properties["Number"], properties["StreetName"], properties["PostType"], properties["UnitName"] or "",
+                properties["ZipCode"], f"POINT ({lon} {lat})", "",
+            ])
+
+    rng = random.Random(seed + 1)
+    with open(os.path.join(directory, "torrance_addresses.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["number", "street", "unit", "city", "postcode", "full_address", "lat", "lon"])
+        for _ in range(count):
+            name, street_type = _street(rng)
+            lon, lat = _point(rng, TORRANCE_BOUNDS)
+            writer.writerow([rng.randint(1, 25000), f"{name} {street_type}", "", "TORRANCE", rng.choice(ZIP_CODES), "", lat, lon])
+    return features
+
+STREET_TYPE_NAMES = {"AVE": "Avenue", "BLVD": "Boulevard", "ST": "Street", "DR": "Drive", "LN": "Lane", "PL": "Place"}
+
+def residents_csv(path, rows, features, unknown_share=0.1, seed=0):
+    """
+    Writes a `getids_final.py` residents CSV of `rows` residents living at the CAMS `features`, with their addresses
+    spelled the way AtoZ does, plus `unknown_share` of them at addresses without a point.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["record_id", "first_name", "last_name", "address", "city_state", "zip", "phone"])
+        for record_id in range(1, rows + 1):
+            properties = rng.choice(features)["properties"]
+            street_type = properties["PostType"]
+            if rng.random() < 0.5:
+                street_type = STREET_TYPE_NAMES.get(street_type, street_type)
+            unit = properties["UnitName"] or (str(rng.randint(1, 20)) if rng.random() < 0.1 else "")
+            address = f"{properties['Number']} {properties['StreetName'].title()} {street_type}{f' Apt {unit}' if unit else ''}"
+            if rng.random() < unknown_share:
+                address = f"{rng.randint(1, 25000)} Unknown Rd"
+            writer.writerow([
+                record_id, f"First{record_id}", f"Last{record_id}", address, "Torrance, CA", properties["ZipCode"],
+                f"(310) 555-{rng.randint(0, 9999):04d}",
+            ])
+    return path
+
+# AtoZ
+def atoz_result_page(page, rows=50, pages=100, seed=0):
+    """Returns the HTML of an AtoZ search result page, with the elements the AtoZ scripts look for."""
+    rng = random.Random(seed * 100003 + page)
+    result_rows = []
+    for i in range(rows):
+        name, street_type = _street(rng)
+        record_id = (page - 1) * rows + i + 1
+        result_rows.append(
+            f'<tr class="search-result-stripe{i % 2 + 1}">'
+            f'<td><input type="checkbox" name="checkbox" value="{record_id}"></td>'
+            f'<td>First{record_id}</td><td>Last{record_id}</td>'
+            f'<td>{rng.randint(1, 25000)} {name} {street_type}</td><td>Torrance, CA</td>'
+            f'<td>{rng.choice(ZIP_CODES)}</td><td>(310) 555-{rng.randint(0, 9999):04d}</td></tr>'
+        )
+    next_class = "ui-icon-seek-next" if page < pages else "ui-icon-seek-next ui-state-disabled"
+    return f"""<html><body>
+<input type="text" name="paginationuppertextbox" value="{page}">
+<input type="checkbox" id="checkall">
+<table id="searchResults"><tbody>
+{"".join(result_rows)}
+</tbody></table>
+<a id="next_button_upper" href="?page={page + 1}"><span id="span_next_button_upper" class="{next_class}"></span></a>
+</body></html>"""
+
+# Swift
+def _swift_code_file(rng, events, components, type_name):
+    lines = ["import SwiftUI", "import Telemetry", "import DesignSystem", "", f"/// {type_name} screen.", f"struct {type_name}: View {{"]
+    lines.append("    @State private var isLoading = false")
+    lines.append("")
+    lines.append("    var body: some View {")
+    lines.append("        VStack {")
+    for component in rng.sample(components, min(len(components), rng.randint(1, 6))):
+        lines.append(f'            {component}(title: "{type_name}") // {component}(ignored in comments)')
+    lines.append("        }")
+    lines.append("        .onAppear {")
+    for domain, event in rng.sample(events, min(len(events), rng.randint(0, 4))):
+        lines.append(f"            Telemetry.shared.track({event})")
+    lines.append("        }")
+    lines.append("    }")
+    for i in range(rng.randint(2, 15)):
+        lines.append("")
+        lines.append(f"    // Handles step {i}.")
+        lines.append(f"    func step{i}(value: Int) -> String {{")
+        for _ in range(rng.randint(3, 25)):
+            lines.append(f'        let label = "value \\(value) of {type_name}" /* inline */')
+        lines.append("        return label")
+        lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def _swift_test_file(rng, type_name):
+    lines = ["import XCTest", "import Testing", "", f"final class {type_name}Tests: XCTestCase {{"]
+    for i in range(rng.randint(2, 12)):
+        lines.append(f"    func test_step{i}() {{\n        XCTAssertEqual(1, 1)\n    }}\n")
+    lines.append("}")
+    lines.append("")
+    lines.append(f"struct {type_name}SwiftTests {{")
+    for i in range(rng.randint(0, 5)):
+        lines.append(f"    @Test(arguments: [1, 2, 3])\n    func parameterized{i}(value: Int) {{\n        #expect(value > 0)\n    }}\n")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def _git(root, *args):
+    command = ["git", "-c", "user.name=Benchmarks", "-c", "user.email=benchmarks@example.com", "-c", "commit.gpgsign=false", *args]
+    return subprocess.run(command, cwd=root, check=True, capture_output=True, text=True).stdout.strip()
+
+def swift_repo(root, files, seed=0):
+    """
+    Writes a git repo of about `files` .swift files laid out like the iOS project: telemetry event declarations,
+    design system components, feature packages with tests, and the directories the metrics scripts exclude.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    packages = [f"Feature{i}" for i in range(max(files // 100, 2))]
+
+    events = []
+    events_directory = root / "Packages/Telemetry/Sources/Telemetry/Service/Events"
+    events_directory.mkdir(parents=True)
+    for d in range(max(files // 100, 2)):
+        domain = f"Domain{d}"
+        names = [f"{domain.lower()}Event{i}" for i in range(20)]
+        declarations = "\n".join(f'    public static let {name} = Event(name: "{name}")' for name in names)
+        (events_directory / f"Events+{domain}.swift").write_text(f"public extension Events {{\n{declarations}\n}}\n")
+        events.extend((domain, name) for name in names)
+
+    components = [f"DSComponent{i}" for i in range(max(files // 50, 4))]
+    design_system_directory = root / "Packages/DesignSystem/Sources/DesignSystem"
+    design_system_directory.mkdir(parents=True)
+    for component in components:
+        (design_system_directory / f"{component}.swift").write_text(
+            f"public struct {component}: View {{\n    let title: String\n\n    public var body: some View {{\n        Text(title)\n    }}\n}}\n"
+        )
+
+    playbook_directory = root / "Maven/_CORE/_UTILITIES/_PLAYBOOK"
+    playbook_directory.mkdir(parents=True)
+    (playbook_directory / "Playbook.swift").write_text(_swift_code_file(rng, events, components, "Playbook"))
+    (root / "BuildTools").mkdir()
+    (root / "BuildTools/Generated.swift").write_text(_swift_code_file(rng, events, components, "Generated"))
+
+    code_files = files - len(components) - len(events) // 20 - 2
+    for i in range(max(code_files, 1)):
+        package = packages[i % len(packages)]
+        type_name = f"{package}Screen{i}"
+        if i % 4 == 3:
+            directory = root / "Packages" / package / "Tests" / f"{package}Tests"
+            content = _swift_test_file(rng, type_name)
+            type_name += "Tests"
+        elif i % 4 == 2:
+            directory = root / "Maven" / package
+            content = _swift_code_file(rng, events, components, type_name)
+        else:
+            directory = root / "Packages" / package / "Sources" / package
+            content = _swift_code_file(rng, events, components, type_name)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{type_name}.swift").write_text(content)
+
+    _git(root, "init", "-q")
+    _git(root, "add", "-A")
+    _git(root, "commit", "-q", "-m", "Initial commit")
+    return _git(root, "rev-parse", "HEAD")
+
+def swift_merge_request(root, changed_files, seed=0):
+    """
+    Commits a change to `changed_files` files of a `swift_repo` (edits, plus a few additions and deletions) and
+    returns (merge request, changes) in the shape of GitLab's merge request and `/changes` responses.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    base_sha = _git(root, "rev-parse", "HEAD")
+    files = sorted(path for path in _git(root, "ls-files", "*.swift").splitlines() if "/Sources/Feature" in path)
+    selected = rng.sample(files, min(changed_files, len(files)))
+
+    changes = []
+    for i, path in enumerate(selected):
+        file = root / path
+        if i % 10 == 9:
+            file.unlink()
+            changes.append({"old_path": path, "new_path": path, "new_file": False, "deleted_file": True, "renamed_file": False})
+            continue
+
+        lines = file.read_text().splitlines(True)
+        for _ in range(rng.randint(1, 8)):
+            at = rng.randrange(len(lines))
+            if rng.random() < 0.3 and len(lines) > 10:
+                del lines[at:at + rng.randint(1, 3)]
+            else:
+                lines[at:at] = [f"        // Changed in the merge request ({rng.randint(0, 10 ** 6)})\n"] * rng.randint(1, 4)
+        file.write_text("".join(lines))
+        changes.append({"old_path": path, "new_path": path, "new_file": False, "deleted_file": False, "renamed_file": False})
+
+    for i in range(max(changed_files // 10, 1)):
+        path = f"Packages/Feature0/Sources/Feature0/AddedScreen{i}.swift"
+        (root / path).write_text(_swift_code_file(rng, [("Domain0", "domain0Event0")], ["DSComponent0"], f"AddedScreen{i}"))
+        changes.append({"old_path": path, "new_path": path, "new_file": True, "deleted_file": False, "renamed_file": False})
+
+    _git(root, "add", "-A")
+    _git(root, "commit", "-q", "-m", "Merge request changes")
+    head_sha = _git(root, "rev-parse", "HEAD")
+
+    diffs = diff_parser.split_git_diff(_git(root, "diff", "--no-renames", base_sha, head_sha).splitlines(True))
+    for change in changes:
+        change["diff"] = diffs.get(change["new_path"], "")
+
+    merge_request = {
+        "iid": 1,
+        "title": f"Update {len(changes)} screens",
+        "description": "Refactors the feature screens and adds new ones.",
+        "diff_refs": {"base_sha": base_sha, "start_sha": base_sha, "head_sha": head_sha},
+    }
+    return merge_request, changes
+
+# Diffs
+def unified_diff(megabytes, seed=0):
+    """Returns a multi-file unified diff of roughly `megabytes` MB, as `git diff` prints it."""
+    rng = random.Random(seed)
+    words = ["let", "var", "func", "return", "self", "view", "model", "state", "value", "guard", "else", "{", "}"]
+    parts = []
+    size = 0
+    file_index = 0
+
+    while size < megabytes * 1_000_000:
+        path = f"Sources/Module{file_index % 40}/File{file_index}.swift"
+        lines = [f"diff --git a/{path} b/{path}\n", f"--- a/{path}\n", f"+++ b/{path}\n"]
+        line_num = 1
+        for _ in range(rng.randint(1, 12)):
+            line_num += rng.randint(5, 200)
+            body = []
+            for _ in range(rng.randint(5, 60)):
+                code = " ".join(rng.choice(words) for _ in range(rng.randint(2, 12)))
+                body.append(rng.choice(" ++-") + "    " + code + "\n")
+            old_count = sum(line[0] != "+" for line in body)
+            new_count = sum(line[0] != "-" for line in body)
+            lines.append(f"@@ -{line_num},{old_count} +{line_num},{new_count} @@ func example{line_num}()\n")
+            lines.extend(body)
+        chunk = "".join(lines)
+        parts.append(chunk)
+        size += len(chunk)
+        file_index += 1
+
+    return "".join(parts)
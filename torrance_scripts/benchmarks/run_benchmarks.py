@@ -0,0 +1,300 @@
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fixtures
+from stub_servers import StubServer
+
+# Benchmarks for the pipeline scripts, without any live services.
+# ------------------
+# Each benchmark generates its inputs at a given size in a fresh temporary directory (see `fixtures.py`), points the
+# command at the local stub services (see `stub_servers.py`) through their environment variables, and times
+# `python -m torrance_scripts <command>` as a subprocess in that directory. Caches (`HOME` included) live in the directory too, so every run starts
+# cold; with `--warm` the script is run a second time in the same directory, to time it with its caches.
+#
+# Every run records its wall time, CPU time and max RSS, the requests each stub served, and the stage timings of
+# the script's run report if it writes one (see `instrumentation.py`). Results are appended to a JSON lines history
+# at `BENCHMARK_HISTORY` (default `~/.cache/torrance_benchmarks/history.jsonl`) with the commit they ran on, and
+# compared with the previous result for the same benchmark, size and latency on the same host.
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py [--only scrape streets] [--sizes small medium large] [--repeat 3]
+#   python benchmarks/run_benchmarks.py --compare      # compares the last two results without running anything
+# ------------------
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(PACKAGE_DIR)
+HISTORY_PATH = os.environ.get("BENCHMARK_HISTORY", os.path.join(Path.home(), ".cache", "torrance_benchmarks", "history.jsonl"))
+SIZES = ["small", "medium", "large"]
+LOG_TAIL_LINES = 20
+
+# `sizes` maps each size to the scale passed to `setup(workdir, scale, server)`, which writes the inputs and returns
+# the command's arguments and environment variables.
+Benchmark = namedtuple("Benchmark", ["command", "sizes", "setup"])
+
+def setup_open_address(workdir, scale, server):
+    fixtures.openaddresses_dump(os.path.join(workdir, "source.geojson.gz"), scale)
+    return [], {}
+
+def setup_streets(workdir, scale, server):
+    server.cams_features = fixtures.cams_features(scale)
+    return [], {}
+
+def setup_scrape(workdir, scale, server):
+    fixtures.write_precinct_files(workdir, scale)
+    return [], {}
+
+def setup_sort(workdir, scale, server):
+    with open(os.path.join(workdir, "Precinct_ACS_FullOverlay.json"), "w") as f:
+        json.dump(fixtures.acs_overlay(scale), f, indent=2)
+    return [], {}
+
+def setup_walk_lists(workdir, scale, server):
+    fixtures.canvass_csv(os.path.join(workdir, "torrance_canvass_map.csv"), scale)
+    return [], {}
+
+def setup_resident_join(workdir, scale, server):
+    fixtures.write_precinct_files(workdir, 200)
+    features = fixtures.address_csvs(workdir, scale // 2)
+    fixtures.residents_csv(os.path.join(workdir, "torrance_residents_data.csv"), scale, features)
+    return [], {}
+
+def setup_swift_project(workdir, scale, server):
+    project_directory = os.path.join(workdir, "project")
+    fixtures.swift_repo(project_directory, scale)
+    return [], {"BITRISE_SOURCE_DIR": project_directory}
+
+def setup_mr_summary(workdir, scale, server):
+    project_directory = os.path.join(workdir, "project")
+    fixtures.swift_repo(project_directory, max(scale * 4, 400))
+    server.repo = project_directory
+    server.merge_request, server.changes = fixtures.swift_merge_request(project_directory, scale)
+    return [], {
+        "CI_PROJECT_DIR": project_directory,
+        "CI_MERGE_REQUEST_PROJECT_ID": "1",
+        "CI_MERGE_REQUEST_IID": "1",
+        "GITLAB_TOKEN": "benchmark",
+        "GEMINI_API_KEY_QA1": "benchmark",
+    }
+
+BENCHMARKS = {
+    "open_address": Benchmark("open_address", {"small": 20_000, "medium": 200_000, "large": 1_000_000}, setup_open_address),
+    "streets": Benchmark("streets", {"small": 5_000, "medium": 20_000, "large": 80_000}, setup_streets),
+    "scrape": Benchmark("scrape", {"small": 10, "medium": 40, "large": 120}, setup_scrape),
+    "sort": Benchmark("sort", {"small": 100, "medium": 400, "large": 1_000}, setup_sort),
+    "resident_join": Benchmark("resident_join", {"small": 20_000, "medium": 200_000, "large": 1_000_000}, setup_resident_join),
+    "walk_withQR_maps": Benchmark("walk_withQR_maps", {"small": 500, "medium": 2_000, "large": 8_000}, setup_walk_lists),
+    "log_project_metrics": Benchmark("log_project_metrics", {"small": 200, "medium": 1_000, "large": 4_000}, setup_swift_project),
+    "upload_design_analytics": Benchmark("upload_design_analytics", {"small": 200, "medium": 1_000, "large": 4_000}, setup_swift_project),
+    "mr_summary_bot": Benchmark("mr_summary_bot", {"small": 10, "medium": 40, "large": 150}, setup_mr_summary),
+}
+
+def common_env(workdir, server):
+    return {
+        **server.env(),
+        "HOME": workdir,
+        "RUN_REPORT_DIR": os.path.join(workdir, "run_reports"),
+        "HTTP_CACHE_DIR": os.path.join(workdir, ".cache", "torrance_http"),
+        "METRICS_CACHE_DIR": os.path.join(workdir, ".cache", "ci_metrics"),
+        "MR_SUMMARY_CACHE_DIR": os.path.join(workdir, ".cache", "mr_summaries"),
+        "DATADOG_API_KEY": "benchmark",
+        # Spool replays happen inline, so the submission is part of the timing.
+        "DATADOG_SPOOL_MODE": "sync",
+        "PYTHONDONTWRITEBYTECODE": "1",
+        "PYTHONPATH": REPO_DIR,
+    }
+
+def run_command(command, args, workdir, env, log_path):
+    """Runs a torrance_scripts command to completion and returns (exit code, seconds, CPU seconds, max RSS in MB)."""
+    with open(log_path, "a") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-m", "torrance_scripts", command, *args], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        # `wait4` reports the resource usage of this child alone.
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    max_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return process.returncode, seconds, usage.ru_utime + usage.ru_stime, round(max_rss_mb, 1)
+
+def latest_report(workdir):
+    reports = sorted(glob.glob(os.path.join(workdir, "run_reports", "*.json")), key=os.path.getmtime)
+    if not reports:
+        return None
+    with open(reports[-1]) as f:
+        return json.load(f)
+
+def run_benchmark(name, size, server, warm=False, keep=False):
+    benchmark = BENCHMARKS[name]
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_{size}_")
+    log_path = os.path.join(workdir, "benchmark.log")
+    try:
+        args, env = benchmark.setup(workdir, benchmark.sizes[size], server)
+        env = {**os.environ, **common_env(workdir, server), **env}
+        server.reset()
+
+        code, seconds, cpu_seconds, max_rss_mb = run_command(benchmark.command, args, workdir, env, log_path)
+        result = {
+            "status": "ok" if code == 0 else f"exit {code}",
+            "seconds": seconds,
+            "cpu_seconds": cpu_seconds,
+            "max_rss_mb": max_rss_mb,
+            "requests": dict(server.requests),
+            "submitted": dict(server.submitted),
+            "report": latest_report(workdir),
+        }
+
+        if warm and code == 0:
+            code, result["warm_seconds"], _, _ = run_command(benchmark.command, args, workdir, env, log_path)
+            if code:
+                result["status"] = f"warm exit {code}"
+
+        if result["status"] != "ok":
+            with open(log_path) as f:
+                result["log_tail"] = f.readlines()[-LOG_TAIL_LINES:]
+        return result
+    finally:
+        if keep:
+            print(f"   Kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_DIR, check=True, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], cwd=PACKAGE_DIR, check=True, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+def summarize(name, size, runs, latency_ms):
+    commit, dirty = git_commit()
+    ok_runs = [run for run in runs if run["status"] == "ok"]
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "benchmark": name,
+        "size": size,
+        "scale": BENCHMARKS[name].sizes[size],
+        "latency_ms": latency_ms,
+        "status": "ok" if len(ok_runs) == len(runs) else runs[-1]["status"],
+        "seconds": [round(run["seconds"], 3) for run in runs],
+    }
+    if not ok_runs:
+        record["log_tail"] = runs[-1].get("log_tail", [])
+        return record
+
+    best = min(ok_runs, key=lambda run: run["seconds"])
+    record.update({
+        "best": round(best["seconds"], 3),
+        "median": round(statistics.median(run["seconds"] for run in ok_runs), 3),
+        "cpu_seconds": round(best["cpu_seconds"], 3),
+        "max_rss_mb": max(run["max_rss_mb"] for run in ok_runs),
+        "requests": best["requests"],
+        "submitted": best["submitted"],
+    })
+    warm_runs = [run["warm_seconds"] for run in ok_runs if "warm_seconds" in run]
+    if warm_runs:
+        record["warm_best"] = round(min(warm_runs), 3)
+    if best["report"]:
+        record["stages"] = {stage: values["seconds"] for stage, values in best["report"]["stages"].items()}
+    return record
+
+def load_history(path=HISTORY_PATH):
+    try:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+def append_history(records, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in records))
+
+def previous_record(history, record):
+    """Returns the latest successful result in `history` comparable to `record`, if any."""
+    for previous in reversed(history):
+        if (
+            previous is not record
+            and previous.get("status") == "ok"
+            and all(previous.get(key) == record.get(key) for key in ("benchmark", "size", "latency_ms", "host"))
+        ):
+            return previous
+    return None
+
+def format_record(record, previous):
+    label = f"{record['benchmark']} [{record['size']}]"
+    if record["status"] != "ok":
+        return f"{label:<38} {record['status']}"
+
+    line = f"{label:<38} {record['best']:8.2f} s  (median {record['median']:.2f} s, {record['max_rss_mb']:.0f} MB)"
+    if "warm_best" in record:
+        line += f"  warm {record['warm_best']:.2f} s"
+    if previous:
+        change = (record["best"] - previous["best"]) / previous["best"] * 100
+        line += f"  {change:+6.1f}% vs {previous['commit']}{'+' if previous.get('dirty') else ''}"
+    return line
+
+def compare_last(history):
+    """Prints the latest result of every benchmark and size against the one before it."""
+    latest = {}
+    for record in history:
+        latest[record["benchmark"], record["size"], record.get("latency_ms")] = record
+    for record in latest.values():
+        earlier = history[:history.index(record)]
+        print(format_record(record, previous_record(earlier, record)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the pipeline scripts on synthetic data against local stub services.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every stub response")
+    parser.add_argument("--warm", action="store_true", help="Also time a second run with the caches of the first")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directories for inspection")
+    parser.add_argument("--no-save", action="store_true", help="Don't append the results to the history")
+    parser.add_argument("--compare", action="store_true", help="Compare the last two results in the history and exit")
+    args = parser.parse_args()
+
+    history = load_history()
+    if args.compare:
+        compare_last(history)
+        sys.exit()
+
+    server = StubServer(latency_ms=args.latency_ms).start()
+    records = []
+    try:
+        for name in args.only:
+            for size in args.sizes:
+                runs = []
+                for _ in range(args.repeat):
+                    runs.append(run_benchmark(name, size, server, warm=args.warm, keep=args.keep))
+                    if runs[-1]["status"] != "ok":
+                        break
+                record = summarize(name, size, runs, args.latency_ms)
+                records.append(record)
+                print(format_record(record, previous_record(history, record)))
+                for line in record.get("log_tail", []):
+                    print(f"   | {line.rstrip()}")
+    finally:
+        server.stop()
+
+    if not args.no_save:
+        append_history(records)
+        print(f"Results appended to {HISTORY_PATH}")
+    sys.exit(any(record["status"] != "ok" for record in records))
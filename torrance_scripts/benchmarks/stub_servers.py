@@ -0,0 +1,293 @@
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import argparse
+import gzip
+import json
+import re
+import subprocess
+import threading
+import time
+
+import fixtures
+
+# Local stand-ins for the services the scripts call.
+# ------------------
+# A single threaded HTTP server answers for every service under its own path prefix, so a benchmark only has to
+# point each script's base URL at it:
+#   - /census/{vintage}/{dataset}[/groups/{group}.json]   Census API data and group metadata (with ETags)
+#   - /fcc/census/block/find                              FCC block lookup, tracts from `fixtures.tract_geoid`
+#   - /arcgis/query, /arcgis/boundary.geojson             CAMS address points in pages, and the Torrance boundary
+#   - /gitlab/api/v4/projects/...                         merge request, changes, notes and raw files of `repo`
+#   - /gemini/{version}/models/{model}:generateContent    Gemini, summarizing every `### File:` in the prompt
+#   - /datadog/api/...                                    metric, log and event intake, counting what was submitted
+#   - /atoz/results?page=N                                AtoZ search result pages
+#
+# The data served comes from the `StubServer` attributes, which benchmarks set up per run. `latency_ms` delays every
+# response, to make round trips cost what they do against the real services. Connections are kept alive, so pooled
+# clients behave as they would in production.
+# ------------------
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency_ms=0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency_ms / 1000
+        self.lock = threading.Lock()
+        self.acs_groups = fixtures.acs_groups()
+        self.tracts = fixtures.county_tracts()
+        self.cams_features = []
+        self.boundary = fixtures.torrance_boundary()
+        self.repo = None
+        self.merge_request = None
+        self.changes = []
+        self.atoz_pages = 100
+        # Datadog intake requests still to be answered with a 503, to exercise the client's retries.
+        self.datadog_failures = 0
+        # Status every Datadog intake request is answered with instead, e.g. 403 for a bad API key.
+        self.datadog_status = None
+        # Metric names Datadog rejects with a 400, failing the whole payload they are in.
+        self.datadog_rejected_metrics = set()
+        self.reset()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self):
+        """Clears the request counts and what was submitted, e.g. between benchmark runs."""
+        with self.lock:
+            self.requests = Counter()
+            self.submitted = Counter()
+            self.notes = []
+            # (path, Content-Encoding, uncompressed body size, item count) of every accepted Datadog intake request.
+            self.datadog_requests = []
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def env(self):
+        """The environment variables pointing every script at this server."""
+        return {
+            "CENSUS_API_URL": f"{self.url}/census",
+            "FCC_API_URL": f"{self.url}/fcc",
+            "CAMS_REST_URL": f"{self.url}/arcgis/query",
+            "TORRANCE_BOUNDARY_URL": f"{self.url}/arcgis/boundary.geojson",
+            "CI_API_V4_URL": f"{self.url}/gitlab/api/v4",
+            "GEMINI_BASE_URL": f"{self.url}/gemini/",
+            "DATADOG_HOST": f"{self.url}/datadog",
+        }
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which on a keep-alive connection would wait for the client's delayed
+    # ACK (~40 ms) without TCP_NODELAY, as real servers set it.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle("HEAD")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        service, _, path = url.path.lstrip("/").partition("/")
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        with self.server.lock:
+            self.server.requests[service] += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        handler = getattr(self, f"_{service}", None)
+        try:
+            status, payload, headers = handler(method, path, query, body) if handler else (404, {"error": "Unknown service"}, {})
+        except Exception as e:
+            status, payload, headers = 500, {"error": repr(e)}, {}
+        self._respond(status, payload, headers, head_only=method == "HEAD")
+
+    def _respond(self, status, payload, headers, head_only=False):
+        if isinstance(payload, (bytes, str)):
+            data = payload.encode() if isinstance(payload, str) else payload
+            content_type = "text/html; charset=utf-8" if isinstance(payload, str) else "application/octet-stream"
+        else:
+            data = json.dumps(payload).encode()
+            content_type = "application/json"
+
+        self.send_response(status)
+        self.send_header("Content-Type", headers.pop("Content-Type", content_type))
+        self.send_header("Content-Length", str(len(data) if status != 304 else 0))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head_only and status != 304:
+            self.wfile.write(data)
+
+    # Census
+    def _census(self, method, path, query, body):
+        parts = path.split("/")
+        if "groups" in parts:
+            group = parts[-1].removesuffix(".json")
+            if group not in self.server.acs_groups:
+                return 404, {"error": f"Unknown group {group}"}, {}
+            etag = f'"{group}-{len(self.server.acs_groups[group]["variables"])}"'
+            if self.headers.get("If-None-Match") == etag:
+                return 304, b"", {"ETag": etag}
+            return 200, self.server.acs_groups[group], {"ETag": etag}
+
+        codes = query["get"].split(",")
+        level, tract = query["for"].split(":")
+        tracts = self.server.tracts if tract == "*" else [f"06037{tract}"]
+        rows = [codes + ["state", "county", "tract"]]
+        rows.extend([fixtures.acs_value(code, geoid) for code in codes] + [geoid[:2], geoid[2:5], geoid[5:]] for geoid in tracts)
+        return 200, rows, {}
+
+    # FCC
+    def _fcc(self, method, path, query, body):
+        geoid = fixtures.tract_geoid(float(query["longitude"]), float(query["latitude"]))
+        return 200, {"Block": {"FIPS": f"{geoid}1001"}, "County": {"FIPS": geoid[:5]}, "State": {"FIPS": geoid[:2]}, "status": "OK"}, {}
+
+    # ArcGIS
+    def _arcgis(self, method, path, query, body):
+        if path == "boundary.geojson":
+            return 200, self.server.boundary, {"Content-Type": "application/geo+json"}
+
+        offset = int(query.get("resultOffset", 0))
+        count = int(query.get("resultRecordCount", 2000))
+        features = self.server.cams_features[offset:offset + count]
+        return 200, {"type": "FeatureCollection", "features": features}, {"Content-Type": "application/geo+json"}
+
+    # GitLab
+    def _gitlab(self, method, path, query, body):
+        match = re.match(r"api/v4/projects/[^/]+/(merge_requests/\d+|repository/files/([^/]+)/raw)(.*)", path)
+        if not match:
+            return 404, {"message": "404 Not Found"}, {}
+
+        if match.group(2):
+            return self._git_file(unquote(match.group(2)), query.get("ref"))
+
+        rest = match.group(3)
+        if rest == "":
+            return 200, self.server.merge_request, {}
+        if rest == "/changes":
+            return 200, {**self.server.merge_request, "changes": self.server.changes}, {}
+        if rest.startswith("/notes"):
+            return self._notes(method, rest, query, body)
+        return 404, {"message": "404 Not Found"}, {}
+
+    def _git_file(self, file_path, ref):
+        result = subprocess.run(["git", "show", f"{ref}:{file_path}"], cwd=self.server.repo, capture_output=True)
+        if result.returncode:
+            return 404, {"message": "404 File Not Found"}, {}
+        return 200, result.stdout, {"Content-Type": "text/plain; charset=utf-8"}
+
+    def _notes(self, method, rest, query, body):
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            fields = json.loads(body or b"{}")
+        else:
+            fields = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+        with self.server.lock:
+            notes = self.server.notes
+            if method == "POST":
+                note = {"id": len(notes) + 1, "body": fields.get("body", ""), "position": None}
+                notes.append(note)
+                return 201, note, {}
+            if method == "PUT":
+                note = next((note for note in notes if f"/notes/{note['id']}" == rest), None)
+                if note is None:
+                    return 404, {"message": "404 Not found"}, {}
+                note["body"] = fields.get("body", note["body"])
+                return 200, note, {}
+
+            per_page = int(query.get("per_page", 20))
+            page = int(query.get("page", 1))
+            headers = {"X-Next-Page": str(page + 1) if page * per_page < len(notes) else ""}
+            return 200, notes[(page - 1) * per_page:page * per_page], headers
+
+    # Gemini
+    def _gemini(self, method, path, query, body):
+        request = json.loads(body or b"{}")
+        prompt = "\n".join(part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", []))
+        paths = re.findall(r"^### File: (.+)$", prompt, re.M)
+        if paths:
+            text = "\n".join(f"#### {path}\n- Updated the screen's steps.\n- Adjusted comments." for path in paths)
+        else:
+            text = "1. **Overall Summary**\nUpdates the feature screens.\n\n2. **Notable Patterns / Improvements**\n- Consistent step handling."
+
+        with self.server.lock:
+            self.server.submitted["gemini_prompt_chars"] += len(prompt)
+        return 200, {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4},
+        }, {}
+
+    # Datadog
+    def _datadog(self, method, path, query, body):
+        with self.server.lock:
+            if self.server.datadog_failures:
+                self.server.datadog_failures -= 1
+                return 503, {"errors": ["Service unavailable"]}, {}
+            if self.server.datadog_status:
+                return self.server.datadog_status, {"errors": ["Rejected by the stub"]}, {}
+
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        payload = json.loads(body or b"null")
+
+        with self.server.lock:
+            items = 1
+            if path.endswith("/series"):
+                if any(series["metric"] in self.server.datadog_rejected_metrics for series in payload["series"]):
+                    return 400, {"errors": ["Invalid metric"]}, {}
+                items = len(payload["series"])
+                self.server.submitted["metric_series"] += items
+            elif path.endswith("/logs"):
+                items = len(payload) if isinstance(payload, list) else 1
+                self.server.submitted["log_items"] += items
+            elif path.endswith("/events"):
+                self.server.submitted["events"] += 1
+            self.server.datadog_requests.append((path, encoding, len(body), items))
+        return 202, {"errors": []} if path.endswith("/series") else {}, {}
+
+    # AtoZ
+    def _atoz(self, method, path, query, body):
+        page = int(query.get("page", 1))
+        if page > self.server.atoz_pages:
+            return 404, "<html><body>No results</body></html>", {}
+        return 200, fixtures.atoz_result_page(page, pages=self.server.atoz_pages), {}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the stub services on a local port, e.g. to run a script against them by hand.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--cams-points", type=int, default=20000, help="CAMS address points served by the ArcGIS stub")
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency_ms)
+    server.cams_features = fixtures.cams_features(args.cams_points)
+    for name, value in server.env().items():
+        print(f"export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,152 @@
+import argparse
+import csv
+import json
+import os
+import re
+
+from . import acs_catalog
+from . import census_geo
+from . import http_client
+
+# Slim per-precinct ACS dataset for the map.
+# ------------------
+# The map only reads the variables listed in `config.js` (`METRICS_CONFIG`, `CENSUS_DATA_CHUNKS` and
+# `BASE_CENSUS_VARS`), around 30 labels, while `scrape.py` exports every DP02–DP05 variable. This build step reads
+# those labels from `config.js`, maps them to variable codes with `acs_variable_labels.csv`, and writes a compact
+# [{Precinct_ID, Census_Tract, ACS_2022: {label: value}}] file in the same shape as the full overlay, so
+# `DATA_URLS.fullData` can point at it directly.
+#
+# The values come from either:
+#   - an existing full overlay written by `scrape.py` (`--overlay Precinct_ACS_FullOverlay.json`), without any
+#     requests; `--full-sidecar` then also writes the full overlay as compact JSON
+#   - the Census API, fetching only the metric variables for every tract of the county in a single request per
+#     40 variables, for the precincts in `data/precinct_tracts.csv` (or `--tracts tract_cache.json`)
+# ------------------
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(ROOT_DIR, "config.js")
+LABELS_PATH = os.path.join(ROOT_DIR, "acs_variable_labels.csv")
+OUTPUT_PATH = "Precinct_ACS_Metrics.json"
+
+ACS_URL = acs_catalog.dataset_url()
+CENSUS_API_KEY = os.environ.get("CENSUS_API_KEY")
+STATE_FIPS = "06"
+COUNTY_FIPS = "037"
+MAX_VARIABLES_PER_REQUEST = 40
+
+JS_STRING = r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\""
+
+def _js_strings(text):
+    return [single if single else double for single, double in re.findall(JS_STRING, text)]
+
+def metric_labels(config_path=CONFIG_PATH):
+    """Returns every ACS label referenced by the map config, in order of first use."""
+    with open(config_path) as f:
+        config = f.read()
+
+    labels = []
+    for match in re.finditer(rf"\bvar:\s*(?:{JS_STRING})", config):
+        labels.extend(_js_strings(match.group(0)))
+    for match in re.finditer(r"\b(?:vars:|BASE_CENSUS_VARS\s*=)\s*\[([^\]]*)\]", config):
+        labels.extend(_js_strings(match.group(1)))
+
+    return list(dict.fromkeys(label.replace("\\'", "'") for label in labels))
+
+def label_codes(labels, labels_path=LABELS_PATH):
+    """Returns {label: variable code} for `labels`, and the labels without a variable."""
+    wanted = set(labels)
+    codes = {}
+    with open(labels_path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["Label"] in wanted:
+                codes.setdefault(row["Label"], row["Variable"])
+
+    return {label: codes[label] for label in labels if label in codes}, [label for label in labels if label not in codes]
+
+def project_overlay(overlay_path, labels):
+    with open(overlay_path) as f:
+        overlay = json.load(f)
+
+    rows = [
+        {
+            "Precinct_ID": entry["Precinct_ID"],
+            "Census_Tract": entry["Census_Tract"],
+            "ACS_2022": {label: entry["ACS_2022"][label] for label in labels if label in entry.get("ACS_2022", {})},
+        }
+        for entry in overlay
+    ]
+    return rows, overlay
+
+def fetch_tract_values(codes):
+    """Returns {tract GEOID: {variable code: value}} for every tract in the county."""
+    values = {}
+    codes = list(codes)
+    for start in range(0, len(codes), MAX_VARIABLES_PER_REQUEST):
+        chunk = codes[start:start + MAX_VARIABLES_PER_REQUEST]
+        params = {
+            "get": ",".join(chunk),
+            "for": "tract:*",
+            "in": f"state:{STATE_FIPS} county:{COUNTY_FIPS}",
+        }
+        if CENSUS_API_KEY:
+            params["key"] = CENSUS_API_KEY
+
+        print(f"📊 Fetching {len(chunk)} ACS variables for all tracts in {STATE_FIPS}{COUNTY_FIPS}...")
+        response = http_client.get(ACS_URL, params=params, ttl=acs_catalog.DATA_MAX_AGE)
+        response.raise_for_status()
+        headers, *rows = response.json()
+        for row in rows:
+            record = dict(zip(headers, row))
+            geoid = record["state"] + record["county"] + record["tract"]
+            values.setdefault(geoid, {}).update({code: record[code] for code in chunk})
+
+    return values
+
+def fetch_rows(precinct_tracts, codes_by_label):
+    tract_values = fetch_tract_values(codes_by_label.values())
+    rows = []
+    for precinct_id, tract in precinct_tracts.items():
+        if tract not in tract_values:
+            print(f"No ACS data for tract {tract} of precinct {precinct_id}")
+            continue
+        values = tract_values[tract]
+        rows.append({
+            "Precinct_ID": precinct_id,
+            "Census_Tract": tract,
+            "ACS_2022": {label: values[code] for label, code in codes_by_label.items()},
+        })
+    return rows
+
+def write_compact_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    print(f"Saved {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds the per-precinct ACS dataset with only the variables the map uses.")
+    parser.add_argument("--overlay", help="Full overlay JSON written by scrape.py to project, instead of fetching")
+    parser.add_argument("--tracts", default=census_geo.PRECINCT_TRACTS_PATH, help="Precinct → tract CSV or tract_cache.json")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--full-sidecar", help="Also write the full overlay as compact JSON to this path (requires --overlay)")
+    args = parser.parse_args(argv)
+
+    labels = metric_labels()
+    codes_by_label, unknown_labels = label_codes(labels)
+    print(f"🧮 {len(labels)} metric labels in config.js, {len(codes_by_label)} matched to ACS variables.")
+    for label in unknown_labels:
+        print(f" - No ACS variable for label: {label}")
+
+    if args.overlay:
+        rows, overlay = project_overlay(args.overlay, labels)
+        if args.full_sidecar:
+            write_compact_json(args.full_sidecar, overlay)
+    else:
+        if args.full_sidecar:
+            parser.error("--full-sidecar requires --overlay")
+        rows = fetch_rows(census_geo.load_precinct_tracts(args.tracts), codes_by_label)
+
+    write_compact_json(args.output, rows)
+    print(f"✅ {len(rows)} precincts with {len(labels)} metric variables.")
+
+if __name__ == "__main__":
+    main()
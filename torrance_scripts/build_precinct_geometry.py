@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import os
+
+# Compact precinct geometry for the map.
+# ------------------
+# Builds the precinct layer the map loads instead of the full county GeoJSON:
+#   1. Precincts are filtered with an STR-tree spatial index against the city boundary (and, optionally, the
+#      precinct IDs in `Torrance_Precincts_Overlay.csv`), instead of scanning every county precinct in Python.
+#   2. The ACS metric values (`build_metric_dataset.py` output) are joined into each precinct's properties, so the
+#      map doesn't need a second request and join at load time.
+#   3. The precincts are simplified once per zoom level in `ZOOM_TOLERANCES` and written as quantized TopoJSON, one
+#      file per zoom level. With `topojson` installed, shared borders are simplified once so neighboring precincts
+#      never gap or overlap; without it, each polygon is simplified on its own and written as GeoJSON with rounded
+#      coordinates.
+#
+# A manifest of input hashes is written next to the outputs, and the whole build is skipped while the inputs and
+# settings are unchanged.
+# ------------------
+
+PRECINCTS_PATH = "RegistrarRecorder_Precincts-simple.geojson"
+BOUNDARY_PATH = "Torrance_City_Boundary.geojson"
+PRECINCT_IDS_PATH = "Torrance_Precincts_Overlay.csv"
+METRICS_PATH = "Precinct_ACS_Metrics.json"
+OUTPUT_DIR = "precinct_geometry"
+
+# Zoom level → simplification tolerance in degrees (about 55m, 11m and 2m at Torrance's latitude).
+ZOOM_TOLERANCES = {11: 0.0005, 13: 0.0001, 16: 0.00002}
+QUANTIZATION = 1e5
+COORDINATE_DECIMALS = 5
+BUILD_VERSION = 1
+
+def _topojson():
+    try:
+        import topojson
+    except ImportError:
+        return None
+    return topojson
+
+def file_hash(path):
+    if not path or not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_features(path):
+    with open(path) as f:
+        return json.load(f)["features"]
+
+def precinct_id(feature):
+    return str(feature["properties"].get("PRECINCT", "")).strip().upper()
+
+def filter_precincts(features, boundary_path=None, precinct_ids=None):
+    """Returns the features intersecting the boundary's interior, and listed in `precinct_ids` if given."""
+    from shapely import STRtree
+    from shapely.geometry import shape
+
+    if precinct_ids is not None:
+        features = [feature for feature in features if precinct_id(feature) in precinct_ids]
+
+    if boundary_path and os.path.exists(boundary_path):
+        geometries = [shape(feature["geometry"]) for feature in features]
+        tree = STRtree(geometries)
+        matches = set()
+        for boundary_feature in load_features(boundary_path):
+            # Precincts only touching the boundary from outside are left out.
+            boundary = shape(boundary_feature["geometry"])
+            intersecting = set(tree.query(boundary, predicate="intersects").tolist())
+            matches.update(intersecting - set(tree.query(boundary, predicate="touches").tolist()))
+        features = [features[i] for i in sorted(matches)]
+
+    return features
+
+def join_metrics(features, metrics_path):
+    if not metrics_path or not os.path.exists(metrics_path):
+        return features
+
+    with open(metrics_path) as f:
+        metrics = {row["Precinct_ID"]: row for row in json.load(f)}
+
+    joined = []
+    for feature in features:
+        row = metrics.get(precinct_id(feature), {})
+        properties = {
+            "Precinct_ID": precinct_id(feature),
+            "Census_Tract": row.get("Census_Tract"),
+            **row.get("ACS_2022", {}),
+        }
+        joined.append({"type": "Feature", "properties": properties, "geometry": feature["geometry"]})
+    return joined
+
+def _round_coordinates(coordinates):
+    if isinstance(coordinates[0], (int, float)):
+        return [round(value, COORDINATE_DECIMALS) for value in coordinates]
+    return [_round_coordinates(part) for part in coordinates]
+
+def write_zoom_level(features, tolerance, path):
+    from shapely.geometry import mapping, shape
+
+    topojson = _topojson()
+    if topojson is not None:
+        topology = topojson.Topology(
+            {"type": "FeatureCollection", "features": features},
+            prequantize=QUANTIZATION,
+            toposimplify=tolerance,
+            object_name="precincts",
+        )
+        topology.to_json(path)
+        return path
+
+    # Without topojson each polygon is simplified on its own.
+    path = os.path.splitext(path)[0] + ".geojson"
+    simplified = []
+    for feature in features:
+        geometry = mapping(shape(feature["geometry"]).simplify(tolerance, preserve_topology=True))
+        geometry = {"type": geometry["type"], "coordinates": _round_coordinates(geometry["coordinates"])}
+        simplified.append({**feature, "geometry": geometry})
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": simplified}, f, separators=(",", ":"))
+    return path
+
+def build(precincts_path, boundary_path, precinct_ids_path, metrics_path, output_dir, force=False):
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    inputs = {
+        "version": BUILD_VERSION,
+        "topojson": _topojson() is not None,
+        "zoom_tolerances": ZOOM_TOLERANCES,
+        "precincts": file_hash(precincts_path),
+        "boundary": file_hash(boundary_path),
+        "precinct_ids": file_hash(precinct_ids_path),
+        "metrics": file_hash(metrics_path),
+    }
+    # JSON keys are strings, so the manifest is compared in its JSON form.
+    inputs = json.loads(json.dumps(inputs))
+
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    if not force and manifest.get("inputs") == inputs and all(os.path.exists(path) for path in manifest.get("outputs", [])):
+        print("⏩ Precinct geometry is up to date.")
+        return manifest["outputs"]
+
+    precinct_ids = None
+    if precinct_ids_path and os.path.exists(precinct_ids_path):
+        import pandas as pd
+
+        precinct_ids = set(pd.read_csv(precinct_ids_path)["Precinct_ID"].astype(str).str.strip().str.upper())
+
+    features = filter_precincts(load_features(precincts_path), boundary_path, precinct_ids)
+    features = join_metrics(features, metrics_path)
+    print(f"🗺️ {len(features)} precincts selected.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    for zoom, tolerance in ZOOM_TOLERANCES.items():
+        path = write_zoom_level(features, tolerance, os.path.join(output_dir, f"precincts_z{zoom}.topojson"))
+        outputs.append(path)
+        print(f"✅ Zoom {zoom}: {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+    with open(manifest_path, "w") as f:
+        json.dump({"inputs": inputs, "outputs": outputs}, f, indent=2)
+    return outputs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds simplified, quantized precinct geometry with ACS metrics for the map.")
+    parser.add_argument("--precincts", default=PRECINCTS_PATH)
+    parser.add_argument("--boundary", default=BOUNDARY_PATH, help="City boundary GeoJSON used to select precincts")
+    parser.add_argument("--precinct-ids", default=PRECINCT_IDS_PATH, help="CSV with a Precinct_ID column to select precincts")
+    parser.add_argument("--metrics", default=METRICS_PATH, help="Per-precinct ACS metrics from build_metric_dataset.py")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    build(args.precincts, args.boundary, args.precinct_ids, args.metrics, args.output_dir, force=args.force)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import os
+
+# Census geography helpers for the precinct / tract scripts.
+# ------------------
+# GEOIDs are fixed-width digit strings: SS (state) + CCC (county) + TTTTTT (tract) + B (block group) + BBB (block).
+# Whole arrays of them are parsed at once by viewing the digits as a NumPy byte matrix, so county-wide sets of
+# hundreds of thousands of codes take milliseconds instead of a Python loop per code.
+#
+# Tract numbers are formatted from integers (650001 → "6500.01", 650010 → "6500.1", 650300 → "6503"), which gives
+# the same strings as the previous `int(...) / 100` formatting without going through floats.
+#
+# The precinct → tract map lives in `data/precinct_tracts.csv`, and `scrape.py` also keeps its FCC lookups in
+# `tract_cache.json`. `load_precinct_tracts` reads either.
+# ------------------
+
+STATE_DIGITS = 2
+COUNTY_DIGITS = 3
+TRACT_DIGITS = 6
+BLOCK_GROUP_DIGITS = 1
+TRACT_GEOID_DIGITS = STATE_DIGITS + COUNTY_DIGITS + TRACT_DIGITS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+PRECINCT_TRACTS_PATH = os.path.join(DATA_DIR, "precinct_tracts.csv")
+
+def _digits(geoids, width):
+    import numpy as np
+
+    # Fixed-width bytes viewed as a (codes × digits) matrix of digit values.
+    codes = np.asarray(geoids, dtype=f"S{width}")
+    lengths = np.char.str_len(codes)
+    if len(codes) and (lengths.min() < width or not np.char.isdigit(codes).all()):
+        invalid = codes[(lengths < width) | ~np.char.isdigit(codes)][:5]
+        raise ValueError(f"Invalid GEOIDs, expected at least {width} digits: {[code.decode() for code in invalid]}")
+    return codes.view(np.uint8).reshape(len(codes), width) - ord("0")
+
+def _number(digits, start, count):
+    import numpy as np
+
+    weights = 10 ** np.arange(count - 1, -1, -1, dtype=np.int64)
+    return digits[:, start:start + count].astype(np.int64) @ weights
+
+def parse_geoids(geoids, block_groups=False):
+    """
+    Splits tract (or, with `block_groups`, block group) GEOIDs into integer columns: state, county, tract and
+    block_group. Longer codes, e.g. block FIPS codes, are truncated to that level.
+    """
+    import pandas as pd
+
+    width = TRACT_GEOID_DIGITS + (BLOCK_GROUP_DIGITS if block_groups else 0)
+    digits = _digits(geoids, width)
+
+    columns = {
+        "state": _number(digits, 0, STATE_DIGITS),
+        "county": _number(digits, STATE_DIGITS, COUNTY_DIGITS),
+        "tract": _number(digits, STATE_DIGITS + COUNTY_DIGITS, TRACT_DIGITS),
+    }
+    if block_groups:
+        columns["block_group"] = _number(digits, TRACT_GEOID_DIGITS, BLOCK_GROUP_DIGITS)
+
+    return pd.DataFrame(columns)
+
+def format_tract_number(tract):
+    whole, hundredths = divmod(int(tract), 100)
+    if not hundredths:
+        return str(whole)
+    if not hundredths % 10:
+        return f"{whole}.{hundredths // 10}"
+    return f"{whole}.{hundredths:02d}"
+
+def format_tract_numbers(tracts):
+    import numpy as np
+
+    # Counties only have a few thousand distinct tracts, so each distinct one is formatted once.
+    unique_tracts, inverse = np.unique(np.asarray(tracts, dtype=np.int64), return_inverse=True)
+    formatted = np.array([format_tract_number(tract) for tract in unique_tracts], dtype=object)
+    return formatted[inverse]
+
+def decode_census_tract(fips_code):
+    """Returns the census tract number of a tract (or longer) FIPS code, e.g. 06037650001 → "6500.01"."""
+    return format_tract_number(fips_code[STATE_DIGITS + COUNTY_DIGITS:TRACT_GEOID_DIGITS])
+
+def tract_numbers(geoids):
+    return format_tract_numbers(parse_geoids(geoids)["tract"].to_numpy())
+
+def load_precinct_tracts(path=PRECINCT_TRACTS_PATH):
+    """Returns {precinct id: tract GEOID} from a Precinct_ID,Census_Tract CSV or a `tract_cache.json` style JSON file."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            return {str(precinct).strip().upper(): str(tract) for precinct, tract in json.load(f).items()}
+
+    import pandas as pd
+
+    df = pd.read_csv(path, dtype=str)
+    return dict(zip(df["Precinct_ID"].str.strip().str.upper(), df["Census_Tract"].str.strip()))
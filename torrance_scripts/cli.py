@@ -0,0 +1,53 @@
+import argparse
+import importlib
+import sys
+
+# Command line entry point for the torrance_scripts pipelines.
+# ------------------
+# Every pipeline is a module with a `main(argv=None)`, run as `python -m torrance_scripts <command> [args]`, where the
+# command is the module's name. Only the chosen command's module is imported, and heavy dependencies (pandas,
+# geopandas, shapely, selenium, `datadog_api_client`, ...) are imported by the functions using them, so commands only
+# pay for what they run. `python -m torrance_scripts.<command>` runs a single module the same way.
+# ------------------
+
+COMMANDS = {
+    "acs_warehouse": "Fetches ACS vintages and geographies into the local warehouse.",
+    "atoz_export_auto_final_v4": "Exports the AtoZ search results page by page through the Torrance library sign-in.",
+    "build_metric_dataset": "Builds the per-precinct ACS dataset with only the variables the map uses.",
+    "build_precinct_geometry": "Builds simplified, quantized precinct geometry with ACS metrics for the map.",
+    "datadog_spool": "Replays the spooled Datadog metrics and logs.",
+    "decode_census_tracts": "Decodes tract FIPS codes into census tract numbers.",
+    "extract_unique_tracts": "Lists the unique census tracts of the precincts.",
+    "getids_final": "Scrapes the AtoZ resident search results into a CSV.",
+    "getids_full_detail": "Exports the AtoZ search results page by page as full detail downloads.",
+    "log_project_metrics": "Logs the telemetry, test and line count metrics of the iOS project to Datadog.",
+    "log_release_app_version": "Logs a Datadog event for an iOS app release.",
+    "mr_summary_bot": "Posts a Gemini summary of the CI merge request as a comment.",
+    "new": "Exports the labels of the ACS estimate and percent variables to CSV.",
+    "open_address": "Extracts the Torrance addresses from an OpenAddresses dump.",
+    "pipeline": "Runs the Torrance data pipeline, skipping the stages that are up to date.",
+    "resident_join": "Joins the AtoZ residents to their precincts and census tracts.",
+    "scrape": "Fetches the ACS profile of every Torrance precinct's census tract.",
+    "sort": "Prints the rent burden variables of every precinct.",
+    "streets": "Downloads the CAMS address points and writes the unique Torrance addresses.",
+    "tract_index": "Builds the binary precinct → tract index.",
+    "upload_code_coverage": "Uploads the code coverage of a Bitrise build to Datadog.",
+    "upload_design_analytics": "Uploads the design system component usages of the iOS project to Datadog.",
+    "walk_withQR_maps": "Builds the printable walk lists with map QR codes.",
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m torrance_scripts",
+        description="Runs a torrance_scripts pipeline. Use `<command> --help` for the command's arguments.",
+        epilog="commands:\n" + "\n".join(f"  {command:<28}{description}" for command, description in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command", help="One of the commands below")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="The command's arguments")
+    args = parser.parse_args(argv)
+
+    # Argparse usage and run reports (see `instrumentation.py`) are named after `sys.argv[0]`.
+    sys.argv = [args.command, *args.args]
+    module = importlib.import_module(f".{args.command}", __package__)
+    return module.main(args.args)
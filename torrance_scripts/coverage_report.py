@@ -0,0 +1,71 @@
+import json
+
+# Streaming reader for xccov / xcresultparser coverage JSON reports.
+# ------------------
+# Coverage reports for large schemes run into hundreds of megabytes, most of it per-function coverage that the upload
+# scripts never use. When `ijson` is installed the report is stream-parsed and only target and file level values are
+# kept, so memory stays bounded by the file level values of a single target. Without it the report is loaded in full.
+#
+# Both report layouts are supported: a top-level list of targets, or an object with a `targets` list.
+# ------------------
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+TARGET_FIELDS = ("name", "lineCoverage", "coveredLines", "executableLines")
+FILE_FIELDS = ("name", "path", "lineCoverage", "coveredLines", "executableLines")
+
+
+def _iter_loaded(report):
+    targets = report.get("targets", []) if isinstance(report, dict) else report
+    for target in targets:
+        yield "target", target.get("name"), {field: target.get(field) for field in TARGET_FIELDS}
+        for file in target.get("files", []):
+            yield "file", target.get("name"), {field: file.get(field) for field in FILE_FIELDS}
+
+
+def _iter_streamed(f):
+    target = None
+    files = []
+    file = None
+    target_prefix = None
+
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if target_prefix is None and event == "start_map" and prefix in ("item", "targets.item"):
+            target_prefix = prefix
+
+        if prefix == target_prefix and event == "start_map":
+            target = {}
+            files = []
+        elif prefix == target_prefix and event == "end_map":
+            # xccov sorts keys, so a target's name only comes after its files.
+            yield "target", target.get("name"), target
+            for file in files:
+                yield "file", target.get("name"), file
+            target = None
+        elif prefix == f"{target_prefix}.files.item" and event == "start_map":
+            file = {}
+        elif prefix == f"{target_prefix}.files.item" and event == "end_map":
+            files.append(file)
+            file = None
+        elif target is not None and event in ("string", "number"):
+            # Everything below `functions` is skipped without being kept in memory.
+            owner, _, field = prefix.rpartition(".")
+            if file is not None and owner == f"{target_prefix}.files.item" and field in FILE_FIELDS:
+                file[field] = value
+            elif owner == target_prefix and field in TARGET_FIELDS:
+                target[field] = value
+
+
+def iter_coverage(path):
+    """
+    Yields ("target", target name, values) for every target in the report at `path`, followed by
+    ("file", target name, values) for each of its files.
+    """
+    with open(path, "rb") as f:
+        if ijson is None:
+            yield from _iter_loaded(json.load(f))
+        else:
+            yield from _iter_streamed(f)
@@ -0,0 +1,158 @@
+from datetime import datetime
+
+import atexit
+import json
+import os
+
+# Shared Datadog submission client for the CI upload scripts.
+# ------------------
+# All scripts share a single `ApiClient`, so every request goes through the same pooled connection. Metric series and
+# log items are split into batches that stay under Datadog's intake limits, and each batch is sent gzip-compressed.
+# Requests that fail with a 429 or 5xx are retried with exponential backoff by the API client itself.
+#
+# `datadog_api_client` is imported by the functions using it, since importing its models takes most of a second.
+# ------------------
+
+DATADOG_SITE = os.environ.get("DATADOG_SITE", "datadoghq.com")
+MAX_RETRIES = 5
+RETRY_BACKOFF_FACTOR = 2
+
+# Datadog accepts up to 5MB of uncompressed JSON per metrics payload and per logs payload, and up to 1000 log items.
+# Batches are capped well below that, since the serialized size is only an estimate of the request body.
+MAX_PAYLOAD_BYTES = 3_000_000
+MAX_LOG_ITEMS = 1000
+
+_api_client = None
+
+def api_client():
+    global _api_client
+
+    if _api_client is None:
+        from datadog_api_client import ApiClient, Configuration
+
+        configuration = Configuration(
+            enable_retry=True,
+            max_retries=MAX_RETRIES,
+            retry_backoff_factor=RETRY_BACKOFF_FACTOR,
+        )
+        configuration.api_key["apiKeyAuth"] = os.environ['DATADOG_API_KEY']
+        configuration.server_variables["site"] = DATADOG_SITE
+
+        # Tests and benchmarks point the client at a local stub intake.
+        if os.environ.get("DATADOG_HOST"):
+            configuration.host = os.environ["DATADOG_HOST"]
+
+        _api_client = ApiClient(configuration)
+        atexit.register(_api_client.close)
+
+    return _api_client
+
+def serialized_size(model):
+    return len(json.dumps(model.to_dict(), default=str))
+
+def batches(items, max_bytes=MAX_PAYLOAD_BYTES, max_items=None):
+    """Splits `items` into consecutive batches whose estimated serialized size stays under `max_bytes`."""
+    batch = []
+    batch_bytes = 0
+
+    for item in items:
+        item_bytes = serialized_size(item)
+
+        if batch and (batch_bytes + item_bytes > max_bytes or (max_items and len(batch) >= max_items)):
+            yield batch
+            batch = []
+            batch_bytes = 0
+
+        batch.append(item)
+        batch_bytes += item_bytes
+
+    if batch:
+        yield batch
+
+def metric_series(metric, value, tags=None, resources=None, timestamp=None):
+    from datadog_api_client.v2.model.metric_intake_type import MetricIntakeType
+    from datadog_api_client.v2.model.metric_point import MetricPoint
+    from datadog_api_client.v2.model.metric_resource import MetricResource
+    from datadog_api_client.v2.model.metric_series import MetricSeries
+
+    series = MetricSeries(
+        metric=metric,
+        type=MetricIntakeType.UNSPECIFIED,
+        points=[
+            MetricPoint(
+                timestamp=timestamp or int(datetime.now().timestamp()),
+                value=value,
+            ),
+        ],
+    )
+
+    if tags:
+        series.tags = tags
+    if resources:
+        series.resources = [MetricResource(name=name, type=resource_type) for name, resource_type in resources]
+
+    return series
+
+def log_item(**fields):
+    from datadog_api_client.v2.model.http_log_item import HTTPLogItem
+
+    return HTTPLogItem(**fields)
+
+def event(**fields):
+    from datadog_api_client.v1.model.event_create_request import EventCreateRequest
+
+    return EventCreateRequest(**fields)
+
+# Rebuild models from their `to_dict()` form, e.g. when replaying them from `datadog_spool`.
+def series_from_dict(data):
+    from datadog_api_client.v2.model.metric_intake_type import MetricIntakeType
+    from datadog_api_client.v2.model.metric_point import MetricPoint
+    from datadog_api_client.v2.model.metric_resource import MetricResource
+    from datadog_api_client.v2.model.metric_series import MetricSeries
+
+    data = dict(data)
+    data["type"] = MetricIntakeType(data.get("type", 0))
+    data["points"] = [MetricPoint(**point) for point in data["points"]]
+    if "resources" in data:
+        data["resources"] = [MetricResource(**resource) for resource in data["resources"]]
+    return MetricSeries(**data)
+
+def log_item_from_dict(data):
+    return log_item(**data)
+
+def submit_metrics(series):
+    from datadog_api_client.v2.api.metrics_api import MetricsApi
+    from datadog_api_client.v2.model.metric_content_encoding import MetricContentEncoding
+    from datadog_api_client.v2.model.metric_payload import MetricPayload
+
+    api_instance = MetricsApi(api_client())
+    responses = []
+
+    for batch in batches(series):
+        responses.append(api_instance.submit_metrics(
+            body=MetricPayload(series=batch),
+            content_encoding=MetricContentEncoding.GZIP,
+        ))
+
+    return responses
+
+def submit_logs(items):
+    from datadog_api_client.v2.api.logs_api import LogsApi
+    from datadog_api_client.v2.model.content_encoding import ContentEncoding
+    from datadog_api_client.v2.model.http_log import HTTPLog
+
+    api_instance = LogsApi(api_client())
+    responses = []
+
+    for batch in batches(items, max_items=MAX_LOG_ITEMS):
+        responses.append(api_instance.submit_log(
+            body=HTTPLog(batch),
+            content_encoding=ContentEncoding.GZIP,
+        ))
+
+    return responses
+
+def create_event(body):
+    from datadog_api_client.v1.api.events_api import EventsApi
+
+    return EventsApi(api_client()).create_event(body=body)
@@ -0,0 +1,184 @@
+from datetime import datetime
+from pathlib import Path
+
+import argparse
+import fcntl
+import glob
+import json
+import os
+import subprocess
+import sys
+
+from . import metrics_cache
+
+# Offline spool for Datadog metrics and logs.
+# ------------------
+# Instead of submitting inline, the CI scripts append their metric series and log items to an append-only JSON lines
+# file, keeping their original timestamps, and return straight away. A detached flusher process then replays the
+# whole spool in bulk through `datadog_client`. If Datadog is slow or unreachable the records stay in the spool, and
+# since it lives in the metrics cache directory it is restored and replayed by the next build. A flusher claims the
+# spool by moving it to `<spool>.<pid>.replaying`; if it dies mid-replay, the next replay takes over its claim.
+#
+# `DATADOG_SPOOL_MODE` controls when the spool is flushed:
+#   - "background" (default): a detached flusher is started after every append
+#   - "sync": the spool is replayed inline, blocking the build step like a direct submission would
+#   - "defer": records are only spooled, and replayed by the next build or an explicit `python -m torrance_scripts datadog_spool`
+#
+# Records are only dropped when Datadog rejects them as invalid (400, 413 or 422), and a rejected batch is split until
+# the offending records are on their own. Authentication and routing errors (401, 403, 404) keep the records, since
+# they come from the configuration, not the records.
+#
+# Note that Datadog drops metric points more than an hour old, so points that sit in the spool for longer than that
+# are only kept for as long as it takes to find that out.
+# ------------------
+
+SPOOL_PATH = os.environ.get("DATADOG_SPOOL_PATH", os.path.join(metrics_cache.CACHE_DIR, "datadog_spool.jsonl"))
+SPOOL_MODE = os.environ.get("DATADOG_SPOOL_MODE", "background")
+# Statuses Datadog rejects a payload's content with. Records are only ever dropped for these.
+REJECTED_STATUSES = (400, 413, 422)
+
+class _locked:
+    # Exclusive lock shared by writers and the flusher, so a replay never claims a half written batch.
+    def __enter__(self):
+        os.makedirs(os.path.dirname(SPOOL_PATH), exist_ok=True)
+        self.lock_file = open(SPOOL_PATH + ".lock", "w")
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.lock_file.close()
+
+def _append(records):
+    with _locked():
+        with open(SPOOL_PATH, "a") as f:
+            f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+
+def _spool(kind, items):
+    spooled_at = int(datetime.now().timestamp())
+    _append([{"kind": kind, "spooled_at": spooled_at, "data": item} for item in items])
+
+    if SPOOL_MODE == "sync":
+        replay()
+    elif SPOOL_MODE == "background":
+        flush_in_background()
+
+def spool_metrics(series):
+    _spool("metric", [item.to_dict() for item in series])
+
+def spool_logs(items):
+    # Logs don't carry a timestamp of their own, so the time they were created is attached before spooling.
+    timestamp = int(datetime.now().timestamp() * 1000)
+    _spool("log", [{"timestamp": timestamp, **item.to_dict()} for item in items])
+
+def flush_in_background():
+    with open(SPOOL_PATH + ".log", "a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", __name__],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _stale_claims():
+    # Claim files are named after the pid of their flusher.
+    for path in glob.glob(f"{glob.escape(SPOOL_PATH)}.*.replaying"):
+        pid = path[len(SPOOL_PATH) + 1:-len(".replaying")]
+        if pid.isdigit() and not _alive(int(pid)):
+            yield path
+
+def _claim(claimed_path):
+    """
+    Moves the spool to `claimed_path`, together with the claims of flushers that died mid-replay (e.g. killed with the
+    CI VM), so their records aren't lost. Returns whether there is anything to replay.
+    """
+    with _locked():
+        sources = [path for path in [*_stale_claims(), SPOOL_PATH] if os.path.exists(path)]
+        if not sources:
+            return False
+
+        with open(claimed_path, "w") as claimed:
+            for path in sources:
+                with open(path) as f:
+                    claimed.write(f.read())
+        for path in sources:
+            os.remove(path)
+    return True
+
+def replay():
+    """
+    Submits everything in the spool in bulk. Records that fail to submit, or aren't submitted because the replay
+    fails, are put back in the spool. Only the records Datadog rejects as invalid are dropped.
+    """
+    from . import datadog_client
+
+    claimed_path = f"{SPOOL_PATH}.{os.getpid()}.replaying"
+    if not _claim(claimed_path):
+        return
+
+    records = []
+    for line in Path(claimed_path).read_text().splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            print(f"Skipping malformed spool record: {line[:200]}")
+
+    models = {
+        "metric": (datadog_client.series_from_dict, datadog_client.submit_metrics),
+        "log": (datadog_client.log_item_from_dict, datadog_client.submit_logs),
+    }
+    # Records are removed once they are submitted, or dropped. Whatever is left goes back to the spool.
+    unsent = dict(enumerate(records))
+
+    try:
+        items = {kind: [] for kind in models}
+        for index, record in list(unsent.items()):
+            try:
+                from_dict = models[record["kind"]][0]
+                items[record["kind"]].append((from_dict(record["data"]), index))
+            except Exception as e:
+                print(f"Skipping bad spool record ({e!r}): {json.dumps(record, default=str)[:200]}")
+                del unsent[index]
+
+        for kind, (from_dict, submit) in models.items():
+            indexes = {id(item): index for item, index in items[kind]}
+            pending = list(datadog_client.batches(item for item, index in items[kind]))
+            while pending:
+                batch = pending.pop()
+                try:
+                    submit(batch)
+                    print(f"Replayed {len(batch)} spooled {kind} records.")
+                except Exception as e:
+                    # Only records Datadog rejects for their content are dropped, anything else (a bad API key or
+                    # host, throttling, an outage) is kept for the next flush.
+                    if getattr(e, "status", None) not in REJECTED_STATUSES:
+                        print(f"Error replaying {len(batch)} spooled {kind} records, keeping them for the next flush: {e}")
+                        continue
+                    if len(batch) > 1:
+                        # Halves are retried until the rejected records are on their own, so the rest still go through.
+                        half = len(batch) // 2
+                        pending += [batch[half:], batch[:half]]
+                        continue
+                    print(f"Dropping a spooled {kind} record rejected by Datadog: {e}")
+                for item in batch:
+                    del unsent[indexes[id(item)]]
+    finally:
+        if unsent:
+            _append(list(unsent.values()))
+        os.remove(claimed_path)
+
+def main(argv=None):
+    argparse.ArgumentParser(description="Replays the spooled Datadog metrics and logs.").parse_args(argv)
+    replay()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+from collections import namedtuple
+
+import re
+
+# Unified diff parsing for mr_summary_bot.py.
+# ------------------
+# Diffs are read line by line from a string or any iterable of lines (e.g. the stdout of `git diff`), so a multi-file
+# diff is split per file in a single streaming pass. Hunk headers are matched with a single precompiled pattern, and
+# numbered output is written into one list that is joined at the end.
+#
+# Every diff line is numbered by its line in the file after changes, and removed lines have no number. Lines before
+# the first hunk header (`diff --git`, `---`, `+++`, ...), `\ No newline at end of file` markers and empty lines are skipped.
+#
+# See `benchmarks/bench_diff_parser.py` for a benchmark over generated multi-megabyte diffs.
+# ------------------
+
+HUNK_HEADER = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+Hunk = namedtuple("Hunk", ["old_start", "old_count", "new_start", "new_count", "header", "lines"])
+
+def _lines(diff):
+    # A single file's diff is already in memory, and splitting it at once is much faster than reading it line by line.
+    return diff.split("\n") if isinstance(diff, str) else (line.rstrip("\n") for line in diff)
+
+def iter_lines(diff):
+    """Yields (line number after changes, content, line type) for every line, where type is one of '@@', '+', '-' and ' '."""
+    new_line_num = 0
+
+    for line in _lines(diff):
+        line_type = line[:1]
+
+        if line_type == "@":
+            match = HUNK_HEADER.match(line)
+            new_line_num = int(match.group(3)) if match else 0
+            yield 0, line, "@@"
+        elif not new_line_num or line_type in ("\\", ""):
+            continue
+        elif line_type == "-":
+            yield 0, line[1:], "-"
+        else:
+            yield new_line_num, line[1:], line_type if line_type == "+" else " "
+            new_line_num += 1
+
+def iter_hunks(diff):
+    """Yields a `Hunk` for every hunk in `diff`, with its lines as produced by `iter_lines`."""
+    hunk = None
+
+    for line in iter_lines(diff):
+        if line[2] == "@@":
+            if hunk:
+                yield hunk
+            match = HUNK_HEADER.match(line[1])
+            if not match:
+                hunk = None
+                continue
+            old_start, old_count, new_start, new_count = match.groups()
+            hunk = Hunk(
+                int(old_start),
+                1 if old_count is None else int(old_count),
+                int(new_start),
+                1 if new_count is None else int(new_count),
+                line[1],
+                [],
+            )
+        elif hunk:
+            hunk.lines.append(line)
+
+    if hunk:
+        yield hunk
+
+def number_diff(diff):
+    """
+    Returns the diff with every line prefixed by its line number after changes, as shown to the model, and the
+    sorted line numbers that were added or directly follow removed lines.
+    """
+    parts = []
+    append = parts.append
+    changed_lines = set()
+    add_changed = changed_lines.add
+    new_line_num = 0
+
+    # Same rules as `iter_lines`, inlined since this runs for every line of every changed file.
+    for line in _lines(diff):
+        line_type = line[:1]
+
+        if line_type == "@":
+            match = HUNK_HEADER.match(line)
+            new_line_num = int(match.group(3)) if match else 0
+            append(line)
+        elif not new_line_num or line_type in ("\\", ""):
+            continue
+        elif line_type == "-":
+            # Removed lines are attributed to the line that follows them in the file after changes.
+            append("   : " + line)
+            add_changed(new_line_num)
+        else:
+            if line_type == "+":
+                add_changed(new_line_num)
+            elif line_type != " ":
+                line = " " + line[1:]
+            append(f"{new_line_num:<3}: {line}")
+            new_line_num += 1
+
+    return "\n".join(parts), sorted(changed_lines)
+
+def split_git_diff(diff_lines):
+    """Splits the lines of a multi-file `git diff` into {path: diff} for each file, in a single streaming pass."""
+    diffs = {}
+    current_lines = None
+    old_path = new_path = None
+
+    def finish():
+        if current_lines:
+            # Deleted files have no new path, and binary files have neither `---` nor `+++` lines.
+            path = new_path or old_path or header_path
+            diffs[path] = "".join(current_lines)
+
+    header_path = None
+    for line in diff_lines:
+        if line.startswith("diff --git "):
+            finish()
+            current_lines = []
+            old_path = new_path = None
+            header_path = line.rstrip("\n").split(" b/", 1)[-1]
+        elif current_lines is not None and not old_path and line.startswith("--- "):
+            # Git appends a tab to paths containing spaces.
+            old_path = line[6:].rstrip("\n").rstrip("\t") if line.startswith("--- a/") else None
+        elif current_lines is not None and not new_path and line.startswith("+++ "):
+            new_path = line[6:].rstrip("\n").rstrip("\t") if line.startswith("+++ b/") else None
+
+        if current_lines is not None:
+            current_lines.append(line)
+
+    finish()
+    return diffs
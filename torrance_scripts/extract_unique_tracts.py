@@ -1,252 +1,43 @@
+import argparse
 import json
 
-# Your tract data
-tract_data = {
-  "7150064F": "06037651101",
-  "7150806A": "06037651101",
-  "7150065B": "06037651101",
-  "7150117A": "06037651101",
-  "7150001A": "06037650001",
-  "7150001B": "06037650001",
-  "7150001C": "06037650001",
-  "7150001D": "06037650001",
-  "7150001E": "06037650001",
-  "7150002A": "06037650001",
-  "7150126B": "06037650001",
-  "7150002C": "06037650001",
-  "7150122B": "06037650001",
-  "7150126A": "06037650001",
-  "7150003A": "06037650004",
-  "7150054A": "06037650004",
-  "7150003C": "06037650004",
-  "7150003B": "06037650004",
-  "7150054B": "06037650004",
-  "7150003F": "06037650004",
-  "7150004A": "06037650003",
-  "7150006A": "06037650003",
-  "7150006B": "06037650003",
-  "7150004D": "06037650003",
-  "7150085A": "06037651101",
-  "7150004E": "06037650003",
-  "7150054C": "06037650004",
-  "7150005A": "06037650300",
-  "7150059A": "06037650300",
-  "7150059B": "06037650300",
-  "7150005D": "06037650300",
-  "7150005E": "06037650300",
-  "7150004F": "06037650003",
-  "7150004B": "06037650003",
-  "7150006D": "06037650003",
-  "7150006E": "06037650003",
-  "7150062A": "06037650001",
-  "7150008B": "06037650001",
-  "7150008C": "06037650001",
-  "7150008D": "06037650001",
-  "7150008E": "06037650001",
-  "7150009A": "06037650001",
-  "7150009B": "06037650101",
-  "7150062B": "06037650001",
-  "7150062C": "06037650001",
-  "7150009E": "06037650001",
-  "7150062D": "06037650001",
-  "7150054D": "06037650004",
-  "7150054E": "06037650004",
-  "7150010C": "06037650004",
-  "7150010D": "06037650004",
-  "7150010E": "06037650004",
-  "7150010F": "06037650004",
-  "7150054F": "06037650004",
-  "7150011A": "06037650502",
-  "7150059C": "06037650300",
-  "7150012B": "06037650300",
-  "7150012C": "06037650300",
-  "7150012D": "06037650300",
-  "7150012E": "06037650300",
-  "7150012F": "06037650300",
-  "7150013A": "06037650102",
-  "7150035C": "06037650102",
-  "7150013C": "06037650102",
-  "7150013D": "06037650102",
-  "7150013E": "06037650102",
-  "7150013F": "06037650102",
-  "7150014A": "06037650901",
-  "7150014B": "06037650901",
-  "7150014C": "06037650901",
-  "7150014D": "06037650901",
-  "7150015A": "06037650101",
-  "7150009C": "06037650101",
-  "7150015C": "06037650101",
-  "7150009D": "06037650101",
-  "7150015E": "06037650101",
-  "7150110A": "06037650101",
-  "7150110B": "06037650101",
-  "7150016A": "06037650101",
-  "7150066A": "06037650101",
-  "7150066B": "06037650101",
-  "7150016D": "06037650101",
-  "7150117B": "06037651101",
-  "7150016E": "06037650101",
-  "7150016F": "06037650101",
-  "7150016G": "06037650101",
-  "7150017A": "06037650101",
-  "7150066C": "06037650101",
-  "7150066D": "06037650101",
-  "7150017D": "06037650101",
-  "7150017E": "06037650101",
-  "7150017F": "06037650101",
-  "7150017G": "06037650101",
-  "7150018A": "06037650501",
-  "7150018B": "06037650501",
-  "7150021A": "06037650701",
-  "7150021B": "06037650701",
-  "7150021C": "06037650701",
-  "7150022A": "06037650300",
-  "7150022B": "06037650300",
-  "7150040D": "06037650300",
-  "7150040C": "06037650300",
-  "7150127B": "06037650300",
-  "7150127A": "06037650300",
-  "7150023A": "06037651221",
-  "7150023B": "06037651221",
-  "7150047D": "06037651221",
-  "7150047C": "06037651221",
-  "7150047B": "06037651221",
-  "7150117C": "06037651101",
-  "7150024A": "06037650300",
-  "7150024D": "06037650300",
-  "7150024E": "06037650300",
-  "7150024F": "06037650300",
-  "7150072E": "06037650901",
-  "7150025B": "06037650901",
-  "7150025C": "06037650901",
-  "7150025D": "06037650901",
-  "7150072A": "06037650901",
-  "7150072B": "06037650901",
-  "7150072C": "06037650901",
-  "7150026A": "06037650200",
-  "7150026B": "06037650200",
-  "7150026C": "06037650200",
-  "7150019A": "06037650200",
-  "7150026E": "06037650200",
-  "7150019B": "06037650200",
-  "7150019C": "06037650200",
-  "7150100A": "06037650200",
-  "7150128A": "06037650200",
-  "7150027C": "06037650200",
-  "7150027D": "06037650200",
-  "7150128B": "06037650200",
-  "7150027F": "06037650200",
-  "7150028A": "06037650200",
-  "7150028B": "06037650200",
-  "7150028C": "06037650200",
-  "7150028D": "06037650200",
-  "7150028E": "06037650200",
-  "7150083C": "06037651002",
-  "7150029A": "06037650904",
-  "7150029B": "06037650904",
-  "7150029C": "06037650904",
-  "7150030A": "06037650904",
-  "7150105A": "06037650903",
-  "7150105B": "06037650903",
-  "7150031B": "06037650502",
-  "7150031C": "06037650502",
-  "7150031D": "06037650502",
-  "7150031E": "06037650502",
-  "7150031F": "06037650502",
-  "7150032A": "06037650502",
-  "7150074A": "06037650501",
-  "7150032C": "06037650502",
-  "7150032D": "06037650502",
-  "7150032E": "06037650502",
-  "7150032F": "06037650502",
-  "7150033A": "06037650903",
-  "7150033B": "06037650903",
-  "7150033C": "06037650903",
-  "7150034A": "06037650605",
-  "7150034B": "06037650605",
-  "7150075A": "06037650605",
-  "7150034D": "06037650605",
-  "7150041G": "06037650605",
-  "7150034F": "06037650604",
-  "7150035A": "06037650102",
-  "7150035B": "06037650102",
-  "7150036A": "06037650701",
-  "7150036B": "06037650701",
-  "7150074D": "06037650502",
-  "7150037B": "06037650502",
-  "7150037C": "06037650502",
-  "7150037D": "06037650502",
-  "7150037E": "06037650502",
-  "7150037G": "06037650502",
-  "7150038A": "06037650603",
-  "7150038B": "06037650603",
-  "7150038D": "06037650603",
-  "7150038E": "06037650603",
-  "7150038F": "06037650603",
-  "7150039A": "06037650603",
-  "7150039B": "06037650607",
-  "7150039C": "06037650603",
-  "7150052B": "06037650603",
-  "7150052A": "06037650603",
-  "7150067B": "06037651002",
-  "7150052D": "06037650606",
-  "7150052C": "06037650606",
-  "7150040A": "06037650300",
-  "7150040B": "06037650300",
-  "7150041A": "06037650605",
-  "7150130C": "06037650605",
-  "7150041C": "06037650605",
-  "7150130B": "06037650605",
-  "7150130A": "06037650605",
-  "7150130D": "06037650605",
-  "7150042A": "06037651102",
-  "7150042B": "06037651102",
-  "7150042C": "06037651102",
-  "7150044A": "06037650702",
-  "7150044B": "06037650702",
-  "7150044C": "06037650702",
-  "7150044D": "06037650702",
-  "7150044E": "06037650702",
-  "7150044F": "06037650702",
-  "7150045A": "06037650603",
-  "7150045B": "06037650606",
-  "7150045D": "06037650603",
-  "7150045E": "06037650603",
-  "7150046A": "06037650603",
-  "7150046B": "06037650606",
-  "7150046D": "06037650603",
-  "7150046E": "06037650603",
-  "7150046F": "06037650603",
-  "7150046G": "06037650603",
-  "7150046H": "06037650603",
-  "7150048A": "06037980005",
-  "7150048B": "06037650901",
-  "7150048C": "06037650901",
-  "7150048D": "06037650901",
-  "7150072F": "06037650901",
-  "7150048G": "06037650901",
-  "7150079A": "06037650401"
-}
+from . import census_geo
 
-# Get unique tract codes
-unique_tracts = sorted(set(tract_data.values()))
+def extract_unique_tracts(tracts_path=census_geo.PRECINCT_TRACTS_PATH, json_path="unique_tracts.json", text_path="unique_tracts.txt"):
+    tract_data = census_geo.load_precinct_tracts(tracts_path)
 
-print("Unique Census Tracts:")
-print("====================")
-for i, tract in enumerate(unique_tracts, 1):
-    print(f"{i:2d}. {tract}")
+    # Get unique tract codes
+    unique_tracts = sorted(set(tract_data.values()))
 
-print(f"\nTotal unique tracts: {len(unique_tracts)}")
+    print("Unique Census Tracts:")
+    print("====================")
+    for i, tract in enumerate(unique_tracts, 1):
+        print(f"{i:2d}. {tract}")
 
-# Save as JSON list
-with open("unique_tracts.json", "w") as f:
-    json.dump(unique_tracts, f, indent=2)
+    print(f"\nTotal unique tracts: {len(unique_tracts)}")
 
-# Save as simple text list
-with open("unique_tracts.txt", "w") as f:
-    for tract in unique_tracts:
-        f.write(f"{tract}\n")
+    # Save as JSON list
+    with open(json_path, "w") as f:
+        json.dump(unique_tracts, f, indent=2)
 
-print("\nFiles saved:")
-print("- unique_tracts.json (JSON format)")
-print("- unique_tracts.txt (plain text, one per line)")
+    # Save as simple text list
+    with open(text_path, "w") as f:
+        for tract in unique_tracts:
+            f.write(f"{tract}\n")
+
+    print("\nFiles saved:")
+    print(f"- {json_path} (JSON format)")
+    print(f"- {text_path} (plain text, one per line)")
+    return unique_tracts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lists the unique census tracts of the precincts.")
+    # Precinct → tract data, from `data/precinct_tracts.csv` by default. Pass another CSV, or the `tract_cache.json`
+    # written by `scrape.py`, to extract the tracts of a different set of precincts.
+    parser.add_argument("tracts", nargs="?", default=census_geo.PRECINCT_TRACTS_PATH, help="Precinct_ID,Census_Tract CSV or tract_cache.json")
+    args = parser.parse_args(argv)
+
+    extract_unique_tracts(args.tracts)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from . import instrumentation
+
+# Shared HTTP client for the scripts' outbound API calls.
+# ------------------
+# Every request goes through one `requests` session per process:
+#   - keep-alive connection pools of `POOL_SIZE` connections per host, so concurrent and repeated requests reuse
+#     their connections instead of opening one per request
+#   - a default timeout, and one retry policy: connection errors, 429s and 5xx responses to GETs are retried
+#     `RETRIES` times with exponential backoff, honoring `Retry-After`
+#   - per-host limits in `HOST_LIMITS`: how many requests may be in flight at once, and the minimum interval between
+#     two requests starting
+#   - HTTP/2 when `HTTP_CLIENT_HTTP2=1` and `h2` is installed. urllib3's HTTP/2 support is still experimental, so
+#     requests speaks HTTP/1.1 by default.
+#
+# GET responses are cached on disk in `HTTP_CACHE_DIR` (default `~/.cache/torrance_http`), following RFC 9111 for a
+# private cache: `no-store` responses aren't stored, responses are fresh for their `max-age` / `Expires` lifetime (or
+# 10% of their age since `Last-Modified`), and stale responses with an `ETag` or `Last-Modified` are revalidated
+# with a conditional request, so an unchanged resource costs a 304. Callers that know how long data stays valid
+# (e.g. an ACS release, which never changes) pass `ttl=`, which replaces the server's freshness lifetime. With
+# `stale_if_error=True`, a cached response is used when the server can't be reached. Private or fast-changing data
+# (e.g. GitLab merge requests and notes) is fetched with `cache=False`, which never touches the cache.
+#
+# The cache is kept under `HTTP_CACHE_MAX_MB` (default 512) by evicting the least recently used responses.
+# ------------------
+
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(Path.home(), ".cache", "torrance_http"))
+CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_MB", 512)) * 1024 * 1024
+HTTP2 = os.environ.get("HTTP_CLIENT_HTTP2") == "1"
+CACHE_VERSION = 1
+
+TIMEOUT = (10, 120)  # connect, read
+RETRIES = 4
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+POOL_SIZE = 16
+
+# Host → (requests in flight at once, minimum seconds between two requests starting).
+HOST_LIMITS = {
+    "api.census.gov": (8, 0.0),
+    "geo.fcc.gov": (4, 0.1),
+    "arcgis.gis.lacounty.gov": (4, 0.0),
+}
+DEFAULT_HOST_LIMITS = (POOL_SIZE, 0.0)
+
+# Request headers that change the response, and so are part of its cache key.
+CACHE_KEY_HEADERS = ("accept", "authorization", "private-token")
+
+_session = None
+_session_lock = threading.Lock()
+_hosts = {}
+_hosts_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_cache_bytes = None
+
+def session():
+    """Returns the process' shared `requests` session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            if HTTP2:
+                try:
+                    import urllib3.http2
+                    urllib3.http2.inject_into_urllib3()
+                except ImportError as e:
+                    print(f"HTTP/2 unavailable, using HTTP/1.1: {e}")
+
+            retry = Retry(
+                total=RETRIES,
+                backoff_factor=RETRY_BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=["GET", "HEAD"],
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+@contextmanager
+def _host_slot(url):
+    host = urlsplit(url).netloc
+    with _hosts_lock:
+        if host not in _hosts:
+            concurrency, interval = HOST_LIMITS.get(host.split(":")[0], DEFAULT_HOST_LIMITS)
+            _hosts[host] = {"semaphore": threading.BoundedSemaphore(concurrency), "interval": interval, "next_start": 0.0}
+        limits = _hosts[host]
+
+    with limits["semaphore"]:
+        if limits["interval"]:
+            with _hosts_lock:
+                start = max(time.monotonic(), limits["next_start"])
+                limits["next_start"] = start + limits["interval"]
+            time.sleep(max(start - time.monotonic(), 0))
+        yield
+
+def request(method, url, timeout=TIMEOUT, **kwargs):
+    """Sends a request through the shared session, within the host's limits. Responses aren't cached."""
+    with _host_slot(url):
+        return session().request(method, url, timeout=timeout, **kwargs)
+
+# Cache
+# ------------------
+
+def _cache_key(url, headers):
+    key_headers = sorted((name.lower(), value) for name, value in (headers or {}).items() if name.lower() in CACHE_KEY_HEADERS)
+    return hashlib.sha256(json.dumps([CACHE_VERSION, url, key_headers]).encode("utf-8")).hexdigest()
+
+def _entry_paths(key):
+    return os.path.join(CACHE_DIR, f"{key}.json"), os.path.join(CACHE_DIR, f"{key}.body")
+
+def _load_entry(key):
+    meta_path, body_path = _entry_paths(key)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    # The entry's mtime is its last use, for eviction.
+    os.utime(meta_path)
+    return meta, body
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _cache_control(headers):
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def _freshness_lifetime(headers, ttl):
+    """Returns how many seconds a response is fresh for, or None if it must not be stored."""
+    directives = _cache_control(headers)
+    if ttl is not None:
+        return ttl
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    if directives.get("max-age", "").isdigit():
+        return int(directives["max-age"])
+
+    date = _http_date(headers.get("Date")) or time.time()
+    expires = _http_date(headers.get("Expires"))
+    if expires is not None:
+        return max(expires - date, 0)
+    last_modified = _http_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        return max((date - last_modified) / 10, 0)
+    return 0
+
+def _cached_response(meta, body):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response.encoding = meta["encoding"]
+    response.url = meta["url"]
+    response._content = body
+    response.from_cache = True
+    return response
+
+def _store(key, response, lifetime):
+    # A response that is never fresh is only worth storing if it can be revalidated.
+    if lifetime <= 0 and not ("ETag" in response.headers or "Last-Modified" in response.headers):
+        return
+
+    meta = {
+        "url": response.url,
+        "status": response.status_code,
+        "headers": dict(response.headers),
+        "encoding": response.encoding,
+        "expires_at": time.time() + lifetime,
+    }
+
+    meta_path, body_path = _entry_paths(key)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    data = json.dumps(meta).encode("utf-8")
+    with _cache_lock:
+        previous_size = sum(os.path.getsize(path) for path in (meta_path, body_path) if os.path.exists(path))
+        _write_atomic(body_path, response.content)
+        _write_atomic(meta_path, data)
+        _track_size(len(data) + len(response.content) - previous_size)
+
+def _update_meta(key, meta, response, lifetime):
+    meta["headers"].update({name: value for name, value in response.headers.items() if name in ("Date", "Cache-Control", "Expires", "ETag", "Last-Modified")})
+    meta["expires_at"] = time.time() + lifetime
+    _write_atomic(_entry_paths(key)[0], json.dumps(meta).encode("utf-8"))
+
+def _track_size(change):
+    """Adds `change` bytes to the cache size, and evicts the least recently used entries while it is too large."""
+    global _cache_bytes
+    if _cache_bytes is None:
+        _cache_bytes = sum(entry.stat().st_size for entry in os.scandir(CACHE_DIR) if entry.is_file())
+    else:
+        _cache_bytes += change
+    if _cache_bytes <= CACHE_MAX_BYTES:
+        return
+
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".json"):
+            key = entry.name[:-len(".json")]
+            size = sum(os.path.getsize(path) for path in _entry_paths(key) if os.path.exists(path))
+            entries.append((entry.stat().st_mtime, key, size))
+
+    # Evicts down to 90% of the limit, so the next few stores don't evict again.
+    for _, key, size in sorted(entries):
+        if _cache_bytes <= CACHE_MAX_BYTES * 0.9:
+            break
+        for path in _entry_paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _cache_bytes -= size
+
+def get(url, params=None, headers=None, ttl=None, cache=True, stale_if_error=False, **kwargs):
+    """
+    GETs `url` through the shared session and the response cache. Cached responses are `requests.Response`s too, with
+    `from_cache = True`.
+    """
+    import requests
+
+    if not cache:
+        return request("GET", url, params=params, headers=headers, **kwargs)
+
+    full_url = requests.Request("GET", url, params=params).prepare().url
+    key = _cache_key(full_url, headers)
+    meta, body = _load_entry(key)
+    if meta and meta["expires_at"] > time.time():
+        instrumentation.cache_hit("http_cache")
+        return _cached_response(meta, body)
+
+    conditional_headers = dict(headers or {})
+    if meta and "ETag" in meta["headers"]:
+        conditional_headers["If-None-Match"] = meta["headers"]["ETag"]
+    if meta and "Last-Modified" in meta["headers"]:
+        conditional_headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+    try:
+        response = request("GET", full_url, headers=conditional_headers, **kwargs)
+        if meta and stale_if_error and response.status_code >= 500:
+            response.raise_for_status()
+    except requests.RequestException as e:
+        if meta and stale_if_error:
+            print(f"Using the cached response for {url}, the request failed: {e}")
+            instrumentation.cache_hit("http_cache")
+            return _cached_response(meta, body)
+        raise
+
+    lifetime = _freshness_lifetime(response.headers, ttl)
+    if response.status_code == 304 and meta:
+        instrumentation.cache_hit("http_cache")
+        _update_meta(key, meta, response, lifetime or 0)
+        return _cached_response(meta, body)
+
+    instrumentation.cache_miss("http_cache")
+    response.from_cache = False
+    if response.status_code == 200 and lifetime is not None:
+        _store(key, response, lifetime)
+    return response
@@ -0,0 +1,192 @@
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import atexit
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+# Run instrumentation for the torrance_scripts pipelines.
+# ------------------
+# Scripts record what they spend their time on while they run, and a JSON run report is written when they exit:
+#   - stages: `with instrumentation.stage("fetch_acs"):` accumulates wall and CPU time, call count and the peak
+#     memory seen, so stages entered once per precinct or page show up as totals with their slowest call
+#   - laps: `instrumentation.lap("page")` at the top of a loop records each iteration as a call of that stage, without
+#     wrapping the loop body; call it once more after the loop to record the last iteration
+#   - counters: `instrumentation.count("failed_lookups")`
+#   - caches: `instrumentation.cache_hit("tract_cache")` / `cache_miss(...)`
+#   - HTTP: `instrument_requests()` records every `requests` call, and `http_request(url)` times any other request
+#     (e.g. `gpd.read_file(url)`), as counts per host and status and a latency histogram per host
+#
+# Only scripts that record stages, laps or counters opt in to a report. Cache and HTTP records, e.g. the ones
+# `http_client.py` makes for every script using it, don't register one on their own, and only show up in the report
+# of a script that does.
+#
+# Reports go to `RUN_REPORT_DIR` (default `run_reports`) as `<script>_<timestamp>.json`. Peak memory is the process'
+# max RSS; set `RUN_REPORT_TRACEMALLOC=1` to also track peak Python allocations per stage, which slows scripts down.
+# ------------------
+
+REPORT_DIR = os.environ.get("RUN_REPORT_DIR", "run_reports")
+TRACEMALLOC = os.environ.get("RUN_REPORT_TRACEMALLOC") == "1"
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+_started_at = datetime.now()
+_start = time.perf_counter()
+_stages = {}
+_counters = {}
+_caches = {}
+_http = {}
+_laps = {}
+_report_registered = False
+
+def _max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _register_report():
+    global _report_registered
+    if not _report_registered:
+        _report_registered = True
+        if TRACEMALLOC:
+            tracemalloc.start()
+        atexit.register(write_report)
+
+def _record_stage(name, seconds, cpu_seconds):
+    record = _stages.setdefault(name, {"calls": 0, "seconds": 0.0, "cpu_seconds": 0.0, "max_seconds": 0.0})
+    record["calls"] += 1
+    record["seconds"] += seconds
+    record["cpu_seconds"] += cpu_seconds
+    record["max_seconds"] = max(record["max_seconds"], seconds)
+    record["max_rss_mb"] = _max_rss_mb()
+    if TRACEMALLOC:
+        peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        record["peak_traced_mb"] = max(record.get("peak_traced_mb", 0), peak_mb)
+        tracemalloc.reset_peak()
+
+@contextmanager
+def stage(name):
+    _register_report()
+    if TRACEMALLOC:
+        tracemalloc.reset_peak()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        _record_stage(name, time.perf_counter() - start, time.process_time() - cpu_start)
+
+def lap(name):
+    _register_report()
+    now, cpu_now = time.perf_counter(), time.process_time()
+    if name in _laps:
+        start, cpu_start = _laps[name]
+        _record_stage(name, now - start, cpu_now - cpu_start)
+    _laps[name] = now, cpu_now
+
+def count(name, n=1):
+    _register_report()
+    _counters[name] = _counters.get(name, 0) + n
+
+def cache_hit(cache):
+    _caches.setdefault(cache, {"hits": 0, "misses": 0})["hits"] += 1
+
+def cache_miss(cache):
+    _caches.setdefault(cache, {"hits": 0, "misses": 0})["misses"] += 1
+
+def record_request(url, status, seconds):
+    host = urlsplit(url).netloc or url
+    record = _http.setdefault(host, {"requests": 0, "statuses": {}, "seconds": 0.0, "latencies_ms": []})
+    record["requests"] += 1
+    record["statuses"][str(status)] = record["statuses"].get(str(status), 0) + 1
+    record["seconds"] += seconds
+    record["latencies_ms"].append(seconds * 1000)
+
+@contextmanager
+def http_request(url):
+    """Times a request made outside of `requests`. Failures are recorded with the exception name as status."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_request(url, type(e).__name__, time.perf_counter() - start)
+        raise
+    record_request(url, "ok", time.perf_counter() - start)
+
+def instrument_requests():
+    """Records every request made through `requests` (including `requests.get`) in the run report."""
+    import requests
+
+    if getattr(requests.Session.request, "_instrumented", False):
+        return
+
+    original_request = requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = original_request(self, method, url, *args, **kwargs)
+        except Exception as e:
+            record_request(url, type(e).__name__, time.perf_counter() - start)
+            raise
+        record_request(url, response.status_code, time.perf_counter() - start)
+        return response
+
+    request._instrumented = True
+    requests.Session.request = request
+
+def _histogram(latencies_ms):
+    latencies_ms = sorted(latencies_ms)
+    buckets = {}
+    for bound in LATENCY_BUCKETS_MS:
+        buckets[f"<={bound}ms"] = sum(1 for latency in latencies_ms if latency <= bound)
+    buckets[f">{LATENCY_BUCKETS_MS[-1]}ms"] = sum(1 for latency in latencies_ms if latency > LATENCY_BUCKETS_MS[-1])
+
+    def percentile(p):
+        return round(latencies_ms[min(int(len(latencies_ms) * p), len(latencies_ms) - 1)], 1)
+
+    # Buckets are cumulative, like Prometheus histograms.
+    return {"buckets": buckets, "p50_ms": percentile(0.5), "p95_ms": percentile(0.95), "max_ms": round(latencies_ms[-1], 1)}
+
+def report():
+    return {
+        "script": os.path.basename(sys.argv[0]) or "python",
+        "argv": sys.argv[1:],
+        "started_at": _started_at.isoformat(timespec="seconds"),
+        "seconds": round(time.perf_counter() - _start, 3),
+        "cpu_seconds": round(time.process_time(), 3),
+        "max_rss_mb": _max_rss_mb(),
+        "stages": {
+            name: {key: round(value, 3) if isinstance(value, float) else value for key, value in record.items()}
+            for name, record in _stages.items()
+        },
+        "counters": _counters,
+        "caches": {
+            cache: {**record, "hit_rate": round(record["hits"] / max(record["hits"] + record["misses"], 1), 3)}
+            for cache, record in _caches.items()
+        },
+        "http": {
+            host: {
+                "requests": record["requests"],
+                "statuses": record["statuses"],
+                "seconds": round(record["seconds"], 3),
+                **_histogram(record["latencies_ms"]),
+            }
+            for host, record in _http.items()
+        },
+    }
+
+def write_report():
+    run_report = report()
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    script = os.path.splitext(run_report["script"])[0]
+    path = os.path.join(REPORT_DIR, f"{script}_{_started_at.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(run_report, f, indent=2)
+    print(f"📈 Run report saved: {path}")
+    return path
@@ -0,0 +1,52 @@
+import re
+
+from . import swift_lexer
+
+# Line statistics for source files.
+# ------------------
+# Counts total, blank, comment and code lines of a file. Totals come from `bytes.count` and blank lines from a
+# multiline regex over the whole buffer, so no Python code runs per line. Comment lines are found with the comment
+# and string tokenization of `swift_lexer.py`, so `/*` or `//` inside a string literal doesn't start a comment, and
+# nested `/* */` comments end where Swift ends them. Files without `//` or `/*` skip the tokenization.
+#
+# A line is a comment line when its only content is comments. Blank lines inside block comments count as blank.
+# ------------------
+
+LINE_FIELDS = ("total", "blank", "comment", "code")
+
+BLANK_LINE = re.compile(rb"^[ \t\r\f\v]*$", re.MULTILINE)
+
+
+def count_bytes(data, text=None):
+    """Counts the lines of a file's bytes. `text` is the decoded `data`, if the caller already has it."""
+    if not data:
+        return dict.fromkeys(LINE_FIELDS, 0)
+
+    total = data.count(b"\n") + (0 if data.endswith(b"\n") else 1)
+    # The final newline is followed by an empty match that isn't a line.
+    blank = len(BLANK_LINE.findall(data)) - (1 if data.endswith(b"\n") else 0)
+
+    comment = 0
+    if b"//" in data or b"/*" in data:
+        if text is None:
+            text = data.decode("utf-8", errors="replace")
+        comment = len(swift_lexer.comment_lines(text))
+
+    return {
+        "total": total,
+        "blank": blank,
+        "comment": comment,
+        "code": total - blank - comment,
+    }
+
+
+def count_file(path):
+    # One large buffered read per file.
+    with open(path, "rb") as f:
+        return count_bytes(f.read())
+
+
+def add(totals, counts):
+    for field in LINE_FIELDS:
+        totals[field] = totals.get(field, 0) + counts[field]
+    return totals
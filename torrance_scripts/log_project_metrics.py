@@ -1,183 +1,149 @@
 from collections import defaultdict
+from functools import partial
 from pathlib import Path
-from datetime import datetime
-
-from datadog_api_client import ApiClient, Configuration
-from datadog_api_client.v2.api.logs_api import LogsApi
-from datadog_api_client.v2.model.content_encoding import ContentEncoding
-from datadog_api_client.v2.model.http_log import HTTPLog
-from datadog_api_client.v2.model.http_log_item import HTTPLogItem
 
+import argparse
 import os
-import re
 import json
 
-# Retrieve all .swift files from the project path
-project_directory = os.environ['BITRISE_SOURCE_DIR']
-all_swift_files = list(Path(project_directory).rglob("*.swift"))
+from . import datadog_client
+from . import datadog_spool
+from . import line_stats
+from . import metrics_cache
+from . import swift_metrics
 
 # Path parts to exclude from processing. If a file path contains any of these values, processing logic
 # will be skipped.
 excluded_directories = ["BuildTools", "_EXTERNAL_LIBRARIES"]
 
-# Telemetry
-# ------------------
-# Directory for files with event definitions
-events_directory = os.path.join(project_directory, "Packages/Telemetry/Sources/Telemetry/Service/Events")
-all_event_files = list(Path(events_directory).rglob("Events+*.swift"))
-
-# Loops through all the files in the events directory and finds all the event declarations.
-# Searches specifically lines containing `= Event`, splits the line into words, then finds the word after
-# `let`. This means that `public static let someTelemetryEvent = Event(...` will parse into `someTelemetryEvent`
-# and will be saved to the `events` list as a tuple with the filename, e.g. (Events+Auth, someTelemetryEvent)
-events = []
-event_definition_pattern = re.compile("= Event")
-
-for file in all_event_files:
-  for line in open(file):
-    for match in re.finditer(event_definition_pattern, line):
-      split = line.split(" ")
-      events.append((file.stem, split[split.index("let") + 1]))
-
-# Creates the final usage mapping dict formatted as '{Domain: Usages}', e.g. 'Events+Auth: 15'
-# Domain is the file name in which the events were declared (minus the .swift), and usages is how times
-# the events declared in that file were used throughout the codebase.
-telemetry_usages = defaultdict(int)
-# ------------------
-
-# Tests
-# -----
-# Number of total test functions, e.g. lines containing `func test_` or `@Test`, grouped by {Package: Number}.
-test_usages = defaultdict(int)
-# Number of total test runs, e.g. number of times the tests run (some tests are run multiple times if they configured with arguments), grouped by {Package: Number}.
-test_runs = defaultdict(int)
-# -----
-
-# Meta
-# ----
-# Number of total lines of code in the codebase.
-total_lines = 0
-# Number of total files in the codebase.
-total_files = 0
-# ----
-
-def update_test_usages(file, test_usages_count):
-    test_domain = file.parts[file.parts.index("git") + 1]
-
-    if test_domain == "Packages":
-        test_domain = file.parts[file.parts.index("Packages") + 1]
+# Directory for files with event definitions, relative to the project directory.
+events_directory = "Packages/Telemetry/Sources/Telemetry/Service/Events"
 
-    if test_domain not in test_usages.keys():
-        test_usages[test_domain] = 0
+# Retrieves the domain from the file path, i.e. the top level directory within the project, or the package
+# name for files within `Packages`.
+def file_domain(file, project_directory):
+    parts = file.relative_to(project_directory).parts
+    domain = parts[0]
 
-    test_usages[test_domain] += test_usages_count
+    if domain == "Packages":
+        domain = parts[1]
 
-def update_test_runs(file, test_runs_count):
-    test_domain = file.parts[file.parts.index("git") + 1]
+    return domain
 
-    if test_domain == "Packages":
-        test_domain = file.parts[file.parts.index("Packages") + 1]
+def project_metrics(project_directory):
+    """Returns the telemetry, test and line count metrics of every .swift file in the project."""
+    # Retrieve all .swift files from the project path
+    all_swift_files = list(Path(project_directory).rglob("*.swift"))
 
-    if test_domain not in test_runs.keys():
-        test_runs[test_domain] = 0
-
-    test_runs[test_domain] += test_runs_count
-
-# Main loop through all .swift files
-for file in all_swift_files:
-  print(file)
-
-  # If the file path has any components within the excluded directories, ignore.
-  if bool(set(file.parts) & set(excluded_directories)):
-    continue
-
-  # Total number of files
-  total_files += 1
+    # Telemetry
+    # ------------------
+    all_event_files = list(Path(project_directory, events_directory).rglob("Events+*.swift"))
 
-  for line in open(file):
+    # Finds all the event declarations in the events directory. `public static let someTelemetryEvent = Event(...` is
+    # saved to the `events` list as a tuple with the filename, e.g. (Events+Auth, someTelemetryEvent)
+    events = swift_metrics.event_declarations(all_event_files)
 
-    # Total number of lines
-    if line.isspace() or line == "":
-      total_lines += 1
+    # Creates the final usage mapping dict formatted as '{Domain: Usages}', e.g. 'Events+Auth: 15'
+    # Domain is the file name in which the events were declared (minus the .swift), and usages is how times
+    # the events declared in that file were used throughout the codebase.
+    telemetry_usages = defaultdict(int)
+    # ------------------
 
     # Tests
     # -----
-    # Retrieves the test domain from the file path, and counts the number of usages of `func test_` (XCTest framework) and `@Test func` (Testing framework).
-    # within the files in that domain.
-    test_usage_pattern = re.compile("(func test|@Test func).+\(.*?\)")
-
-    if re.search(test_usage_pattern, line):
-      update_test_usages(file, 1)
-      update_test_runs(file, 1)
-
+    # Number of total test functions, e.g. lines containing `func test_` or `@Test`, grouped by {Package: Number}.
+    test_usages = defaultdict(int)
+    # Number of total test runs, e.g. number of times the tests run (some tests are run multiple times if they configured with arguments), grouped by {Package: Number}.
+    test_runs = defaultdict(int)
     # -----
 
-    # Telemetry
-    # ---------
-    # Excludes files in the Telemetry package from being read as usages
-    if "Packages/Telemetry" not in str(file):
-
-      # Loops through all the event names, and attempts to find lines of code containing `Telemetry.*someTelemetryEvent`.
-      # Counts all the usages and associates them with the file name in which the event was declared.
-      for event in events:
-        event_usage_pattern = re.compile(f"Telemetry\\..+{event[1]}")
-
-        if re.search(event_usage_pattern, line):
-          telemetry_usages[event[0]] += 1
-    # ---------
-    # Add more metrics here
-
-  # Counts the number of usages arguments in `@Test\(arguments: []` as each argument is a separate test run. Since arguments are usually formatted to occur over several lines, the entire file needs to be read to extract the arguments.
-  text_file = open(file, 'r')
-  file_text = text_file.read()
-  text_file.close()
-  test_usage_pattern_with_arguments = re.compile(r'@Test\(arguments: \[.*?\]\)', re.DOTALL)
-  for match in re.finditer(test_usage_pattern_with_arguments, file_text):
-    if match.group(0):
-    # Due to the variety of ways arguments can be  formatted, we won't catch every type of argument with this method. This means the number of test runs is undercounted but at least we'll catch the majority of test runs.
-      pattern = re.compile(r'\[(.*?)\]', re.DOTALL) # Get the array content inside the brackets
-      result = re.search(pattern, match.group(0))
-      if result:
-        clean_content = result.group(1).strip()
-        pattern = re.compile(r',\s*(?![^()]*\))', re.DOTALL) # Split the array content by comma, ignoring commas inside brackets and parentheses
-        items = re.split(pattern, clean_content)
-        update_test_usages(file, 1) # Increment the number of test functions by 1
-        update_test_runs(file, len(items)) # Increment the number of test runs by the number of arguments
-
-payload = {
-  "message": "project_metrics_payload",
-  "telemetry": {
-    "total_event_domains": len(telemetry_usages.keys()),
-    "total_event_definitions": len(events),
-    "total_event_usages": sum(telemetry_usages.values()),
-    "usage_by_domain": telemetry_usages,
-  },
-  "tests": {
-    "total_tests": sum(test_usages.values()),
-    "total_test_runs": sum(test_runs.values()),
-    "tests_by_domain": test_usages,
-    "test_runs_by_domain": test_runs,
-  },
-  "total_lines": total_lines,
-  "total_files": total_files,
-}
-
-body = HTTPLog(
-  [
-    HTTPLogItem(
-      ddsource="ios",
-      ddtags="env:production",
-      message=json.dumps(payload),
-      service="maven-clinic-ios",
-    ),
-  ]
-)
-
-configuration = Configuration()
-configuration.api_key["apiKeyAuth"] = os.environ['DATADOG_API_KEY']
-configuration.server_variables["site"] = "datadoghq.com"
-
-with ApiClient(configuration) as api_client:
-  api_instance = LogsApi(api_client)
-  response = api_instance.submit_log(body=body)
-  print(response)
+    # Meta
+    # ----
+    # Number of total, blank, comment and code lines in the codebase, see `line_stats.py`.
+    lines = {}
+    # Number of total, blank, comment and code lines, grouped by {Package: Lines}.
+    lines_by_domain = defaultdict(dict)
+    # Number of total files in the codebase.
+    total_files = 0
+    # ----
+
+    # If the file path has any components within the excluded directories, ignore.
+    scanned_files = [file for file in all_swift_files if not set(file.parts) & set(excluded_directories)]
+
+    # Only files whose content changed since the previous build are rescanned, see `metrics_cache.py`.
+    # Changed files are scanned in parallel by `swift_metrics.scan_project_file`, see `parallel_scan.py`.
+    scan_file = partial(swift_metrics.scan_project_file, events=events)
+    scan_results = metrics_cache.cached_scan("project_metrics", project_directory, scanned_files, scan_file, context=(swift_metrics.SCAN_VERSION, events))
+
+    # Main loop through all .swift files
+    for file in scanned_files:
+        print(file)
+        result = scan_results[file]
+        domain = file_domain(file, project_directory)
+
+        # Total number of files
+        total_files += 1
+
+        # Line counts
+        line_stats.add(lines, result["lines"])
+        line_stats.add(lines_by_domain[domain], result["lines"])
+
+        # Retrieves the test domain from the file path, and aggregates the tests found within the files in that domain.
+        if result["tests"]:
+            test_usages[domain] += result["tests"]
+        if result["test_runs"]:
+            test_runs[domain] += result["test_runs"]
+
+        for event_domain, count in result["telemetry"].items():
+            telemetry_usages[event_domain] += count
+
+    return {
+        "message": "project_metrics_payload",
+        "telemetry": {
+            "total_event_domains": len(telemetry_usages.keys()),
+            "total_event_definitions": len(events),
+            "total_event_usages": sum(telemetry_usages.values()),
+            "usage_by_domain": telemetry_usages,
+        },
+        "tests": {
+            "total_tests": sum(test_usages.values()),
+            "total_test_runs": sum(test_runs.values()),
+            "tests_by_domain": test_usages,
+            "test_runs_by_domain": test_runs,
+        },
+        "total_lines": lines.get("total", 0),
+        "lines": {
+            "total_lines": lines.get("total", 0),
+            "code_lines": lines.get("code", 0),
+            "comment_lines": lines.get("comment", 0),
+            "blank_lines": lines.get("blank", 0),
+            "lines_by_domain": lines_by_domain,
+        },
+        "total_files": total_files,
+    }
+
+def log_project_metrics(project_directory):
+    payload = project_metrics(project_directory)
+
+    log_item = datadog_client.log_item(
+        ddsource="ios",
+        ddtags="env:production",
+        message=json.dumps(payload),
+        service="maven-clinic-ios",
+    )
+
+    # Spooled and flushed in the background, see `datadog_spool.py`.
+    datadog_spool.spool_logs([log_item])
+    return payload
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Logs the telemetry, test and line count metrics of the iOS project to Datadog.")
+    parser.add_argument("--project-dir", default=os.environ.get("BITRISE_SOURCE_DIR"), help="Defaults to $BITRISE_SOURCE_DIR")
+    args = parser.parse_args(argv)
+    if not args.project_dir:
+        parser.error("--project-dir or BITRISE_SOURCE_DIR is required")
+
+    log_project_metrics(args.project_dir)
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,32 @@
-from datadog_api_client import ApiClient, Configuration
-from datadog_api_client.v1.api.events_api import EventsApi
-from datadog_api_client.v1.model.event_create_request import EventCreateRequest
+import argparse
 import os
 
-version = os.environ['RM_RELEASE_VERSION']
+from . import datadog_client
 
-body = EventCreateRequest(
-	title="Maven iOS App Version {version} Released".format(version=version),
-	text="Rollout for Maven iOS version {version} has been initiated.".format(version=version),
-	tags=[
-		"source:bitrise",
-		"project:ios",
-		"service:maven-clinic-ios",
-		"environment:production"
-	],
-)
+def log_release(version):
+	body = datadog_client.event(
+		title="Maven iOS App Version {version} Released".format(version=version),
+		text="Rollout for Maven iOS version {version} has been initiated.".format(version=version),
+		tags=[
+			"source:bitrise",
+			"project:ios",
+			"service:maven-clinic-ios",
+			"environment:production"
+		],
+	)
 
-configuration = Configuration()
-configuration.api_key["apiKeyAuth"] = os.environ['DATADOG_API_KEY']
-configuration.server_variables["site"] = "datadoghq.com"
+	response = datadog_client.create_event(body)
+	print(response)
+	return response
 
-with ApiClient(configuration) as api_client:
-  api_instance = EventsApi(api_client)
-  response = api_instance.create_event(body=body)
-  print(response)
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Logs a Datadog event for an iOS app release.")
+	parser.add_argument("--version", default=os.environ.get("RM_RELEASE_VERSION"), help="Defaults to $RM_RELEASE_VERSION")
+	args = parser.parse_args(argv)
+	if not args.version:
+		parser.error("--version or RM_RELEASE_VERSION is required")
+
+	log_release(args.version)
+
+if __name__ == "__main__":
+	main()
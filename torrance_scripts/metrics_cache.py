@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+
+from . import parallel_scan
+
+# Per-file results cache for the CI code metrics scripts.
+# ------------------
+# Every scanned file is keyed by its path relative to the project root plus its git blob SHA, so a file only
+# needs to be rescanned when its content changes. The cache is a single JSON file that lives in
+# `METRICS_CACHE_DIR` (default `~/.cache/ci_metrics`); add that directory to the Bitrise cache step so it is
+# restored on the next build.
+#
+# Each cache also stores a fingerprint of whatever the per-file results depend on besides the file itself
+# (e.g. the list of telemetry events, or the design system components). When the fingerprint changes the whole
+# cache is discarded, since every cached result could be stale.
+# ------------------
+
+CACHE_VERSION = 1
+CACHE_DIR = os.environ.get("METRICS_CACHE_DIR", os.path.join(Path.home(), ".cache", "ci_metrics"))
+
+
+def git_blob_sha(path):
+    # Same hash `git hash-object` produces, so it matches the SHAs listed by `git ls-files -s`.
+    data = Path(path).read_bytes()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _git_lines(project_directory, *args):
+    result = subprocess.run(["git", *args], cwd=project_directory, check=True, capture_output=True)
+    return [line for line in result.stdout.decode("utf-8", "surrogateescape").split("\0") if line]
+
+
+def content_hashes(project_directory, files):
+    """Returns {relative path: blob SHA} for `files`, using the git index wherever it is up to date."""
+    project_directory = Path(project_directory).resolve()
+    index_shas = {}
+
+    try:
+        # `-s` lines look like `<mode> <sha> <stage>\t<path>`.
+        for line in _git_lines(project_directory, "ls-files", "-s", "-z"):
+            meta, path = line.split("\t", 1)
+            index_shas[path] = meta.split(" ")[1]
+
+        # Files modified in the working tree no longer match their index entry.
+        for path in _git_lines(project_directory, "ls-files", "-m", "-z"):
+            index_shas.pop(path, None)
+    except (OSError, subprocess.CalledProcessError):
+        print("Git index unavailable, hashing file contents directly.")
+
+    hashes = {}
+    for file in files:
+        relative_path = Path(file).resolve().relative_to(project_directory).as_posix()
+        hashes[relative_path] = index_shas.get(relative_path) or git_blob_sha(file)
+
+    return hashes
+
+
+def fingerprint(*context):
+    return hashlib.sha1(json.dumps([CACHE_VERSION, context], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def cache_path(name):
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+
+def load_cache(name, context_fingerprint):
+    """Returns the cached {relative path: {"hash": ..., "result": ...}} entries, or {} if stale or missing."""
+    try:
+        with open(cache_path(name)) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get("fingerprint") != context_fingerprint:
+        print(f"Metrics cache '{name}' is stale, rescanning all files.")
+        return {}
+
+    return cache.get("files", {})
+
+
+def save_cache(name, context_fingerprint, entries):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = cache_path(name) + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"fingerprint": context_fingerprint, "files": entries}, f)
+    os.replace(temp_path, cache_path(name))
+
+
+def cached_scan(name, project_directory, files, scan, context=()):
+    """
+    Runs `scan(file)` on every file whose content changed since the cached build and returns
+    {file: result} for all `files`, in the order given. Results must be JSON serializable.
+    """
+    context_fingerprint = fingerprint(name, context)
+    cached = load_cache(name, context_fingerprint)
+    hashes = content_hashes(project_directory, files)
+    project_directory = Path(project_directory).resolve()
+
+    relative_paths = {file: Path(file).resolve().relative_to(project_directory).as_posix() for file in files}
+    stale_files = [
+        file for file, relative_path in relative_paths.items()
+        if cached.get(relative_path, {}).get("hash") != hashes[relative_path]
+    ]
+
+    # Changed files are fanned out to a process pool, see `parallel_scan.py`.
+    for file, result in zip(stale_files, parallel_scan.scan_files(scan, stale_files)):
+        cached[relative_paths[file]] = {"hash": hashes[relative_paths[file]], "result": result}
+
+    results = {}
+    entries = {}
+    for file, relative_path in relative_paths.items():
+        entries[relative_path] = cached[relative_path]
+        results[file] = entries[relative_path]["result"]
+
+    print(f"Metrics cache '{name}': rescanned {len(stale_files)} of {len(files)} files.")
+    save_cache(name, context_fingerprint, entries)
+    return results
@@ -1,22 +1,32 @@
+import argparse
 import os
 import json
-import requests
-import re
-from google import genai
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from . import diff_parser
+from . import http_client
+from . import prompt_packer
+from . import summary_cache
 
 GITLAB_PROJECT_ID = os.getenv('CI_MERGE_REQUEST_PROJECT_ID')
 GITLAB_MR_IID = os.getenv('CI_MERGE_REQUEST_IID')
 GITLAB_API_URL = os.getenv('CI_API_V4_URL')
 GITLAB_TOKEN = os.getenv('GITLAB_TOKEN')
 GEMINI_API_KEY_QA1 = os.getenv('GEMINI_API_KEY_QA1')
+# Benchmarks point the Gemini client at a local stub.
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')
 BOT_COMMENT_HEADER = "✨ **MR Summary by Gemini:**"
 CI_PROJECT_DIR = os.getenv('CI_PROJECT_DIR')
 
-MAX_PROMPT_CHARS = 800000
+# Larger MRs are summarized in groups of files, see `get_gemini_summary_for_mr`.
 MAX_FILES_TO_ANALYZE = 40
+MAX_FETCH_WORKERS = 16
+NOTES_PER_PAGE = 100
 
 def get_mr_details():
+    import requests
+
     if not all([GITLAB_PROJECT_ID, GITLAB_MR_IID, GITLAB_TOKEN]):
         print("Error: Missing GitLab environment variables.")
         return None, None, None, None
@@ -24,15 +34,19 @@ def get_mr_details():
     mr_url = f"{GITLAB_API_URL}/projects/{GITLAB_PROJECT_ID}/merge_requests/{GITLAB_MR_IID}"
     changes_url = f"{mr_url}/changes"
 
+    # GitLab responses are private and change with every push, so none of them are cached on disk.
+    def get_json(url):
+        response = http_client.get(url, headers=headers, cache=False)
+        response.raise_for_status()
+        return response.json()
+
     try:
-        mr_response = requests.get(mr_url, headers=headers)
-        mr_response.raise_for_status()
-        mr_data = mr_response.json()
-
-        changes_response = requests.get(changes_url, headers=headers)
-        changes_response.raise_for_status()
-        changes_data = changes_response.json()
-        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            mr_future = executor.submit(get_json, mr_url)
+            changes_future = executor.submit(get_json, changes_url)
+            mr_data = mr_future.result()
+            changes_data = changes_future.result()
+
         mr_title = mr_data.get('title', '')
         mr_description = mr_data.get('description', '')
 
@@ -42,29 +56,56 @@ def get_mr_details():
         return None, None, None, None
 
 def get_existing_summary_comment_id(project_id, mr_iid, api_url, gitlab_token):
+    import requests
+
     url = f"{api_url}/projects/{project_id}/merge_requests/{mr_iid}/notes"
     headers = {"PRIVATE-TOKEN": gitlab_token}
     
+    params = {"per_page": NOTES_PER_PAGE, "page": 1}
+
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        notes = response.json()
-        
-        for note in notes:
-            if not note.get('position') and note['body'].startswith(BOT_COMMENT_HEADER):
-                return note['id']
+        # Notes are paginated, follow `X-Next-Page` until the bot's comment is found or there are no pages left.
+        while params["page"]:
+            response = http_client.get(url, headers=headers, params=params, cache=False)
+            response.raise_for_status()
+            notes = response.json()
+
+            for note in notes:
+                if not note.get('position') and note['body'].startswith(BOT_COMMENT_HEADER):
+                    return note['id']
+
+            params["page"] = response.headers.get("X-Next-Page")
         return None
     except requests.exceptions.RequestException as e:
         print(f"Error checking for existing summary comment: {e}")
         print(f"Response Body: {e.response.text if hasattr(e.response, 'text') else 'N/A'}")
         return None
 
+def get_file_content_from_git(project_dir, file_path, ref_sha):
+    # The pipeline's checkout already has both the base and head commits, which is much faster than the API.
+    if not project_dir:
+        return None
+    try:
+        command = ["git", "show", f"{ref_sha}:{file_path}"]
+        result = subprocess.run(command, cwd=project_dir, check=True, capture_output=True)
+        return result.stdout.decode("utf-8", errors="replace")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def get_file_content(project_id, file_path, ref_sha, api_url, gitlab_token):
+    content = get_file_content_from_git(CI_PROJECT_DIR, file_path, ref_sha)
+    if content is None:
+        content = get_file_content_from_gitlab(project_id, file_path, ref_sha, api_url, gitlab_token)
+    return content
+
 def get_file_content_from_gitlab(project_id, file_path, ref_sha, api_url, gitlab_token):
+    import requests
+
     encoded_file_path = requests.utils.quote(file_path, safe='')
     url = f"{api_url}/projects/{project_id}/repository/files/{encoded_file_path}/raw?ref={ref_sha}"
     headers = {"PRIVATE-TOKEN": gitlab_token}
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers, cache=False)
         response.raise_for_status()
         return response.text
     except requests.exceptions.RequestException as e:
@@ -72,72 +113,27 @@ def get_file_content_from_gitlab(project_id, file_path, ref_sha, api_url, gitlab
         print(f"Response Body: {e.response.text if hasattr(e.response, 'text') else 'N/A'}")
         return None
 
-def get_git_diff_for_file(project_dir, base_sha, head_sha, file_path_to_diff):
+def get_git_diffs(project_dir, base_sha, head_sha):
+    # One `git diff` for the whole MR instead of one process per file. Renames are shown as a deletion plus an
+    # addition, which is what diffing a single path produces.
+    command = ["git", "-c", "core.quotePath=false", "diff", "--no-renames", base_sha, head_sha]
     try:
-        command = ["git", "diff", base_sha, head_sha, "--", file_path_to_diff]
-        result = subprocess.run(command, cwd=project_dir, check=True, capture_output=True, text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"Error generating git diff for {file_path_to_diff}: {e.stderr}")
-        return None
+        with subprocess.Popen(command, cwd=project_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace") as process:
+            diffs = diff_parser.split_git_diff(process.stdout)
+            stderr = process.stderr.read()
+        if process.returncode:
+            print(f"Error generating git diff for {base_sha}..{head_sha}: {stderr}")
+            return None
+        return diffs
     except Exception as e:
-        print(f"Unexpected error in get_git_diff_for_file: {e}")
+        print(f"Unexpected error in get_git_diffs: {e}")
         return None
 
-def parse_diff_lines_robust(diff_string):
-    current_line_num_new = 0
-    
-    for line in diff_string.split('\n'):
-        if line.startswith('@@'):
-            try:
-                match = re.search(r'\+(\d+)(,\d+)?', line)
-                if match:
-                    current_line_num_new = int(match.group(1))
-                else:
-                    current_line_num_new = 0
-            except (ValueError, IndexError):
-                current_line_num_new = 0
-            yield (0, line, '@@')
-            continue
-        
-        if not current_line_num_new:
-            continue
-
-        line_type = line[0] if len(line) > 0 else ' '
-        content = line[1:] if len(line) > 0 else ''
-
-        if line_type == '-':
-            yield (0, content, '-')
-        elif line_type == '+':
-            yield (current_line_num_new, content, '+')
-            current_line_num_new += 1
-        else:
-            yield (current_line_num_new, content, ' ')
-            current_line_num_new += 1
-
-def format_diff_for_llm(diff_string):
-    formatted_lines = []
-    for line_num, content, line_type in parse_diff_lines_robust(diff_string):
-        if line_type == '@@':
-            formatted_lines.append(content)
-        elif line_type == '-':
-            formatted_lines.append(f"   : -{content}")
-        elif line_type in ['+', ' ']:
-            formatted_lines.append(f"{str(line_num).ljust(3)}: {line_type}{content}")
-    return "\n".join(formatted_lines)
-
-def get_gemini_summary_for_mr(all_files_data, mr_title, mr_description):
-    if not GEMINI_API_KEY_QA1:
-        print("Error: GEMINI_API_KEY_QA1 is not set.")
-        return None
-        
-    client = genai.Client(api_key=GEMINI_API_KEY_QA1)
-    
-    prompt_parts = [
-        f"""
+def summary_instructions(mr_title, mr_description, input_description):
+    return f"""
 You are a staff-level software engineer and a highly skilled technical writer. 
 Your task is to analyze a Merge Request and provide a concise yet detailed summary of its changes. 
-You will be provided with the MR's title and description, and then details for each changed file (full content after changes, optionally full content before changes, and the numbered diff).
+You will be provided with the MR's title and description, and then {input_description}
 
 **Merge Request Title:** {mr_title}
 **Merge Request Description:**
@@ -158,90 +154,213 @@ Your summary should:
 Divide your summary into two sections:
 1. Key changes, a high level summary of the most important changes. Keep the description to less than 3 sentences.
 2. Notable Patterns / Improvements, a more detailed summary of the changes. Focus on only the most important changes.
+"""
 
---- Start of Changed Files Data ---
+FILES_INPUT_DESCRIPTION = "details for each changed file (the full content after changes or numbered excerpts around the changes, optionally the full content before changes, and the numbered diff)."
+
+def files_data_block(sections):
+    return "\n".join(["--- Start of Changed Files Data ---", *sections, "--- End of Changed Files Data ---"])
+
+def map_prompt(mr_title, sections):
+    return f"""
+You are a staff-level software engineer summarizing one part of a large Merge Request titled "{mr_title}".
+For each changed file below, describe its changes in at most 3 concise, objective bullet points formatted in Markdown.
+Start the summary of each file with a line containing only `#### ` followed by the file's path.
+For entirely new files, only state that the file was added and its high-level purpose.
+Do not evaluate the merit of the changes.
+
+{files_data_block(sections)}
 """
-    ]
 
-    for file_data in all_files_data:
-        prompt_parts.append(f"""
-### File: {file_data['new_path']}
-""")
-        if file_data.get('old_file_content'):
-            prompt_parts.append(f"""
-Full File Content (Before Changes):
-```swift
-{file_data['old_file_content']}
-```
-""")
-        
-        prompt_parts.append(f"""
-Full File Content (After Changes):
-```swift
-{file_data['full_file_content']}
-```
-
-Numbered Diff for {file_data['new_path']}:
-```diff
-{file_data['formatted_diff']}
-```
-""")
-    
-    prompt_parts.append("--- End of Changed Files Data ---")
-    
-    final_prompt = "\n".join(prompt_parts)
+def split_file_summaries(group_summary, paths):
+    """Splits a map summary into {path: summary} using the `#### path` lines it was asked to start each file with."""
+    file_summaries = {}
+    path = None
+    for line in group_summary.split("\n"):
+        heading = line[4:].strip().strip("`*") if line.startswith("####") else None
+        if heading in paths:
+            path = heading
+            file_summaries[path] = []
+        elif path:
+            file_summaries[path].append(line)
+    return {path: "\n".join(lines).strip() for path, lines in file_summaries.items()}
+
+def gemini_generate(prompt):
+    from google import genai
+
+    http_options = {"base_url": GEMINI_BASE_URL} if GEMINI_BASE_URL else None
+    client = genai.Client(api_key=GEMINI_API_KEY_QA1, http_options=http_options)
+    response = client.models.generate_content(
+        model='gemini-2.5-pro',
+        contents=prompt
+    )
+    return response.text
+
+def get_gemini_summary_for_mr(all_files_data, mr_title, mr_description, generate=gemini_generate, file_summaries=None):
+    """
+    An MR that fits in a single prompt is summarized in one request, from the diffs themselves, and larger ones with
+    map-reduce. `file_summaries` is a {diff hash: summary} cache (see `summary_cache.py`): when some of the MR's files
+    have a cached summary, e.g. on an incremental push, the MR is map-reduced too, so that only the files whose diffs
+    changed are summarized again. The summaries of newly mapped files are added to the cache.
+    """
+    if generate is gemini_generate and not GEMINI_API_KEY_QA1:
+        print("Error: GEMINI_API_KEY_QA1 is not set.")
+        return None
 
-    if len(final_prompt) > MAX_PROMPT_CHARS:
-        print(f"Warning: Total prompt size ({len(final_prompt)} chars) exceeds MAX_PROMPT_CHARS ({MAX_PROMPT_CHARS} chars).")
-        print("Skipping combined summary review. This MR is too large for a single AI request.")
+    if file_summaries is None:
+        file_summaries = {}
+
+    # Every file gets a token-budgeted section, see `prompt_packer.py`.
+    sections = [(file_data['new_path'], prompt_packer.file_section(file_data)) for file_data in all_files_data]
+    diff_hashes = {file_data['new_path']: summary_cache.diff_hash(file_data) for file_data in all_files_data}
+
+    if not any(diff_hashes[path] in file_summaries for path, section in sections):
+        single_prompt = "\n".join([
+            summary_instructions(mr_title, mr_description, FILES_INPUT_DESCRIPTION),
+            files_data_block([section for path, section in sections]),
+        ])
+        if len(sections) <= MAX_FILES_TO_ANALYZE and prompt_packer.estimate_tokens(single_prompt) <= prompt_packer.PROMPT_TOKEN_BUDGET:
+            try:
+                return generate(single_prompt)
+            except Exception as e:
+                print(f"Error communicating with Gemini API (combined summary review): {e}")
+                return None
+
+    # Summarizes the files without a cached summary in groups, concurrently, then merges all the file summaries.
+    cached_summaries = [
+        f"#### {path}\n{file_summaries[diff_hashes[path]]}"
+        for path, section in sections
+        if diff_hashes[path] in file_summaries
+    ]
+    sections = [(path, section) for path, section in sections if diff_hashes[path] not in file_summaries]
+
+    group_budget = prompt_packer.PROMPT_TOKEN_BUDGET - prompt_packer.estimate_tokens(map_prompt(mr_title, []))
+    groups = prompt_packer.pack_groups(sections, group_budget, max_items=MAX_FILES_TO_ANALYZE)
+    omitted_paths = [path for group in groups[prompt_packer.MAX_MAP_GROUPS:] for path, section in group]
+    groups = groups[:prompt_packer.MAX_MAP_GROUPS]
+    print(f"Summarizing {len(sections)} files in {len(groups)} groups ({len(cached_summaries)} cached, {len(omitted_paths)} omitted).")
+
+    def summarize_group(group):
+        try:
+            return generate(map_prompt(mr_title, [section for path, section in group]))
+        except Exception as e:
+            print(f"Error communicating with Gemini API (file group summary): {e}")
+            omitted_paths.extend(path for path, section in group)
+            return None
+
+    group_summaries = []
+    if groups:
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            for group, group_summary in zip(groups, executor.map(summarize_group, groups)):
+                if not group_summary:
+                    continue
+                group_summaries.append(group_summary)
+                for path, file_summary in split_file_summaries(group_summary, {path for path, section in group}).items():
+                    file_summaries[diff_hashes[path]] = file_summary
+
+    if not group_summaries and not cached_summaries:
         return None
 
-    try:
-        response = client.models.generate_content(
-            model='gemini-2.5-pro',
-            contents=final_prompt
-        )
-        return response.text
+    reduce_parts = [
+        summary_instructions(mr_title, mr_description, "summaries of the changes in each group of changed files."),
+        "--- Start of File Group Summaries ---",
+        *cached_summaries,
+        *group_summaries,
+        "--- End of File Group Summaries ---",
+    ]
+    if omitted_paths:
+        reduce_parts.append("These files were also changed, but are too large to be summarized:\n" + "\n".join(f"- {path}" for path in omitted_paths))
 
+    try:
+        return generate("\n".join(reduce_parts))
     except Exception as e:
         print(f"Error communicating with Gemini API (combined summary review): {e}")
         return None
 
 def post_summary_comment(comment_body, project_id, mr_iid, api_url, gitlab_token, existing_note_id=None):
+    import requests
+
     headers = {"PRIVATE-TOKEN": gitlab_token}
     data = {"body": comment_body}
 
     if existing_note_id:
         url = f"{api_url}/projects/{project_id}/merge_requests/{mr_iid}/notes/{existing_note_id}"
-        method = requests.put
+        method = "PUT"
     else:
         url = f"{api_url}/projects/{project_id}/merge_requests/{mr_iid}/notes"
-        method = requests.post
+        method = "POST"
 
     try:
-        response = method(url, headers=headers, data=data)
+        response = http_client.request(method, url, headers=headers, data=data)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"Error posting summary comment to GitLab. Status Code: {e.response.status_code}")
         print(f"Response Body: {e.response.text if hasattr(e.response, 'text') else 'N/A'}")
 
-if __name__ == "__main__":
-    existing_summary_comment_id = get_existing_summary_comment_id(
-        GITLAB_PROJECT_ID, GITLAB_MR_IID, GITLAB_API_URL, GITLAB_TOKEN
-    )
+def collect_file_data(file_change, position_shas, diffs):
+    file_path_for_git = file_change.get('new_path') or file_change.get('old_path')
+    if not file_path_for_git:
+        return None
+
+    if not file_change.get('new_file') and not file_change.get('deleted_file') and not file_change.get('renamed_file') and not file_change.get('new_path') and not file_change.get('old_path'):
+        return None
+
+    current_file_diff = diffs.get(file_path_for_git)
+
+    if current_file_diff is None or not current_file_diff.strip():
+        return None
+
+    full_file_content = ""
+    if not file_change.get('deleted_file'): 
+        full_file_content = get_file_content(
+            GITLAB_PROJECT_ID, 
+            file_change['new_path'], 
+            position_shas['head_sha'], 
+            GITLAB_API_URL, 
+            GITLAB_TOKEN
+        )
+        if full_file_content is None:
+            full_file_content = ""
+
+    numbered_diff, changed_lines = diff_parser.number_diff(current_file_diff)
 
-    mr_data, changes, mr_title, mr_description = get_mr_details()
+    old_file_content = ""
+    if not file_change.get('new_file', False) and file_change.get('old_path'):
+        old_file_content = get_file_content(
+            GITLAB_PROJECT_ID, 
+            file_change['old_path'], 
+            position_shas['base_sha'], 
+            GITLAB_API_URL, 
+            GITLAB_TOKEN
+        )
+        if not old_file_content:
+            old_file_content = ""
+
+    return {
+        'new_path': file_change.get('new_path', file_path_for_git),
+        'old_path': file_change.get('old_path', file_path_for_git),
+        'full_file_content': full_file_content,
+        'old_file_content': old_file_content,
+        'formatted_diff': numbered_diff,
+        'changed_lines': changed_lines
+    }
+
+def summarize_merge_request():
+    """Summarizes the CI merge request with Gemini and posts, or updates, the summary comment. Returns the summary."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        existing_summary_comment_future = executor.submit(
+            get_existing_summary_comment_id, GITLAB_PROJECT_ID, GITLAB_MR_IID, GITLAB_API_URL, GITLAB_TOKEN
+        )
+        mr_data, changes, mr_title, mr_description = get_mr_details()
+        existing_summary_comment_id = existing_summary_comment_future.result()
 
     if not mr_data or not changes or mr_title is None or mr_description is None:
-        exit()
+        return
 
     files_to_review = changes
 
     if not files_to_review:
-        exit()
-    if len(files_to_review) > MAX_FILES_TO_ANALYZE:
-        print(f"Skipping combined summary review due to file count: more than {MAX_FILES_TO_ANALYZE} files were changed.")
-        exit()
+        return
 
     position_shas = {
         "base_sha": mr_data['diff_refs']['base_sha'],
@@ -249,65 +368,51 @@ if __name__ == "__main__":
         "head_sha": mr_data['diff_refs']['head_sha'],
     }
     
-    all_files_data = []
-
-    for file_change in files_to_review:
-        file_path_for_git = file_change.get('new_path') or file_change.get('old_path')
-        if not file_path_for_git:
-            continue
-        
-        if not file_change.get('new_file') and not file_change.get('deleted_file') and not file_change.get('renamed_file') and not file_change.get('new_path') and not file_change.get('old_path'):
-            continue
-        
-        current_file_diff = get_git_diff_for_file(
-            CI_PROJECT_DIR, 
-            position_shas['base_sha'], 
-            position_shas['head_sha'], 
-            file_path_for_git
-        )
+    diffs = get_git_diffs(CI_PROJECT_DIR, position_shas['base_sha'], position_shas['head_sha'])
+    if diffs is None:
+        return
+
+    # Files are collected concurrently, in the order GitLab lists them.
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        all_files_data = [
+            file_data
+            for file_data in executor.map(lambda file_change: collect_file_data(file_change, position_shas, diffs), files_to_review)
+            if file_data
+        ]
 
-        if current_file_diff is None or not current_file_diff.strip():
-            continue
-        
-        full_file_content = ""
-        if not file_change.get('deleted_file'): 
-            full_file_content = get_file_content_from_gitlab(
-                GITLAB_PROJECT_ID, 
-                file_change['new_path'], 
-                position_shas['head_sha'], 
-                GITLAB_API_URL, 
-                GITLAB_TOKEN
-            )
-            if full_file_content is None:
-                full_file_content = ""
-
-        numbered_diff = format_diff_for_llm(current_file_diff)
-        
-        old_file_content = ""
-        if not file_change.get('new_file', False) and file_change.get('old_path'):
-            old_file_content = get_file_content_from_gitlab(
-                GITLAB_PROJECT_ID, 
-                file_change['old_path'], 
-                position_shas['base_sha'], 
-                GITLAB_API_URL, 
-                GITLAB_TOKEN
-            )
-            if not old_file_content:
-                old_file_content = ""
-
-        all_files_data.append({
-            'new_path': file_change.get('new_path', file_path_for_git),
-            'old_path': file_change.get('old_path', file_path_for_git),
-            'full_file_content': full_file_content,
-            'old_file_content': old_file_content,
-            'formatted_diff': numbered_diff
-        })
-    
     if not all_files_data:
-        exit()
+        return
 
-    summary_text = get_gemini_summary_for_mr(all_files_data, mr_title, mr_description)
+    # Reruns for the same push reuse the previous summary, and incremental pushes only summarize changed files again.
+    summary_key = summary_cache.mr_summary_key(position_shas['head_sha'], mr_title, mr_description, all_files_data)
+    summary_text = summary_cache.load_summaries("mr_summaries").get(summary_key)
+
+    if summary_text:
+        print("Using the cached summary for this MR.")
+        summary_cache.touch("mr_summaries", [summary_key])
+    else:
+        file_summaries = summary_cache.load_summaries("file_summaries")
+        cached_file_summaries = dict(file_summaries)
+        summary_text = get_gemini_summary_for_mr(all_files_data, mr_title, mr_description, file_summaries=file_summaries)
+
+        summary_cache.touch("file_summaries", [summary_cache.diff_hash(file_data) for file_data in all_files_data])
+        new_file_summaries = {key: summary for key, summary in file_summaries.items() if key not in cached_file_summaries}
+        if new_file_summaries:
+            summary_cache.save_summaries("file_summaries", new_file_summaries)
+        if summary_text:
+            summary_cache.save_summaries("mr_summaries", {summary_key: summary_text})
 
     if summary_text:
         summary_comment = f"{BOT_COMMENT_HEADER}\n\n{summary_text}"
-        post_summary_comment(summary_comment, GITLAB_PROJECT_ID, GITLAB_MR_IID, GITLAB_API_URL, GITLAB_TOKEN, existing_summary_comment_id)
\ No newline at end of file
+        post_summary_comment(summary_comment, GITLAB_PROJECT_ID, GITLAB_MR_IID, GITLAB_API_URL, GITLAB_TOKEN, existing_summary_comment_id)
+
+    return summary_text
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Posts a Gemini summary of the CI merge request as a comment.")
+    parser.parse_args(argv)
+
+    summarize_merge_request()
+
+if __name__ == "__main__":
+    main()
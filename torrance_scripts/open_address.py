@@ -1,37 +1,79 @@
+import argparse
 import gzip
 import json
 import csv
 
+from . import instrumentation
+
 INPUT_FILE = "source.geojson.gz"
 OUTPUT_FILE = "torrance_addresses.csv"
+CANVASS_FILE = "torrance_canvass_map.csv"
+
+def canvass_label(row):
+    # `number street, [#unit, ]city, CA zip`, the format `walk_withQR_maps.py` parses its ZIP codes and streets from.
+    unit = f"#{row['unit']}, " if row["unit"] else ""
+    return f"{row['number']} {row['street']}, {unit}{str(row['city']).title()}, CA {row['postcode'] or ''}"
 
-rows = []
-
-with gzip.open(INPUT_FILE, 'rt', encoding='utf-8') as f:
-    for line in f:
-        try:
-            feature = json.loads(line)
-            props = feature.get("properties", {})
-            if str(props.get("city", "")).strip().lower() == "torrance":
-                coords = feature.get("geometry", {}).get("coordinates", [None, None])
-                rows.append({
-                    "number": props.get("number"),
-                    "street": props.get("street"),
-                    "unit": props.get("unit"),
-                    "city": props.get("city"),
-                    "postcode": props.get("postcode"),
-                    "full_address": props.get("full"),
-                    "lat": coords[1],
-                    "lon": coords[0]
-                })
-        except json.JSONDecodeError:
-            continue  # skip bad lines
-
-if rows:
-    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+def write_canvass_map(rows, canvass_file=CANVASS_FILE):
+    with open(canvass_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["full_label", "lat", "lon"])
         writer.writeheader()
-        writer.writerows(rows)
-    print(f"✅ Wrote {len(rows):,} Torrance addresses to {OUTPUT_FILE}")
-else:
-    print("❌ No valid addresses found or file is malformed.")
+        writer.writerows({"full_label": canvass_label(row), "lat": row["lat"], "lon": row["lon"]} for row in rows)
+    print(f"✅ Wrote the canvass map to {canvass_file}")
+
+def extract_addresses(input_file=INPUT_FILE, output_file=OUTPUT_FILE, city="torrance", canvass_file=None):
+    """
+    Writes the addresses in `city` from a gzipped OpenAddresses GeoJSON lines dump to CSV, and returns them. With
+    `canvass_file`, they are also written as the canvass CSV `walk_withQR_maps.py` builds walk lists from.
+    """
+    rows = []
+    features_read = 0
+
+    with instrumentation.stage("filter_features"), gzip.open(input_file, 'rt', encoding='utf-8') as f:
+        for features_read, line in enumerate(f, 1):
+            try:
+                feature = json.loads(line)
+                props = feature.get("properties", {})
+                if str(props.get("city", "")).strip().lower() == city:
+                    coords = feature.get("geometry", {}).get("coordinates", [None, None])
+                    rows.append({
+                        "number": props.get("number"),
+                        "street": props.get("street"),
+                        "unit": props.get("unit"),
+                        "city": props.get("city"),
+                        "postcode": props.get("postcode"),
+                        "full_address": props.get("full"),
+                        "lat": coords[1],
+                        "lon": coords[0]
+                    })
+            except json.JSONDecodeError:
+                instrumentation.count("bad_lines")
+                continue  # skip bad lines
+
+    instrumentation.count("features_read", features_read)
+    instrumentation.count("addresses", len(rows))
+
+    if rows:
+        with instrumentation.stage("write_csv"), open(output_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"✅ Wrote {len(rows):,} Torrance addresses to {output_file}")
+        if canvass_file:
+            with instrumentation.stage("write_canvass_map"):
+                write_canvass_map(rows, canvass_file)
+    else:
+        print("❌ No valid addresses found or file is malformed.")
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extracts the Torrance addresses from an OpenAddresses dump.")
+    parser.add_argument("--input", default=INPUT_FILE, help="Gzipped GeoJSON lines OpenAddresses dump")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--canvass-map", help="Also write the addresses as a canvass CSV for walk_withQR_maps")
+    args = parser.parse_args(argv)
+
+    extract_addresses(args.input, args.output, canvass_file=args.canvass_map)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import multiprocessing
+import os
+
+# Fans per-file scans out to a process pool.
+# ------------------
+# `scan` is called once per file and must return a small dict of counts for that file. Results are returned in the
+# same order as `files`, so callers that merge them in that order get exactly the same aggregates as a serial scan.
+#
+# Workers are forked where possible, so they start without importing anything again. Elsewhere they are spawned,
+# which re-imports the scanner's module in every worker. When there are too few files for a pool to pay off,
+# files are scanned serially.
+# ------------------
+
+SCAN_WORKERS = int(os.environ.get("METRICS_SCAN_WORKERS", os.cpu_count() or 1))
+MIN_FILES_PER_WORKER = 50
+
+def scan_files(scan, files, workers=SCAN_WORKERS):
+    files = list(files)
+    workers = min(workers, len(files) // MIN_FILES_PER_WORKER)
+
+    if workers <= 1:
+        return [scan(file) for file in files]
+
+    # A few chunks per worker keeps the pool busy when some files are much larger than others.
+    chunksize = max(1, len(files) // (workers * 4))
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method)) as executor:
+        return list(executor.map(scan, files, chunksize=chunksize))
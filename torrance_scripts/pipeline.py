@@ -0,0 +1,284 @@
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from graphlib import CycleError, TopologicalSorter
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from . import census_geo
+
+# DAG runner for the Torrance data pipeline.
+# ------------------
+# Each stage runs one command (`python -m torrance_scripts <command> [args]`) in the working directory, and declares
+# the files it reads and writes. A stage depends on the stages writing its inputs, plus any listed in `after` for
+# ordering only (`new` warms the ACS variable catalog `scrape` reads, see `acs_catalog.py`). Stages run as soon as
+# their dependencies finish, so independent branches run in parallel, up to `--jobs` at a time.
+#
+# A stage is skipped while it is up to date: its key, a hash of its arguments, its command's module and the package
+# modules it imports (see `local_modules`) and the content of its inputs, matches the manifest of its last successful
+# run, and its outputs still have the content that run wrote. Since inputs are compared by content, a stage whose upstream stage reran without changing its
+# outputs is skipped too. File hashes are cached in the manifest by size and mtime, so unchanged files aren't read.
+#
+# Stages without inputs (`new` and `streets` fetch their data from the Census and ArcGIS APIs) only run again
+# with `--force`. `resident_join` reads the residents `getids_final` scrapes after a manual sign-in, so it fails with
+# a missing input until `torrance_residents_data.csv` is copied into the working directory. Logs of every run are
+# written to `.pipeline/logs/<stage>.log`, next to the manifest.
+#
+# Usage:
+#   python -m torrance_scripts pipeline                      # every stage
+#   python -m torrance_scripts pipeline walk_withQR_maps     # a stage and everything it depends on
+#   python -m torrance_scripts pipeline --force scrape       # reruns scrape, and whatever its new outputs change
+# ------------------
+
+PIPELINE_VERSION = 1
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = ".pipeline"
+LOG_TAIL_LINES = 20
+
+Stage = namedtuple("Stage", ["name", "args", "inputs", "outputs", "after"], defaults=[()])
+
+STAGES = [
+    Stage("extract_unique_tracts", ["extract_unique_tracts", census_geo.PRECINCT_TRACTS_PATH],
+          inputs=[census_geo.PRECINCT_TRACTS_PATH], outputs=["unique_tracts.json", "unique_tracts.txt"]),
+    Stage("decode_census_tracts", ["decode_census_tracts", "--input", "unique_tracts.json", "--output", "tract_number_mapping.json"],
+          inputs=["unique_tracts.json"], outputs=["tract_number_mapping.json"]),
+    Stage("new", ["new", "--output", "acs_variable_labels.csv"],
+          inputs=[], outputs=["acs_variable_labels.csv"]),
+    Stage("scrape", ["scrape", "--precinct-ids", "Torrance_Precincts_Overlay.csv", "--precincts", "RegistrarRecorder_Precincts-simple.geojson"],
+          inputs=["Torrance_Precincts_Overlay.csv", "RegistrarRecorder_Precincts-simple.geojson"],
+          outputs=["Precinct_ACS_FullOverlay.json", "Precinct_ACS_FullOverlay.csv", "tract_to_precinct.json"],
+          after=["new"]),
+    Stage("sort", ["sort", "--overlay", "Precinct_ACS_FullOverlay.json"],
+          inputs=["Precinct_ACS_FullOverlay.json"], outputs=[]),
+    Stage("streets", ["streets", "--output", "torrance_knockable_addresses.csv"],
+          inputs=[], outputs=["torrance_knockable_addresses.csv"]),
+    Stage("open_address", ["open_address", "--input", "source.geojson.gz", "--output", "torrance_addresses.csv", "--canvass-map", "torrance_canvass_map.csv"],
+          inputs=["source.geojson.gz"], outputs=["torrance_addresses.csv", "torrance_canvass_map.csv"]),
+    Stage("walk_withQR_maps", ["walk_withQR_maps", "--input", "torrance_canvass_map.csv", "--output", "torrance_walklists_final.pdf"],
+          inputs=["torrance_canvass_map.csv"], outputs=["torrance_walklists_final.pdf"],
+          after=["streets"]),
+    Stage("resident_join", ["resident_join", "--residents", "torrance_residents_data.csv", "--output", "torrance_residents_precincts.csv"],
+          inputs=["torrance_residents_data.csv", "torrance_knockable_addresses.csv", "torrance_addresses.csv",
+                  "RegistrarRecorder_Precincts-simple.geojson", census_geo.PRECINCT_TRACTS_PATH],
+          outputs=["torrance_residents_precincts.csv"]),
+]
+
+def dependencies(stages):
+    """Returns {stage name: set of the stage names it depends on}."""
+    writers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in writers:
+                raise ValueError(f"{output} is written by both {writers[output]} and {stage.name}")
+            writers[output] = stage.name
+
+    return {
+        stage.name: {writers[path] for path in stage.inputs if path in writers} | set(stage.after)
+        for stage in stages
+    }
+
+def upstream(graph, targets):
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(graph[name])
+    return selected
+
+def local_modules(module):
+    """Returns the package modules `module` runs: itself, and the sibling modules it imports, transitively."""
+    modules = set()
+    pending = [module]
+    while pending:
+        name = pending.pop()
+        path = os.path.join(PACKAGE_DIR, f"{name}.py")
+        if name in modules or not os.path.exists(path):
+            continue
+        modules.add(name)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        # Relative imports anywhere in the module, including the lazy ones inside functions.
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.level == 1:
+                pending.extend([node.module] if node.module else [alias.name for alias in node.names])
+    return sorted(modules)
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"stages": {}, "files": {}}
+    if manifest.get("version") != PIPELINE_VERSION:
+        return {"stages": {}, "files": {}}
+    return manifest
+
+def save_manifest(path, manifest):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump({**manifest, "version": PIPELINE_VERSION}, f, indent=2)
+    os.replace(temporary_path, path)
+
+class Runner:
+    def __init__(self, stages, workdir=".", jobs=None, force=(), dry_run=False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.graph = dependencies(stages)
+        self.workdir = os.path.abspath(workdir)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.force = set(force)
+        self.dry_run = dry_run
+        self.state_dir = os.path.join(self.workdir, STATE_DIR)
+        self.manifest_path = os.path.join(self.state_dir, "manifest.json")
+        self.manifest = load_manifest(self.manifest_path)
+        self.lock = threading.Lock()
+
+    def path(self, path):
+        return os.path.join(self.workdir, path)
+
+    def file_hash(self, path):
+        """Returns the SHA-256 of a file's content, or None if it doesn't exist."""
+        path = self.path(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            cached = self.manifest["files"].get(path)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self.lock:
+            self.manifest["files"][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def stage_key(self, stage):
+        # Editing a helper module, e.g. `addresses.py` for `resident_join`, reruns the stages using it.
+        modules = {name: self.file_hash(os.path.join(PACKAGE_DIR, f"{name}.py")) for name in local_modules(stage.args[0])}
+        inputs = {path: self.file_hash(path) for path in stage.inputs}
+        missing = [path for path, digest in inputs.items() if digest is None]
+        if missing:
+            raise FileNotFoundError(f"missing inputs: {', '.join(missing)}")
+        key = [PIPELINE_VERSION, stage.args, modules, inputs]
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def up_to_date(self, stage, key):
+        with self.lock:
+            previous = self.manifest["stages"].get(stage.name)
+        if stage.name in self.force or not previous or previous["key"] != key:
+            return False
+        return all(self.file_hash(path) == digest for path, digest in previous["outputs"].items())
+
+    def run_stage(self, name):
+        """Runs a stage unless it is up to date, and returns its status."""
+        stage = self.stages[name]
+        key = self.stage_key(stage)
+        if self.up_to_date(stage, key):
+            return "up to date"
+        if self.dry_run:
+            return "would run"
+
+        log_path = os.path.join(self.state_dir, "logs", f"{name}.log")
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(PACKAGE_DIR), os.environ.get("PYTHONPATH")]))}
+        start = time.perf_counter()
+        with open(log_path, "w") as log:
+            process = subprocess.run([sys.executable, "-m", "torrance_scripts", *stage.args], cwd=self.workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        seconds = time.perf_counter() - start
+
+        if process.returncode:
+            raise RuntimeError(f"exit {process.returncode}, see {log_path}")
+
+        outputs = {path: self.file_hash(path) for path in stage.outputs}
+        missing = [path for path, digest in outputs.items() if digest is None]
+        if missing:
+            raise RuntimeError(f"outputs not written: {', '.join(missing)}, see {log_path}")
+
+        with self.lock:
+            self.manifest["stages"][name] = {"key": key, "outputs": outputs, "seconds": round(seconds, 3)}
+            os.makedirs(self.state_dir, exist_ok=True)
+            save_manifest(self.manifest_path, self.manifest)
+        return f"ran in {seconds:.1f} s"
+
+    def run(self, targets=None):
+        """Runs `targets` (default all stages) and the stages they depend on. Returns {stage: status}."""
+        for name in [*(targets or []), *self.force]:
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+
+        selected = upstream(self.graph, targets or self.stages)
+        sorter = TopologicalSorter({name: self.graph[name] & selected for name in selected})
+        sorter.prepare()
+
+        statuses = {}
+        failed = set()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while sorter.is_active():
+                for name in sorter.get_ready():
+                    blocked_by = self.graph[name] & failed
+                    if blocked_by:
+                        statuses[name] = f"skipped, {', '.join(sorted(blocked_by))} failed"
+                        failed.add(name)
+                        print(f"❌ {name}: {statuses[name]}")
+                        sorter.done(name)
+                        continue
+                    # Inputs of stages downstream of one that would run aren't there, or aren't final, yet.
+                    if self.dry_run and any(statuses.get(dependency) == "would run" for dependency in self.graph[name]):
+                        statuses[name] = "would run"
+                        print(f"✅ {name}: would run")
+                        sorter.done(name)
+                        continue
+                    running[executor.submit(self.run_stage, name)] = name
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        statuses[name] = future.result()
+                    except Exception as e:
+                        statuses[name] = f"failed: {e}"
+                        failed.add(name)
+                    print(f"{'❌' if name in failed else '✅'} {name}: {statuses[name]}")
+                    sorter.done(name)
+
+        for name in failed:
+            log_path = os.path.join(self.state_dir, "logs", f"{name}.log")
+            if os.path.exists(log_path):
+                with open(log_path) as f:
+                    print(f"\n--- {name} ---\n" + "".join(f.readlines()[-LOG_TAIL_LINES:]))
+        return statuses
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the Torrance data pipeline, skipping the stages that are up to date.")
+    parser.add_argument("targets", nargs="*", metavar="stage", help=f"Stages to bring up to date, with their dependencies: {', '.join(stage.name for stage in STAGES)}")
+    parser.add_argument("--workdir", default=".", help="Directory the stages read and write their files in")
+    parser.add_argument("--jobs", type=int, help="Stages run at once, defaults to the number of CPUs")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="Run these stages even if they are up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stages that would run")
+    args = parser.parse_args(argv)
+
+    try:
+        runner = Runner(STAGES, args.workdir, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+        statuses = runner.run(args.targets)
+    except (ValueError, CycleError) as e:
+        parser.error(str(e))
+    sys.exit(any(status.startswith(("failed", "skipped")) for status in statuses.values()))
+
+if __name__ == "__main__":
+    main()
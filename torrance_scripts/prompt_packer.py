@@ -0,0 +1,87 @@
+# Token-budgeted prompt packing for mr_summary_bot.py.
+# ------------------
+# Each changed file becomes a prompt section holding its numbered diff plus as much context as its token budget
+# allows. Small files keep their full content, and for larger ones only windows of lines around the changed lines of
+# the file after changes are kept. The content before changes is only included for small files, since the diff
+# already shows every removed line.
+#
+# When all sections fit in a single prompt they are summarized in one request. Otherwise, or when per-file summaries
+# are cached (see `summary_cache.py`), they are packed into groups that each fit in a prompt, the groups are
+# summarized concurrently (map), and the group summaries are merged into the final summary (reduce).
+# ------------------
+
+# Tokens are estimated from characters, which is close enough for budgeting source code.
+CHARS_PER_TOKEN = 4
+
+PROMPT_TOKEN_BUDGET = 200_000
+FILE_TOKEN_BUDGET = 12_000
+SMALL_FILE_TOKENS = 2_000
+CONTEXT_LINES = 15
+MAX_MAP_GROUPS = 12
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def truncate_to_tokens(text, tokens):
+    max_chars = tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "\n... (truncated)"
+
+def context_windows(content, changed_lines, context_lines=CONTEXT_LINES):
+    """Returns the numbered lines of `content` within `context_lines` of any of the (1-based) `changed_lines`."""
+    lines = content.split("\n")
+    windows = []
+
+    for line_num in sorted(changed_lines):
+        start = max(line_num - context_lines, 1)
+        end = min(line_num + context_lines, len(lines))
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+
+    parts = []
+    for start, end in windows:
+        parts.append("\n".join(f"{str(i).ljust(3)}: {lines[i - 1]}" for i in range(start, end + 1)))
+    return "\n...\n".join(parts)
+
+def file_section(file_data, token_budget=FILE_TOKEN_BUDGET):
+    path = file_data['new_path']
+    diff = truncate_to_tokens(file_data['formatted_diff'], token_budget)
+    remaining = token_budget - estimate_tokens(diff)
+
+    after = file_data.get('full_file_content') or ""
+    before = file_data.get('old_file_content') or ""
+    parts = [f"\n### File: {path}\n"]
+
+    if before and estimate_tokens(before) + estimate_tokens(after) <= min(SMALL_FILE_TOKENS, remaining):
+        parts.append(f"\nFull File Content (Before Changes):\n```swift\n{before}\n```\n")
+        remaining -= estimate_tokens(before)
+
+    if after and estimate_tokens(after) <= remaining:
+        parts.append(f"\nFull File Content (After Changes):\n```swift\n{after}\n```\n")
+    elif after and file_data.get('changed_lines'):
+        excerpts = truncate_to_tokens(context_windows(after, file_data['changed_lines']), max(remaining, 0))
+        parts.append(f"\nExcerpts Around the Changes (After Changes, numbered):\n```swift\n{excerpts}\n```\n")
+
+    parts.append(f"\nNumbered Diff for {path}:\n```diff\n{diff}\n```\n")
+    return "".join(parts)
+
+def pack_groups(sections, token_budget, max_items=None):
+    """
+    Greedily packs consecutive (path, section) pairs into groups whose estimated size stays under `token_budget`,
+    with at most `max_items` sections per group.
+    """
+    groups = []
+    group_tokens = 0
+
+    for section in sections:
+        tokens = estimate_tokens(section[1])
+        if not groups or group_tokens + tokens > token_budget or (max_items and len(groups[-1]) >= max_items):
+            groups.append([])
+            group_tokens = 0
+        groups[-1].append(section)
+        group_tokens += tokens
+
+    return groups
@@ -0,0 +1,176 @@
+import argparse
+
+from . import addresses
+from . import census_geo
+from . import instrumentation
+
+# Joins the AtoZ residents to their precincts and census tracts, for voter-contact targeting.
+# ------------------
+# Residents are geocoded locally, without any API calls, against the address points `streets.py` (CAMS) and
+# `open_address.py` (OpenAddresses) already wrote: both sides get the normalized address key of `addresses.py`, and
+# the residents are hash joined to the points on it. A resident matches:
+#   - "address": a point with the same key, CAMS first, then OpenAddresses
+#   - "building": for residents with a unit, the building's point, when the unit has none of its own
+# The matched points are then located in the precinct polygons with one vectorized spatial join.
+#
+# Tracts come from the precinct → tract map (`data/precinct_tracts.csv`, or `scrape.py`'s `tract_cache.json`), so
+# residents get the tract their precinct's ACS data was fetched for. With a tract polygons GeoJSON (`GEOID`
+# property) they are located in the tracts themselves instead. With `--acs`, columns of a per-precinct CSV, e.g.
+# `scrape.py`'s `Precinct_ACS_FullOverlay.csv`, are joined on the precinct too.
+#
+# Unmatched residents are kept, with empty coordinates, precinct and tract. Residents and points whose address has
+# no number or street, e.g. because it didn't parse, have no key and are never matched.
+# ------------------
+
+RESIDENTS_PATH = "torrance_residents_data.csv"
+CAMS_PATH = "torrance_knockable_addresses.csv"
+OPENADDRESSES_PATH = "torrance_addresses.csv"
+PRECINCTS_PATH = "RegistrarRecorder_Precincts-simple.geojson"
+OUTPUT_PATH = "torrance_residents_precincts.csv"
+
+def address_points(cams_path=CAMS_PATH, openaddresses_path=OPENADDRESSES_PATH):
+    """Returns the address points as a DataFrame of addr_key, building_key, lon, lat and source, one per key."""
+    import pandas as pd
+
+    frames = []
+    if cams_path:
+        cams = pd.read_csv(cams_path, dtype=str)
+        # `streets.py` writes its points as WKT, "POINT (lon lat)".
+        coordinates = cams["geometry"].str.extract(r"POINT \(\s*(?P<lon>\S+)\s+(?P<lat>[^\s)]+)")
+        street_name = cams["STREET_NAME"].fillna("") + " " + cams["STREET_TYPE"].fillna("")
+        frames.append(pd.DataFrame({
+            "addr_key": addresses.key(cams["HOUSE_NUM"], street_name, cams["UNIT_NUM"], cams["ZIP_CODE"]),
+            "building_key": addresses.key(cams["HOUSE_NUM"], street_name, None, cams["ZIP_CODE"]),
+            "lon": coordinates["lon"],
+            "lat": coordinates["lat"],
+            "source": "cams",
+        }))
+    if openaddresses_path:
+        oa = pd.read_csv(openaddresses_path, dtype=str)
+        frames.append(pd.DataFrame({
+            "addr_key": addresses.key(oa["number"], oa["street"], oa["unit"], oa["postcode"]),
+            "building_key": addresses.key(oa["number"], oa["street"], None, oa["postcode"]),
+            "lon": oa["lon"],
+            "lat": oa["lat"],
+            "source": "openaddresses",
+        }))
+
+    points = pd.concat(frames, ignore_index=True)
+    points["lon"] = pd.to_numeric(points["lon"], errors="coerce")
+    points["lat"] = pd.to_numeric(points["lat"], errors="coerce")
+    # Points without a number or street have no key. CAMS comes first, so it wins when both sources have an address.
+    points = points[points["addr_key"] != ""]
+    return points.dropna(subset=["lon", "lat"]).drop_duplicates("addr_key")
+
+def geocode(residents, points):
+    """Adds the lon, lat, match ("address", "building" or "") and match_source of every resident's address."""
+    parts = addresses.parse(residents["address"])
+    address_key = addresses.key(parts["number"], parts["street"], parts["unit"], residents["zip"])
+    building_key = addresses.key(parts["number"], parts["street"], None, residents["zip"])
+
+    # Hash joins on the keys, which are unique in `points`. Residents whose address didn't parse have no key, and
+    # stay unmatched.
+    columns = ["lon", "lat", "source"]
+    keyed = address_key != ""
+    located = points.set_index("addr_key")[columns].reindex(address_key.where(keyed)).set_axis(residents.index)
+    buildings = points.drop_duplicates("building_key").set_index("building_key")[columns]
+    by_building = located["source"].isna() & keyed & (parts["unit"] != "")
+    located[by_building] = buildings.reindex(building_key[by_building]).set_axis(located.index[by_building])
+
+    residents = residents.copy()
+    residents["lon"] = located["lon"]
+    residents["lat"] = located["lat"]
+    residents["match"] = ""
+    residents.loc[located["source"].notna(), "match"] = "address"
+    residents.loc[by_building & located["source"].notna(), "match"] = "building"
+    residents["match_source"] = located["source"]
+    return residents
+
+def locate(residents, polygons_path, id_property, column):
+    """Adds `column`, the `id_property` of the polygon each geocoded resident is in, in one spatial join."""
+    import geopandas as gpd
+
+    polygons = gpd.read_file(polygons_path)[[id_property, "geometry"]]
+    geocoded = residents[residents["lon"].notna()]
+    points = gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy(geocoded["lon"], geocoded["lat"]), index=geocoded.index, crs="EPSG:4326"
+    ).to_crs(polygons.crs)
+
+    # Points on a shared edge intersect both polygons, and are given the first one, like points in overlapping ones.
+    joined = gpd.sjoin(points, polygons, how="inner", predicate="intersects")
+    joined = joined[~joined.index.duplicated()]
+
+    residents = residents.copy()
+    residents[column] = joined[id_property].astype(str).str.strip().str.upper().reindex(residents.index)
+    return residents
+
+def join_residents(
+    residents_path=RESIDENTS_PATH,
+    output_path=OUTPUT_PATH,
+    cams_path=CAMS_PATH,
+    openaddresses_path=OPENADDRESSES_PATH,
+    precincts_path=PRECINCTS_PATH,
+    tracts_path=census_geo.PRECINCT_TRACTS_PATH,
+    acs_path=None,
+    acs_columns=None,
+):
+    """Writes the residents with their coordinates, precinct and census tract (and ACS columns) to `output_path`."""
+    import pandas as pd
+
+    with instrumentation.stage("load"):
+        residents = pd.read_csv(residents_path, dtype=str)
+        points = address_points(cams_path, openaddresses_path)
+    print(f"📍 {len(points):,} address points for {len(residents):,} residents")
+
+    with instrumentation.stage("geocode"):
+        residents = geocode(residents, points)
+
+    with instrumentation.stage("precincts"):
+        residents = locate(residents, precincts_path, "PRECINCT", "Precinct_ID")
+
+    with instrumentation.stage("tracts"):
+        if tracts_path.endswith((".geojson", ".shp", ".gpkg")):
+            residents = locate(residents, tracts_path, "GEOID", "Census_Tract")
+        else:
+            residents["Census_Tract"] = residents["Precinct_ID"].map(census_geo.load_precinct_tracts(tracts_path))
+
+    if acs_path:
+        with instrumentation.stage("acs"):
+            acs = pd.read_csv(acs_path, dtype=str)
+            acs["Precinct_ID"] = acs["Precinct_ID"].str.strip().str.upper()
+            columns = acs_columns or [column for column in acs.columns if column not in ("Precinct_ID", "Census_Tract")]
+            residents = residents.merge(acs[["Precinct_ID", *columns]].drop_duplicates("Precinct_ID"), on="Precinct_ID", how="left")
+
+    with instrumentation.stage("write_csv"):
+        residents.to_csv(output_path, index=False)
+
+    matches = residents["match"].value_counts()
+    located = residents["Precinct_ID"].notna().sum()
+    instrumentation.count("residents", len(residents))
+    instrumentation.count("address_matches", int(matches.get("address", 0)))
+    instrumentation.count("building_matches", int(matches.get("building", 0)))
+    instrumentation.count("unmatched", int(matches.get("", 0)))
+    instrumentation.count("located", int(located))
+    print(f"✅ Matched {matches.get('address', 0):,} residents by address and {matches.get('building', 0):,} by building, "
+          f"{matches.get('', 0):,} unmatched")
+    print(f"🗳️  Wrote {located:,} residents with a precinct to {output_path}")
+    return residents
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Joins the AtoZ residents to their precincts and census tracts.")
+    parser.add_argument("--residents", default=RESIDENTS_PATH, help="Residents CSV written by getids_final")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--cams", default=CAMS_PATH, help="CAMS addresses written by streets, '' to skip")
+    parser.add_argument("--openaddresses", default=OPENADDRESSES_PATH, help="OpenAddresses addresses written by open_address, '' to skip")
+    parser.add_argument("--precincts", default=PRECINCTS_PATH, help="County precincts GeoJSON")
+    parser.add_argument("--tracts", default=census_geo.PRECINCT_TRACTS_PATH, help="Precinct → tract CSV or JSON, or tract polygons with a GEOID property")
+    parser.add_argument("--acs", help="Per-precinct CSV to join, e.g. Precinct_ACS_FullOverlay.csv")
+    parser.add_argument("--acs-columns", nargs="+", help="Columns of --acs to join, defaults to all")
+    args = parser.parse_args(argv)
+    if not args.cams and not args.openaddresses:
+        parser.error("--cams or --openaddresses is required")
+
+    join_residents(args.residents, args.output, args.cams, args.openaddresses, args.precincts, args.tracts, args.acs, args.acs_columns)
+
+if __name__ == "__main__":
+    main()
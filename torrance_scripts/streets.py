@@ -1,24 +1,32 @@
+import argparse
+import io
 import os
-import time
-import json
-import requests
-import pandas as pd
-import geopandas as gpd
 from pathlib import Path
-from urllib.parse import urlencode
+
+from . import addresses
+from . import http_client
+from . import instrumentation
 
 # ----------------------------- CONFIG -----------------------------
-REST_URL = "https://arcgis.gis.lacounty.gov/arcgis/rest/services/DRP/GISNET_Public/MapServer/402/query"
+REST_URL = os.environ.get("CAMS_REST_URL", "https://arcgis.gis.lacounty.gov/arcgis/rest/services/DRP/GISNET_Public/MapServer/402/query")
+BOUNDARY_URL = os.environ.get("TORRANCE_BOUNDARY_URL", "https://open-data-torranceca.hub.arcgis.com/datasets/3bda3af1a3f04b2cb5d3a419eca36924_0.geojson")
 OUT_SRID = 4326
 MAX_RECORDS = 2000
 CHUNK_DIR = Path("cams_chunks")        # folder for temporary JSON chunks
 FINAL_CSV = "torrance_knockable_addresses.csv"
-RETRIES = 5
-SLEEP = 2                              # seconds between retries
-CHUNK_DIR.mkdir(exist_ok=True)
 # ------------------------------------------------------------------
 
+def read_geojson(url, params=None):
+    """Reads a GeoJSON response into a GeoDataFrame. Requests are retried and cached by `http_client.py`."""
+    import geopandas as gpd
+
+    response = http_client.get(url, params=params)
+    response.raise_for_status()
+    return gpd.read_file(io.BytesIO(response.content))
+
 def download_chunk(offset):
+    import requests
+
     params = {
         "where": "1=1",
         "outFields": "*",
@@ -27,72 +35,97 @@ def download_chunk(offset):
         "resultOffset": offset,
         "resultRecordCount": MAX_RECORDS
     }
-    url = f"{REST_URL}?{urlencode(params)}"
-    for attempt in range(RETRIES):
-        try:
-            gdf = gpd.read_file(url)
-            return gdf
-        except (requests.exceptions.RequestException, OSError) as e:
-            print(f"⚠️  Error on offset {offset} (try {attempt+1}/{RETRIES}): {e}")
-            time.sleep(SLEEP * (2 ** attempt))
-    print(f"❌  Failed to download offset {offset} after {RETRIES} retries.")
-    return None
-
-# ------------------ MAIN DOWNLOAD LOOP -------------------
-offset = 0
-downloaded = []
-
-print("📥 Starting chunked download of CAMS address points…")
-
-while True:
-    chunk_file = CHUNK_DIR / f"cams_{offset}.geojson"
-
-    # Skip if already downloaded
-    if chunk_file.exists():
-        print(f"✅ Found cached chunk: {chunk_file.name}")
-        offset += MAX_RECORDS
-        continue
-
-    gdf = download_chunk(offset)
-    if gdf is None or gdf.empty:
-        break
-
-    gdf.to_file(chunk_file, driver="GeoJSON")
-    print(f"💾 Saved chunk: {chunk_file.name} ({len(gdf)} rows)")
-    offset += len(gdf)
-
-print("🧩 Reassembling all chunks into one GeoDataFrame…")
-
-frames = []
-for file in sorted(CHUNK_DIR.glob("cams_*.geojson")):
-    frames.append(gpd.read_file(file))
-cams_all = pd.concat(frames, ignore_index=True)
-print(f"✅ Total points: {len(cams_all):,}")
-
-# ------------------ TORRANCE FILTERING -------------------
-print("🌐 Clipping to Torrance city boundary…")
-torrance = gpd.read_file(
-    "https://open-data-torranceca.hub.arcgis.com/datasets/3bda3af1a3f04b2cb5d3a419eca36924_0.geojson"
-).to_crs(cams_all.crs)
-
-cams_torr = gpd.sjoin(cams_all, torrance, predicate="within")[[
-    "Number", "StreetName", "PostType", "UnitName", "ZipCode", "geometry"
-]].rename(columns={
-    "Number": "HOUSE_NUM", "StreetName": "STREET_NAME",
-    "PostType": "STREET_TYPE", "UnitName": "UNIT_NUM",
-    "ZipCode": "ZIP_CODE"
-})
-
-# Build unique key
-cams_torr["addr_key"] = (
-    cams_torr["HOUSE_NUM"].astype(str).str.strip() + " " +
-    cams_torr["STREET_NAME"].str.strip() + " " +
-    cams_torr["STREET_TYPE"].str.strip() + " " +
-    cams_torr["UNIT_NUM"].fillna("").apply(lambda u: "" if u=="" else "#"+u) + " " +
-    cams_torr["ZIP_CODE"].astype(str)
-).str.upper().str.replace(r"\s+", " ", regex=True)
-
-deduped = cams_torr.drop_duplicates("addr_key")
-
-deduped.to_csv(FINAL_CSV, index=False)
-print(f"🏁 Done! Wrote {len(deduped):,} unique knockable addresses to {FINAL_CSV}")
+    try:
+        return read_geojson(REST_URL, params)
+    except (requests.exceptions.RequestException, OSError) as e:
+        print(f"❌  Failed to download offset {offset}: {e}")
+        return None
+
+def download_cams(chunk_dir=CHUNK_DIR):
+    """Downloads every CAMS address point in pages of `MAX_RECORDS`, reusing pages already in `chunk_dir`."""
+    import geopandas as gpd
+    import pandas as pd
+
+    chunk_dir = Path(chunk_dir)
+    chunk_dir.mkdir(exist_ok=True)
+    offset = 0
+
+    print("📥 Starting chunked download of CAMS address points…")
+
+    while True:
+        chunk_file = chunk_dir / f"cams_{offset}.geojson"
+
+        # Skip if already downloaded
+        if chunk_file.exists():
+            instrumentation.cache_hit("cams_chunks")
+            print(f"✅ Found cached chunk: {chunk_file.name}")
+            offset += MAX_RECORDS
+            continue
+
+        instrumentation.cache_miss("cams_chunks")
+        with instrumentation.stage("download_chunk"):
+            gdf = download_chunk(offset)
+        if gdf is None or gdf.empty:
+            break
+
+        with instrumentation.stage("save_chunk"):
+            gdf.to_file(chunk_file, driver="GeoJSON")
+        print(f"💾 Saved chunk: {chunk_file.name} ({len(gdf)} rows)")
+        offset += len(gdf)
+
+    print("🧩 Reassembling all chunks into one GeoDataFrame…")
+
+    with instrumentation.stage("reassemble"):
+        frames = []
+        for file in sorted(chunk_dir.glob("cams_*.geojson")):
+            frames.append(gpd.read_file(file))
+        cams_all = pd.concat(frames, ignore_index=True)
+    print(f"✅ Total points: {len(cams_all):,}")
+    return cams_all
+
+def build_address_list(final_csv=FINAL_CSV, chunk_dir=CHUNK_DIR, boundary_url=BOUNDARY_URL):
+    """Writes the unique CAMS addresses within the Torrance boundary to `final_csv`, and returns them."""
+    import geopandas as gpd
+
+    instrumentation.instrument_requests()
+    cams_all = download_cams(chunk_dir)
+
+    # ------------------ TORRANCE FILTERING -------------------
+    print("🌐 Clipping to Torrance city boundary…")
+    torrance = read_geojson(boundary_url).to_crs(cams_all.crs)
+
+    with instrumentation.stage("clip"):
+        cams_torr = gpd.sjoin(cams_all, torrance, predicate="within")[[
+            "Number", "StreetName", "PostType", "UnitName", "ZipCode", "geometry"
+        ]].rename(columns={
+            "Number": "HOUSE_NUM", "StreetName": "STREET_NAME",
+            "PostType": "STREET_TYPE", "UnitName": "UNIT_NUM",
+            "ZipCode": "ZIP_CODE"
+        })
+
+    # Build unique key, the one `resident_join.py` matches residents on, see `addresses.py`
+    cams_torr["addr_key"] = addresses.key(
+        cams_torr["HOUSE_NUM"],
+        cams_torr["STREET_NAME"].fillna("") + " " + cams_torr["STREET_TYPE"].fillna(""),
+        cams_torr["UNIT_NUM"],
+        cams_torr["ZIP_CODE"],
+    )
+
+    deduped = cams_torr.drop_duplicates("addr_key")
+    instrumentation.count("addresses", len(deduped))
+
+    with instrumentation.stage("write_csv"):
+        deduped.to_csv(final_csv, index=False)
+    print(f"🏁 Done! Wrote {len(deduped):,} unique knockable addresses to {final_csv}")
+    return deduped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Downloads the CAMS address points and writes the unique Torrance addresses.")
+    parser.add_argument("--output", default=FINAL_CSV)
+    parser.add_argument("--chunk-dir", default=CHUNK_DIR, help="Directory the downloaded pages are kept in")
+    args = parser.parse_args(argv)
+
+    build_address_list(args.output, args.chunk_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from datetime import datetime
+from pathlib import Path
+
+import hashlib
+import json
+import os
+
+# Persistent summary cache for mr_summary_bot.py.
+# ------------------
+# Two caches live in `MR_SUMMARY_CACHE_DIR` (default `~/.cache/mr_summary`); add that directory to the GitLab CI cache
+# of the summary job so it is restored on the next pipeline:
+#   - "mr_summaries": final MR summaries, keyed by the MR's head SHA, title, description and the hash of every diff.
+#     A rerun of a pipeline for the same push finds its summary here and skips the model entirely.
+#   - "file_summaries": per-file summaries, keyed by a hash of the file's path and diff, written when an MR too large
+#     for a single prompt is map-reduced. When some of an MR's files have a cached summary, it is map-reduced again,
+#     so only the files whose diffs changed are summarized, and the final summary is merged from the cached and new
+#     file summaries. MRs without any fit in a single prompt, and are summarized from their diffs in one request.
+#
+# Bump `SUMMARY_VERSION` whenever the prompts or the model change, so summaries from older versions are discarded.
+# ------------------
+
+SUMMARY_VERSION = 1
+CACHE_DIR = os.environ.get("MR_SUMMARY_CACHE_DIR", os.path.join(Path.home(), ".cache", "mr_summary"))
+MAX_CACHE_ENTRIES = 5000
+
+def _hash(*values):
+    return hashlib.sha1(json.dumps([SUMMARY_VERSION, *values]).encode("utf-8")).hexdigest()
+
+def diff_hash(file_data):
+    return _hash(file_data['new_path'], file_data['formatted_diff'])
+
+def mr_summary_key(head_sha, mr_title, mr_description, all_files_data):
+    return _hash(head_sha, mr_title, mr_description, [diff_hash(file_data) for file_data in all_files_data])
+
+def cache_path(name):
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+def _load_entries(name):
+    try:
+        with open(cache_path(name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_entries(name, entries):
+    entries = dict(sorted(entries.items(), key=lambda item: item[1]["used_at"])[-MAX_CACHE_ENTRIES:])
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = f"{cache_path(name)}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(entries, f)
+    os.replace(temp_path, cache_path(name))
+
+def load_summaries(name):
+    """Returns the cached {key: summary} entries of cache `name`, or {} if missing."""
+    return {key: entry["summary"] for key, entry in _load_entries(name).items()}
+
+def save_summaries(name, summaries):
+    """Adds `summaries` to cache `name`, keeping only the `MAX_CACHE_ENTRIES` most recently used entries."""
+    entries = _load_entries(name)
+    used_at = int(datetime.now().timestamp())
+    for key, summary in summaries.items():
+        entries[key] = {"summary": summary, "used_at": used_at}
+    _save_entries(name, entries)
+
+def touch(name, keys):
+    """Marks the entries of cache `name` under `keys` as used now, so cache hits keep their entries from eviction."""
+    entries = _load_entries(name)
+    used_at = int(datetime.now().timestamp())
+    touched = [key for key in keys if key in entries]
+    for key in touched:
+        entries[key]["used_at"] = used_at
+    if touched:
+        _save_entries(name, entries)
@@ -0,0 +1,329 @@
+import re
+
+# Lexical analysis of Swift source for the metrics scripts.
+# ------------------
+# `tokenize` turns a file into identifier, attribute, number, string and punctuation tokens in a single linear pass,
+# skipping whitespace and (nested) comments and treating string literals - including multi-line, raw and
+# interpolated strings - as single tokens. `analyze` then walks the tokens once and collects everything the metrics
+# scripts look for, so nothing inside comments or strings is ever counted and no regex has to backtrack over a
+# whole file.
+#
+# Every token is a tuple of (kind, value, line, offset), with 1-based line numbers.
+# ------------------
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*)
+  | (?P<string>\#*(?:\"\"\"|\"))
+  | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*|`[^`\n]+`)
+  | (?P<attribute>@[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>[0-9][A-Za-z0-9_]*)
+  | (?P<punctuation>.)
+""", re.VERBOSE | re.DOTALL)
+
+BLOCK_COMMENT_DELIMITER = re.compile(r"/\*|\*/")
+STRING_SPECIAL = re.compile(r'["\\\n]')
+INTERPOLATION_SPECIAL = re.compile(r'[()"]')
+
+# Keywords that can be directly followed by `(` but aren't calls.
+NON_CALL_KEYWORDS = {"if", "guard", "while", "switch", "return", "case", "for", "in", "catch", "init", "func", "subscript"}
+TYPE_DECLARATION_KEYWORDS = {"struct", "class", "enum", "actor", "extension"}
+
+
+def _skip_block_comment(text, pos):
+    # Swift block comments nest.
+    depth = 1
+    while depth:
+        match = BLOCK_COMMENT_DELIMITER.search(text, pos)
+        if not match:
+            return len(text)
+        depth += 1 if match.group() == "/*" else -1
+        pos = match.end()
+    return pos
+
+
+def _skip_interpolation(text, pos):
+    # `pos` is at the `(` of a `\(...)` interpolation, which can contain calls and nested string literals.
+    depth = 0
+    while True:
+        match = INTERPOLATION_SPECIAL.search(text, pos)
+        if not match:
+            return len(text)
+        char = match.group()
+        if char == "(":
+            depth += 1
+            pos = match.end()
+        elif char == ")":
+            depth -= 1
+            pos = match.end()
+            if depth == 0:
+                return pos
+        else:
+            multiline = text.startswith('"""', match.start())
+            pos = _skip_string(text, match.start() + (3 if multiline else 1), "", multiline)
+
+
+def _skip_string(text, pos, hashes, multiline):
+    # `pos` is just past the opening delimiter. Returns the offset just past the closing delimiter.
+    closing = ('"""' if multiline else '"') + hashes
+    escape = "\\" + hashes
+    while True:
+        match = STRING_SPECIAL.search(text, pos)
+        if not match:
+            return len(text)
+        index = match.start()
+        char = match.group()
+
+        if char == "\n":
+            if not multiline:
+                return index # Unterminated single line string.
+            pos = index + 1
+        elif char == '"':
+            if text.startswith(closing, index):
+                return index + len(closing)
+            pos = index + 1
+        elif text.startswith(escape, index):
+            after_escape = index + len(escape)
+            if text.startswith("(", after_escape):
+                pos = _skip_interpolation(text, after_escape)
+            else:
+                pos = after_escape + 1
+        else:
+            pos = index + 1
+
+
+def tokenize(text):
+    tokens = []
+    line = 1
+    line_offset = 0
+    pos = 0
+    length = len(text)
+    match_token = TOKEN_PATTERN.match
+
+    while pos < length:
+        match = match_token(text, pos)
+        kind = match.lastgroup
+        end = match.end()
+
+        if kind == "block_comment":
+            end = _skip_block_comment(text, end)
+        elif kind != "space" and kind != "line_comment":
+            # Lines are counted lazily, only up to the tokens that are kept.
+            line += text.count("\n", line_offset, pos)
+            line_offset = pos
+
+            if kind == "string":
+                delimiter = match.group()
+                hashes = delimiter[:len(delimiter) - len(delimiter.lstrip("#"))]
+                end = _skip_string(text, end, hashes, delimiter.endswith('"""'))
+                tokens.append(("string", None, line, pos))
+            else:
+                tokens.append((kind, match.group(), line, pos))
+
+        pos = end
+
+    return tokens
+
+
+def comment_lines(text):
+    """
+    Returns the 1-based numbers of the lines whose only content is comments, `//` or (nested) `/* */`. Comment
+    delimiters inside string literals don't start comments, and blank lines inside block comments aren't included.
+    """
+    comments = set()
+    code = set()
+    line = 1
+    line_offset = 0
+    pos = 0
+    length = len(text)
+    match_token = TOKEN_PATTERN.match
+
+    while pos < length:
+        match = match_token(text, pos)
+        kind = match.lastgroup
+        end = match.end()
+        if kind == "space":
+            pos = end
+            continue
+
+        line += text.count("\n", line_offset, pos)
+        line_offset = pos
+
+        if kind == "block_comment":
+            end = _skip_block_comment(text, end)
+        elif kind == "string":
+            delimiter = match.group()
+            hashes = delimiter[:len(delimiter) - len(delimiter.lstrip("#"))]
+            end = _skip_string(text, end, hashes, delimiter.endswith('"""'))
+
+        if kind == "line_comment" or kind == "block_comment":
+            for i, content in enumerate(text[pos:end].split("\n")):
+                if content.strip():
+                    comments.add(line + i)
+        else:
+            # Multi-line strings are code on every line they span.
+            code.update(range(line, line + text.count("\n", pos, end) + 1))
+
+        pos = end
+
+    return comments - code
+
+
+def _matching_close(tokens, index):
+    # `index` is at an opening `(` or `[`. Returns the index of its matching close, or the last token.
+    depth = 0
+    for i in range(index, len(tokens)):
+        value = tokens[i][1]
+        if value in ("(", "["):
+            depth += 1
+        elif value in (")", "]"):
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(tokens) - 1
+
+
+def _split_top_level(tokens, start, end):
+    # Splits tokens[start:end] on commas that aren't nested in brackets, dropping empty parts (trailing commas).
+    parts = []
+    part_start = start
+    depth = 0
+    for i in range(start, end):
+        value = tokens[i][1]
+        if value in ("(", "[", "{"):
+            depth += 1
+        elif value in (")", "]", "}"):
+            depth -= 1
+        elif value == "," and depth == 0:
+            parts.append((part_start, i))
+            part_start = i + 1
+    parts.append((part_start, end))
+    return [(part_start, part_end) for part_start, part_end in parts if part_end > part_start]
+
+
+def _test_runs(tokens, open_index, close_index):
+    """
+    Number of runs of a parameterized `@Test(...)`. Every collection passed with `arguments:` multiplies the runs by
+    its number of elements. Collections that aren't array literals (e.g. `Foo.allCases`) can't be counted statically
+    and count as a single run.
+    """
+    arguments = _split_top_level(tokens, open_index + 1, close_index)
+    runs = 1
+    collections = False
+
+    for start, end in arguments:
+        if end - start > 2 and tokens[start][1] == "arguments" and tokens[start + 1][1] == ":":
+            collections = True
+            start += 2
+
+        if not collections:
+            continue
+
+        if tokens[start][1] == "[" and _matching_close(tokens, start) == end - 1:
+            runs *= max(len(_split_top_level(tokens, start + 1, end - 1)), 1)
+
+    return runs
+
+
+def analyze(text):
+    """
+    Returns everything the metrics scripts need from a Swift source file:
+      - events: [(name, line)] for `let name = Event(...)` declarations
+      - tests: [(name, line, runs)] for XCTest `func test...` and Swift Testing `@Test` functions
+      - view_conformances: [(type name, line)] for types whose inheritance clause includes `View`
+      - call_sites: [(name, line)] for `Name(` calls that aren't member calls or declarations
+      - telemetry_references: [(name, line)] for identifiers referenced in a `Telemetry.` expression
+    """
+    tokens = tokenize(text)
+    count = len(tokens)
+    result = {
+        "events": [],
+        "tests": [],
+        "view_conformances": [],
+        "call_sites": [],
+        "telemetry_references": [],
+    }
+
+    pending_test_runs = None
+    paren_depth = 0
+    telemetry_line = None
+    telemetry_depth = 0
+
+    for i, (kind, value, line, offset) in enumerate(tokens):
+        previous = tokens[i - 1][1] if i else None
+        following = tokens[i + 1] if i + 1 < count else None
+
+        if value == "(":
+            paren_depth += 1
+        elif value == ")":
+            paren_depth -= 1
+
+        # Telemetry: identifiers in a `Telemetry.` expression, until the end of its line or its enclosing call.
+        if telemetry_line is not None and line != telemetry_line and paren_depth <= telemetry_depth:
+            telemetry_line = None
+        if kind == "identifier" and value == "Telemetry" and following and following[1] == ".":
+            telemetry_line = line
+            telemetry_depth = paren_depth
+        elif kind == "identifier" and telemetry_line is not None:
+            result["telemetry_references"].append((value, line))
+
+        if kind == "attribute":
+            # `@Test` or `@Test(...)`, applying to the next `func`.
+            if value == "@Test":
+                pending_test_runs = 1
+                if following and following[1] == "(" and following[3] == offset + len(value):
+                    pending_test_runs = _test_runs(tokens, i + 1, _matching_close(tokens, i + 1))
+            continue
+
+        if kind != "identifier":
+            continue
+
+        if value == "func" and following and following[0] == "identifier":
+            name = following[1]
+            if pending_test_runs is not None:
+                result["tests"].append((name, following[2], pending_test_runs))
+            elif name.startswith("test"):
+                result["tests"].append((name, following[2], 1))
+            pending_test_runs = None
+
+        elif value == "let" and following and following[0] == "identifier":
+            # `let name = Event(...)`, optionally with a type annotation.
+            j = i + 2
+            if j < count and tokens[j][1] == ":":
+                while j < count and tokens[j][1] not in ("=", "{", "}") and tokens[j][2] == line:
+                    j += 1
+            if j + 1 < count and tokens[j][1] == "=" and tokens[j + 1][1] == "Event":
+                result["events"].append((following[1], following[2]))
+
+        elif value in TYPE_DECLARATION_KEYWORDS and following and following[0] == "identifier":
+            # Walks the inheritance clause up to the type's body, skipping generic parameters such as `<Content: View>`.
+            j = i + 2
+            generic_depth = 0
+            inherited = False
+            while j < count and tokens[j][1] not in ("{", "}", ";", "where"):
+                if tokens[j][1] == "<":
+                    generic_depth += 1
+                elif tokens[j][1] == ">":
+                    generic_depth -= 1
+                elif generic_depth:
+                    pass
+                elif tokens[j][1] == ":":
+                    inherited = True
+                elif inherited and tokens[j][1] == "View":
+                    result["view_conformances"].append((following[1], following[2]))
+                    break
+                j += 1
+
+        elif (
+            following and following[1] == "(" and following[3] == offset + len(value)
+            and previous != "." and previous != "func" and value not in NON_CALL_KEYWORDS
+        ):
+            result["call_sites"].append((value, line))
+
+    return result
+
+
+def analyze_file(file):
+    with open(file, encoding="utf-8", errors="replace") as f:
+        return analyze(f.read())
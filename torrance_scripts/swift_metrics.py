@@ -0,0 +1,104 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from . import line_stats
+from . import swift_lexer
+
+# Per-file scanners for the Swift metrics scripts.
+# ------------------
+# These run inside `parallel_scan` worker processes, so they live in a module without top-level side effects and
+# take everything they depend on as arguments. Each one returns a small, JSON serializable dict of counts for a
+# single file, which is what gets cached by `metrics_cache` and merged by the calling script.
+#
+# Both scanners work off a single `swift_lexer.analyze` pass per file, so code inside comments and string literals
+# is never counted.
+#
+# Bump `SCAN_VERSION` whenever a scanner's results change, so cached results from older builds are discarded.
+# ------------------
+
+SCAN_VERSION = 5
+
+def read_source(file):
+    with open(file, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+# Telemetry
+def event_declarations(event_files):
+    """Returns every `let someTelemetryEvent = Event(...)` declaration as (Events+Domain, someTelemetryEvent)."""
+    return [
+        (file.stem, name)
+        for file in event_files
+        for name, line in swift_lexer.analyze(read_source(file))["events"]
+    ]
+
+@lru_cache(maxsize=None)
+def event_domains(events):
+    domains = defaultdict(list)
+    for domain, name in events:
+        domains[name].append(domain)
+    return dict(domains)
+
+def scan_project_file(file, events):
+    """Counts the tests, test runs, telemetry usages and lines of a single .swift file for `log_project_metrics.py`."""
+    with open(file, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8", errors="replace")
+    analysis = swift_lexer.analyze(text)
+    result = {
+        "tests": 0,
+        "test_runs": 0,
+        "telemetry": defaultdict(int),
+        "lines": line_stats.count_bytes(data, text),
+    }
+
+    # Tests
+    # -----
+    # Every XCTest `func test...` and Swift Testing `@Test` function, and the number of times each one runs
+    # (parameterized `@Test(arguments: [...])` functions run once per argument).
+    for name, line, runs in analysis["tests"]:
+        result["tests"] += 1
+        result["test_runs"] += runs
+    # -----
+
+    # Telemetry
+    # ---------
+    # Counts the events referenced in `Telemetry.` expressions, and associates the usages with the file name in which
+    # the event was declared. Files in the Telemetry package itself aren't usages.
+    if "Packages/Telemetry" not in str(file):
+        domains = event_domains(tuple(map(tuple, events)))
+        for name, line in analysis["telemetry_references"]:
+            for domain in domains.get(name, ()):
+                result["telemetry"][domain] += 1
+    # ---------
+
+    result["telemetry"] = dict(result["telemetry"])
+    return result
+
+# Design System
+def design_system_objects(design_system_files):
+    """
+    Returns the design system components, i.e. the files in the design system declaring a `View`. Components are
+    named after their file, which is also how their usage metrics are named.
+    """
+    return [
+        file.stem
+        for file in design_system_files
+        if swift_lexer.analyze(read_source(file))["view_conformances"]
+    ]
+
+def scan_design_usages(file, design_system_objects):
+    """
+    Finds the design system usages in a single code file as {dso: [(line index, line)]}. Every call site found by the
+    lexer is looked up in the set of component names, and a line counts once per component called on it.
+    """
+    text = read_source(file)
+    components = set(design_system_objects)
+    usages = defaultdict(list)
+    lines = None
+
+    for name, line in dict.fromkeys(swift_lexer.analyze(text)["call_sites"]):
+        if name in components:
+            lines = lines or text.splitlines(True)
+            usages[name].append((line - 1, lines[line - 1]))
+
+    return dict(usages)
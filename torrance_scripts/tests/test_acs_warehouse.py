@@ -0,0 +1,62 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("duckdb")
+
+from torrance_scripts import acs_warehouse
+
+TOTAL_65 = "Estimate!!SEX AND AGE!!Total population!!65 years and over"
+GEOGRAPHY = "tract:06:037"
+
+
+@pytest.fixture
+def warehouse(monkeypatch, tmp_path):
+    # A quote in the path, which the views' SQL has to escape.
+    monkeypatch.setattr(acs_warehouse, "WAREHOUSE_DIR", str(tmp_path / "o'warehouse"))
+    dataset = "acs/acs5/profile"
+
+    def store(vintage, labels, values):
+        acs_warehouse._write_parquet(acs_warehouse.variables_path(vintage, dataset), pd.DataFrame(
+            [(dataset, code, label, "estimate", "DP05") for code, label in labels.items()],
+            columns=["dataset", "variable", "label", "kind", "group"],
+        ))
+        acs_warehouse._write_parquet(acs_warehouse.partition_path(vintage, dataset, GEOGRAPHY), pd.DataFrame(
+            [(dataset, geoid, code, value) for (geoid, code), value in values.items()],
+            columns=["dataset", "geoid", "variable", "value"],
+        ))
+
+    # The code of the 65 and over total moved between the releases, and 2023 lists its label twice.
+    store(2019, {"DP05_0029E": TOTAL_65}, {("06037650101", "DP05_0029E"): 100.0, ("06037650102", "DP05_0029E"): 200.0})
+    store(2022, {"DP05_0024E": TOTAL_65, "DP05_0029E": "Estimate!!SEX AND AGE!!Total population!!Under 5 years"}, {
+        ("06037650101", "DP05_0024E"): 110.0, ("06037650102", "DP05_0024E"): 180.0,
+        ("06037650101", "DP05_0029E"): 5.0, ("06037650102", "DP05_0029E"): 6.0,
+    })
+    store(2023, {"DP05_0024E": TOTAL_65, "DP05_0033E": TOTAL_65}, {("06037650101", "DP05_0024E"): 120.0})
+    connection = acs_warehouse.connect()
+    yield connection
+    connection.close()
+
+
+def test_labels_are_resolved_to_one_code_per_vintage(warehouse):
+    change = acs_warehouse.change_over_time(warehouse, TOTAL_65, 2019, 2022, GEOGRAPHY)
+
+    assert change["geoid"].tolist() == ["06037650101", "06037650102"]
+    assert change["from_value"].tolist() == [100.0, 200.0]
+    assert change["to_value"].tolist() == [110.0, 180.0]
+    assert change["change"].tolist() == [10.0, -20.0]
+
+
+def test_codes_are_compared_as_is(warehouse):
+    change = acs_warehouse.change_over_time(warehouse, "DP05_0029E", 2019, 2022, GEOGRAPHY)
+
+    assert change["to_value"].tolist() == [5.0, 6.0]
+
+
+def test_ambiguous_labels_raise(warehouse):
+    with pytest.raises(ValueError, match="ambiguous"):
+        acs_warehouse.change_over_time(warehouse, TOTAL_65, 2019, 2023, GEOGRAPHY)
+
+
+def test_unknown_variables_raise(warehouse):
+    with pytest.raises(ValueError, match="No variable"):
+        acs_warehouse.change_over_time(warehouse, "DP05_9999E", 2019, 2022, GEOGRAPHY)
@@ -0,0 +1,71 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from torrance_scripts import addresses
+from torrance_scripts import resident_join
+
+
+def series(*values):
+    return pd.Series(values, dtype=object)
+
+
+def test_street_types_and_directions_are_abbreviated():
+    streets = addresses.street(series("Hawthorne Boulevard", "West 190th Street", "Pacific Coast Highway", "E St."))
+
+    assert list(streets) == ["HAWTHORNE BLVD", "190TH ST", "PACIFIC COAST HWY", "E ST"]
+
+
+def test_units_are_normalized():
+    units = addresses.unit(series("Apt 4", "APARTMENT 4", "#4", "Unit #4B", "ste. 12", "", None))
+
+    assert list(units) == ["#4", "#4", "#4", "#4B", "#12", "", ""]
+
+
+def test_zip_codes_keep_their_first_five_digits():
+    codes = addresses.zip_code(series("90501-1234", "90501.0", " 90503 ", "", None))
+
+    assert list(codes) == ["90501", "90501", "90503", "", ""]
+
+
+def test_parsed_addresses_and_points_get_the_same_key():
+    parts = addresses.parse(series("21515 Hawthorne Blvd. Apt 4", "1234 W. 190th Street"))
+    parsed = addresses.key(parts["number"], parts["street"], parts["unit"], series("90503-1234", "90504"))
+    points = addresses.key(series("21515", "1234"), series("HAWTHORNE BOULEVARD", "190TH ST"), series("#4", None), series("90503", "90504.0"))
+
+    assert list(parsed) == ["21515 HAWTHORNE BLVD #4 90503", "1234 190TH ST 90504"]
+    assert list(points) == list(parsed)
+
+
+def test_building_keys_have_no_unit():
+    keys = addresses.key(series("21515"), series("Hawthorne Blvd"), None, series("90503"))
+
+    assert list(keys) == ["21515 HAWTHORNE BLVD 90503"]
+
+
+def test_addresses_without_a_number_or_street_have_an_empty_key():
+    parts = addresses.parse(series("PO Box 123", "", None))
+    keys = addresses.key(parts["number"], parts["street"], parts["unit"], series("90501", "90501", "90501"))
+    points = addresses.key(series("", "21515", None), series("Hawthorne Blvd", "", ""), series(None, None, None), series("90501", "90501", "90501"))
+
+    assert list(keys) == ["", "", ""]
+    assert list(points) == ["", "", ""]
+
+
+def test_residents_and_points_without_a_key_are_never_matched(tmp_path):
+    openaddresses = tmp_path / "torrance_addresses.csv"
+    pd.DataFrame({
+        "number": ["21515", "", "1234"],
+        "street": ["Hawthorne Blvd", "Hawthorne Blvd", ""],
+        "unit": ["", "", ""],
+        "postcode": ["90501"] * 3,
+        "lon": [-118.35, -118.36, -118.37],
+        "lat": [33.83, 33.84, 33.85],
+    }).to_csv(openaddresses, index=False)
+    points = resident_join.address_points(None, str(openaddresses))
+    residents = pd.DataFrame({"address": ["21515 Hawthorne Blvd", "PO Box 123", "PO Box 123 #4"], "zip": ["90501"] * 3})
+    geocoded = resident_join.geocode(residents, points)
+
+    assert list(points["addr_key"]) == ["21515 HAWTHORNE BLVD 90501"]
+    assert list(geocoded["match"]) == ["address", "", ""]
+    assert geocoded["lon"].isna().tolist() == [False, True, True]
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("datadog_api_client")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import stub_servers
+
+from torrance_scripts import datadog_client
+
+
+@pytest.fixture
+def intake(monkeypatch):
+    server = stub_servers.StubServer().start()
+    monkeypatch.setenv("DATADOG_HOST", server.env()["DATADOG_HOST"])
+    monkeypatch.setenv("DATADOG_API_KEY", "test")
+    monkeypatch.setattr(datadog_client, "_api_client", None)
+    yield server
+    datadog_client.api_client().close()
+    server.stop()
+
+
+def test_logs_are_split_into_batches_of_max_log_items(intake):
+    items = [datadog_client.log_item(message=f"log {i}", service="test") for i in range(2500)]
+    datadog_client.submit_logs(items)
+
+    assert [count for path, encoding, size, count in intake.datadog_requests] == [1000, 1000, 500]
+    assert intake.submitted["log_items"] == 2500
+
+
+def test_metrics_are_split_under_max_payload_bytes(intake):
+    # About 100 KB per series, so 70 series take three batches.
+    tags = [f"tag{i}:{'x' * 5000}" for i in range(20)]
+    series = [datadog_client.metric_series(f"test.metric{i}", i, tags=tags) for i in range(70)]
+    datadog_client.submit_metrics(series)
+
+    sizes = [size for path, encoding, size, count in intake.datadog_requests]
+    assert len(sizes) == 3
+    assert all(size <= datadog_client.MAX_PAYLOAD_BYTES for size in sizes)
+    assert intake.submitted["metric_series"] == 70
+
+
+def test_payloads_are_gzipped(intake):
+    datadog_client.submit_metrics([datadog_client.metric_series("test.metric", 1)])
+    datadog_client.submit_logs([datadog_client.log_item(message="log", service="test")])
+
+    assert [encoding for path, encoding, size, count in intake.datadog_requests] == ["gzip", "gzip"]
+
+
+def test_server_errors_are_retried(intake):
+    intake.datadog_failures = 1
+    datadog_client.submit_metrics([datadog_client.metric_series("test.metric", 1)])
+
+    assert intake.requests["datadog"] == 2
+    assert intake.submitted["metric_series"] == 1
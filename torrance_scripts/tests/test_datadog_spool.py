@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("datadog_api_client")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import stub_servers
+
+from torrance_scripts import datadog_client
+from torrance_scripts import datadog_spool
+
+
+@pytest.fixture
+def intake(monkeypatch, tmp_path):
+    server = stub_servers.StubServer().start()
+    monkeypatch.setenv("DATADOG_HOST", server.env()["DATADOG_HOST"])
+    monkeypatch.setenv("DATADOG_API_KEY", "test")
+    monkeypatch.setattr(datadog_client, "_api_client", None)
+    monkeypatch.setattr(datadog_spool, "SPOOL_PATH", str(tmp_path / "spool.jsonl"))
+    monkeypatch.setattr(datadog_spool, "SPOOL_MODE", "defer")
+    yield server
+    datadog_client.api_client().close()
+    server.stop()
+
+
+def spooled_metrics():
+    if not os.path.exists(datadog_spool.SPOOL_PATH):
+        return []
+    with open(datadog_spool.SPOOL_PATH) as f:
+        return [json.loads(line)["data"]["metric"] for line in f]
+
+
+def spool(count):
+    datadog_spool.spool_metrics([datadog_client.metric_series(f"test.metric{i}", i) for i in range(count)])
+
+
+def test_replayed_records_leave_the_spool(intake):
+    spool(10)
+    datadog_spool.replay()
+
+    assert intake.submitted["metric_series"] == 10
+    assert spooled_metrics() == []
+
+
+@pytest.mark.parametrize("status", [401, 403, 404])
+def test_configuration_errors_keep_the_records(intake, status):
+    intake.datadog_status = status
+    spool(10)
+    datadog_spool.replay()
+
+    assert intake.submitted["metric_series"] == 0
+    assert sorted(spooled_metrics()) == sorted(f"test.metric{i}" for i in range(10))
+
+
+def test_rejected_records_are_dropped_on_their_own(intake):
+    intake.datadog_rejected_metrics = {"test.metric3"}
+    spool(10)
+    datadog_spool.replay()
+
+    assert intake.submitted["metric_series"] == 9
+    # The good records went through in the halves the rejected batch was split into.
+    assert len(intake.datadog_requests) > 1
+    assert spooled_metrics() == []
+
+
+def test_records_of_failed_replays_are_kept(intake, monkeypatch):
+    # More 503s than the client retries. The first retry is immediate, later ones back off for seconds.
+    monkeypatch.setattr(datadog_client, "MAX_RETRIES", 1)
+    intake.datadog_failures = 2
+    spool(10)
+    datadog_spool.replay()
+
+    assert intake.submitted["metric_series"] == 0
+    assert len(spooled_metrics()) == 10
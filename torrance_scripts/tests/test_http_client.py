@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import stub_servers
+
+from torrance_scripts import http_client
+from torrance_scripts import instrumentation
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(http_client, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(http_client, "_cache_bytes", None)
+    return tmp_path
+
+
+@pytest.fixture
+def server():
+    server = stub_servers.StubServer().start()
+    yield server
+    server.stop()
+
+
+def test_ttl_replaces_the_servers_freshness_lifetime():
+    assert http_client._freshness_lifetime({"Cache-Control": "no-store"}, ttl=60) == 60
+
+
+@pytest.mark.parametrize("headers, lifetime", [
+    ({"Cache-Control": "no-store"}, None),
+    ({"Cache-Control": "no-cache, max-age=60"}, 0),
+    ({"Cache-Control": "public, max-age=60"}, 60),
+    ({"Date": "Mon, 01 Jan 2024 00:00:00 GMT", "Expires": "Mon, 01 Jan 2024 01:00:00 GMT"}, 3600),
+    ({"Date": "Mon, 01 Jan 2024 00:00:00 GMT", "Expires": "Sun, 31 Dec 2023 00:00:00 GMT"}, 0),
+    ({"Date": "Mon, 11 Jan 2024 00:00:00 GMT", "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, 86400),
+    ({}, 0),
+])
+def test_freshness_lifetime(headers, lifetime):
+    assert http_client._freshness_lifetime(headers, ttl=None) == lifetime
+
+
+def test_stale_responses_are_revalidated(cache_dir, server):
+    # The stub serves group metadata with an ETag and no freshness lifetime, so every reuse is revalidated.
+    url = f"{server.url}/census/2022/acs/acs5/profile/groups/DP02.json"
+    first = http_client.get(url)
+    second = http_client.get(url)
+
+    assert first.from_cache is False
+    assert second.from_cache is True
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert server.requests["census"] == 2
+
+
+def test_fresh_responses_are_served_from_the_cache(cache_dir, server):
+    url = f"{server.url}/census/2022/acs/acs5/profile/groups/DP02.json"
+    http_client.get(url, ttl=60)
+    response = http_client.get(url, ttl=60)
+
+    assert response.from_cache is True
+    assert server.requests["census"] == 1
+
+
+def test_uncached_requests_never_touch_the_cache(cache_dir, server):
+    url = f"{server.url}/census/2022/acs/acs5/profile/groups/DP02.json"
+    http_client.get(url, ttl=60, cache=False)
+    http_client.get(url, ttl=60, cache=False)
+
+    assert server.requests["census"] == 2
+    assert os.listdir(cache_dir) == []
+
+
+def test_least_recently_used_responses_are_evicted(cache_dir, monkeypatch):
+    def store(name):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = f"https://example.com/{name}"
+        response._content = b"x" * 1000
+        http_client._store(name, response, 60)
+
+    monkeypatch.setattr(http_client, "CACHE_MAX_BYTES", 5000)
+    now = time.time()
+    for age, name in enumerate(["d", "c", "b", "a"], 1):
+        store(name)
+        os.utime(cache_dir / f"{name}.json", (now - 10 * age, now - 10 * age))
+    # "a" is the oldest, but using it makes "b" the least recently used.
+    http_client._load_entry("a")
+    store("e")
+
+    cached = {path.stem for path in cache_dir.glob("*.json")}
+    assert "b" not in cached
+    assert {"a", "d", "e"} <= cached
+    assert sum(path.stat().st_size for path in cache_dir.iterdir()) <= 0.9 * 5000
+
+
+def test_http_client_does_not_register_a_run_report(cache_dir, server, monkeypatch):
+    monkeypatch.setattr(instrumentation, "_report_registered", False)
+    http_client.get(f"{server.url}/census/2022/acs/acs5/profile/groups/DP02.json")
+
+    assert instrumentation._report_registered is False
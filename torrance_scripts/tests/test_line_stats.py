@@ -0,0 +1,31 @@
+from torrance_scripts import line_stats
+
+
+def test_counts_blank_comment_and_code_lines():
+    data = b"import Foo\n\n// comment\n/* block\n\n   comment */\nlet x = 1 // trailing\n"
+    assert line_stats.count_bytes(data) == {"total": 7, "blank": 2, "comment": 3, "code": 2}
+
+
+def test_comment_delimiters_in_strings_are_code():
+    data = b'let glob = "Sources/*.swift"\nlet a = 1\nlet b = 2\n// real comment\nfunc f() {}\n'
+    assert line_stats.count_bytes(data) == {"total": 5, "blank": 0, "comment": 1, "code": 4}
+
+
+def test_comment_delimiters_in_multiline_and_raw_strings_are_code():
+    data = b'let a = """\n// not a comment\n/* nor this\n"""\nlet b = #"/* "# // comment\n// comment\n'
+    assert line_stats.count_bytes(data) == {"total": 6, "blank": 0, "comment": 1, "code": 5}
+
+
+def test_nested_block_comments():
+    data = b"/* a /* nested */ still comment */\nlet x = 1\n"
+    assert line_stats.count_bytes(data) == {"total": 2, "blank": 0, "comment": 1, "code": 1}
+
+
+def test_code_after_nested_block_comment_is_code():
+    data = b"/* a\n/* nested */\nstill comment */ let x = 1\nlet y = 2\n"
+    assert line_stats.count_bytes(data) == {"total": 4, "blank": 0, "comment": 2, "code": 2}
+
+
+def test_empty_and_unterminated():
+    assert line_stats.count_bytes(b"") == {"total": 0, "blank": 0, "comment": 0, "code": 0}
+    assert line_stats.count_bytes(b"let x = 1\n/* open\nstill open") == {"total": 3, "blank": 0, "comment": 2, "code": 1}
@@ -0,0 +1,72 @@
+import pytest
+
+from torrance_scripts import pipeline
+from torrance_scripts.pipeline import Stage
+
+
+def stages():
+    return [
+        Stage("a", ["sort"], inputs=["in.txt"], outputs=["a.txt"]),
+        Stage("b", ["sort"], inputs=["a.txt"], outputs=["b.txt"]),
+        Stage("c", ["sort"], inputs=["in.txt"], outputs=["c.txt"], after=["b"]),
+    ]
+
+
+def test_stages_depend_on_the_writers_of_their_inputs_and_their_after_stages():
+    assert pipeline.dependencies(stages()) == {"a": set(), "b": {"a"}, "c": {"b"}}
+
+
+def test_outputs_have_a_single_writer():
+    with pytest.raises(ValueError, match="a.txt"):
+        pipeline.dependencies([*stages(), Stage("d", ["sort"], inputs=[], outputs=["a.txt"])])
+
+
+def test_stage_modules_include_the_helpers_they_import():
+    assert pipeline.local_modules("resident_join") == ["addresses", "census_geo", "instrumentation", "resident_join"]
+    assert "acs_catalog" in pipeline.local_modules("scrape")
+
+
+@pytest.fixture
+def runner(tmp_path):
+    (tmp_path / "in.txt").write_text("input")
+    (tmp_path / "a.txt").write_text("output")
+    runner = pipeline.Runner(stages(), tmp_path)
+    stage = runner.stages["a"]
+    runner.manifest["stages"]["a"] = {"key": runner.stage_key(stage), "outputs": {"a.txt": runner.file_hash("a.txt")}}
+    return runner
+
+
+def test_stages_are_up_to_date_until_their_key_or_outputs_change(runner, tmp_path):
+    stage = runner.stages["a"]
+    assert runner.up_to_date(stage, runner.stage_key(stage))
+
+    (tmp_path / "a.txt").write_text("edited output")
+    assert not runner.up_to_date(stage, runner.stage_key(stage))
+
+
+def test_stages_are_out_of_date_when_their_inputs_change(runner, tmp_path):
+    stage = runner.stages["a"]
+    (tmp_path / "in.txt").write_text("new input")
+
+    assert not runner.up_to_date(stage, runner.stage_key(stage))
+
+
+def test_forced_stages_are_never_up_to_date(runner):
+    runner.force = {"a"}
+    stage = runner.stages["a"]
+
+    assert not runner.up_to_date(stage, runner.stage_key(stage))
+
+
+def test_stages_downstream_of_a_failure_are_skipped_and_reported(tmp_path, capsys, monkeypatch):
+    def run_stage(name):
+        raise RuntimeError("exit 1")
+
+    runner = pipeline.Runner(stages(), tmp_path)
+    monkeypatch.setattr(runner, "run_stage", run_stage)
+    statuses = runner.run()
+
+    assert statuses == {"a": "failed: exit 1", "b": "skipped, a failed", "c": "skipped, b failed"}
+    output = capsys.readouterr().out
+    assert "b: skipped, a failed" in output
+    assert "c: skipped, b failed" in output
@@ -0,0 +1,127 @@
+import re
+import threading
+
+import pytest
+
+from torrance_scripts import mr_summary_bot
+from torrance_scripts import prompt_packer
+
+
+class StubModel:
+    """Stands in for Gemini: map prompts get a `#### path` summary per file, other prompts the final summary."""
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+        if "summarizing one part" in prompt:
+            return "\n".join(f"#### {path}\n- Changed {path}" for path in re.findall(r"### File: (\S+)", prompt))
+        return "Final summary"
+
+    def map_prompts(self):
+        return [prompt for prompt in self.prompts if "summarizing one part" in prompt]
+
+
+def file_data(path, lines=20, before_lines=0):
+    after = "\n".join(f"let value{i} = {i}" for i in range(lines))
+    before = "\n".join(f"let old{i} = {i}" for i in range(before_lines))
+    diff = "\n".join(f"+{i}: let value{i} = {i}" for i in range(min(lines, 50)))
+    return {
+        "new_path": path,
+        "old_path": path,
+        "full_file_content": after,
+        "old_file_content": before,
+        "formatted_diff": diff,
+        "changed_lines": list(range(1, min(lines, 50) + 1)),
+    }
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    # A smaller prompt budget, so a few files already take several prompts.
+    monkeypatch.setattr(prompt_packer, "PROMPT_TOKEN_BUDGET", 40_000)
+    return 40_000
+
+
+def test_small_mr_is_summarized_in_a_single_prompt(budget):
+    model = StubModel()
+    summary = mr_summary_bot.get_gemini_summary_for_mr([file_data(f"File{i}.swift") for i in range(5)], "Title", "", generate=model)
+
+    assert summary == "Final summary"
+    assert len(model.prompts) == 1
+    assert all(f"### File: File{i}.swift" in model.prompts[0] for i in range(5))
+
+
+def test_large_mr_is_map_reduced_within_the_prompt_budget(budget):
+    model = StubModel()
+    files = [file_data(f"File{i}.swift", lines=2_000) for i in range(10)]
+    summary = mr_summary_bot.get_gemini_summary_for_mr(files, "Title", "", generate=model)
+
+    assert summary == "Final summary"
+    assert len(model.map_prompts()) > 1
+    assert len(model.prompts) == len(model.map_prompts()) + 1
+    assert all(prompt_packer.estimate_tokens(prompt) <= budget for prompt in model.prompts)
+    mapped = [path for prompt in model.map_prompts() for path in re.findall(r"### File: (\S+)", prompt)]
+    assert sorted(mapped) == sorted(f"File{i}.swift" for i in range(10))
+
+
+def test_too_many_files_for_a_single_prompt_are_map_reduced(budget):
+    model = StubModel()
+    files = [file_data(f"File{i}.swift", lines=2) for i in range(mr_summary_bot.MAX_FILES_TO_ANALYZE + 1)]
+    mr_summary_bot.get_gemini_summary_for_mr(files, "Title", "", generate=model)
+
+    assert len(model.map_prompts()) == 2
+
+
+def test_map_groups_are_capped(budget):
+    model = StubModel()
+    files = [file_data(f"File{i}.swift", lines=2_000) for i in range(80)]
+    mr_summary_bot.get_gemini_summary_for_mr(files, "Title", "", generate=model)
+
+    assert len(model.map_prompts()) == prompt_packer.MAX_MAP_GROUPS
+    reduce_prompt = model.prompts[-1]
+    assert "too large to be summarized" in reduce_prompt
+    mapped = {path for prompt in model.map_prompts() for path in re.findall(r"### File: (\S+)", prompt)}
+    assert all(f"- {file['new_path']}" in reduce_prompt for file in files if file["new_path"] not in mapped)
+
+
+def test_file_sections_stay_within_the_file_budget():
+    headers = 200 // prompt_packer.CHARS_PER_TOKEN
+    for lines, before_lines in ((60, 60), (300, 40), (3_000, 40), (3_000, 3_000)):
+        for token_budget in (1_000, 4_000, prompt_packer.FILE_TOKEN_BUDGET):
+            section = prompt_packer.file_section(file_data("File.swift", lines, before_lines), token_budget)
+            assert prompt_packer.estimate_tokens(section) <= token_budget + headers
+
+
+def test_small_files_keep_their_content_before_changes():
+    section = prompt_packer.file_section(file_data("File.swift", lines=60, before_lines=60))
+
+    assert "Full File Content (Before Changes)" in section
+    assert "Full File Content (After Changes)" in section
+
+
+def test_small_mr_without_cached_summaries_is_summarized_in_a_single_prompt(budget):
+    model = StubModel()
+    file_summaries = {}
+    mr_summary_bot.get_gemini_summary_for_mr([file_data("File.swift")], "Title", "", generate=model, file_summaries=file_summaries)
+
+    assert len(model.prompts) == 1
+    assert model.map_prompts() == []
+
+
+def test_cached_file_summaries_are_reused(budget):
+    files = [file_data(f"File{i}.swift", lines=2_000) for i in range(4)]
+    file_summaries = {}
+    mr_summary_bot.get_gemini_summary_for_mr(files, "Title", "", generate=StubModel(), file_summaries=file_summaries)
+    assert len(file_summaries) == 4
+
+    # An incremental push changing one file only maps that file.
+    model = StubModel()
+    files = [file_data(f"File{i}.swift", lines=2_000) for i in range(3)] + [file_data("File3.swift", lines=20)]
+    mr_summary_bot.get_gemini_summary_for_mr(files, "Title", "", generate=model, file_summaries=file_summaries)
+
+    assert [re.findall(r"### File: (\S+)", prompt) for prompt in model.map_prompts()] == [["File3.swift"]]
+    assert all(f"#### File{i}.swift" in model.prompts[-1] for i in range(4))
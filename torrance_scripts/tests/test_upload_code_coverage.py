@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+pytest.importorskip("datadog_api_client")
+
+from torrance_scripts import datadog_spool
+from torrance_scripts import metrics_cache
+from torrance_scripts import upload_code_coverage
+
+
+def test_malformed_entries_are_skipped(tmp_path, monkeypatch, capsys):
+    report = tmp_path / "report.json"
+    report.write_text(json.dumps({"targets": [
+        {"name": "App", "lineCoverage": 0.5, "files": [
+            {"name": "A.swift", "path": "/src/App/A.swift", "lineCoverage": 0.25},
+            {"lineCoverage": 0.75},
+            {"name": "C.swift", "path": "/src/App/C.swift"},
+        ]},
+        {"lineCoverage": 0.5, "files": []},
+    ]}))
+    spooled = []
+    monkeypatch.setattr(metrics_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(datadog_spool, "spool_metrics", spooled.extend)
+
+    coverage = upload_code_coverage.upload_code_coverage("Scheme", str(report), "Total: 42.5%", [], "all", "/src")
+
+    assert dict(coverage) == {"TotalCoverage": 42.5, "App": 0.5}
+    assert sorted(series.metric for series in spooled) == [
+        "mvn.codeCoverage.iOS.Scheme.App",
+        "mvn.codeCoverage.iOS.Scheme.TotalCoverage",
+        "mvn.codeCoverage.iOS.Scheme.file",
+    ]
+    assert capsys.readouterr().out.count("Warning: skipping") == 3
@@ -0,0 +1,132 @@
+from bisect import bisect_left, bisect_right
+
+import argparse
+import mmap
+import os
+import struct
+
+# Compact binary precinct → tract index.
+# ------------------
+# Precinct IDs (up to 8 ASCII characters, e.g. "7150064F") are packed big-endian into a uint64, so numeric order is
+# the same as string order, and tract GEOIDs (11 digits) are stored as their integer value. The file holds:
+#   - a 16 byte header: magic, version (uint32) and entry count (uint64)
+#   - the forward table: precinct keys in sorted order, followed by the tract of each precinct
+#   - the reverse table: tract keys in sorted order, followed by the precinct of each tract
+# All values are little-endian uint64 arrays, so the file is memory-mapped and searched in place with `bisect`,
+# without parsing anything. The header's size keeps the arrays 8-byte aligned, so the front end can read them with
+# a `BigUint64Array` over the file's `ArrayBuffer`, starting at offset 16.
+#
+# Build it with `python -m torrance_scripts tract_index [source] [output]`, where source is a Precinct_ID,Census_Tract CSV
+# (default `data/precinct_tracts.csv`) or the `tract_cache.json` written by `scrape.py`.
+# ------------------
+
+MAGIC = b"PTIX"
+VERSION = 2
+# 16 bytes, so the uint64 arrays after it are 8-byte aligned.
+HEADER = struct.Struct("<4sIQ")
+PRECINCT_ID_BYTES = 8
+GEOID_DIGITS = 11
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+INDEX_PATH = os.path.join(DATA_DIR, "precinct_tracts.idx")
+
+def encode_precinct(precinct_id):
+    encoded = precinct_id.strip().upper().encode("ascii")
+    if len(encoded) > PRECINCT_ID_BYTES:
+        raise ValueError(f"Precinct ID {precinct_id!r} is longer than {PRECINCT_ID_BYTES} characters")
+    return int.from_bytes(encoded.ljust(PRECINCT_ID_BYTES, b"\0"), "big")
+
+def decode_precinct(key):
+    return key.to_bytes(PRECINCT_ID_BYTES, "big").rstrip(b"\0").decode("ascii")
+
+def encode_geoid(geoid):
+    return int(geoid)
+
+def decode_geoid(key):
+    return str(key).zfill(GEOID_DIGITS)
+
+def build_index(precinct_tracts):
+    """Returns the index file contents for {precinct id: tract GEOID}."""
+    forward = sorted((encode_precinct(precinct), encode_geoid(tract)) for precinct, tract in precinct_tracts.items())
+    reverse = sorted((tract, precinct) for precinct, tract in forward)
+    count = len(forward)
+
+    values = [key for key, value in forward] + [value for key, value in forward]
+    values += [key for key, value in reverse] + [value for key, value in reverse]
+    return HEADER.pack(MAGIC, VERSION, count) + struct.pack(f"<{4 * count}Q", *values)
+
+def write_index(precinct_tracts, path=INDEX_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(build_index(precinct_tracts))
+    os.replace(temp_path, path)
+
+class TractIndex:
+    """A memory-mapped precinct → tract index. Use it as a context manager, or call `close()` when done."""
+
+    def __init__(self, path=INDEX_PATH):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} tract index")
+
+        # Native uint64 views over the mapped arrays (all supported hosts are little-endian); `bisect` searches them in place.
+        self._values = memoryview(self._mmap)[HEADER.size:].cast("Q")
+        count = self.count
+        self._precincts, self._precinct_tracts = self._values[:count], self._values[count:2 * count]
+        self._tracts, self._tract_precincts = self._values[2 * count:3 * count], self._values[3 * count:]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for view in (self._precincts, self._precinct_tracts, self._tracts, self._tract_precincts, self._values):
+            view.release()
+        self._mmap.close()
+
+    def __len__(self):
+        return self.count
+
+    def tract(self, precinct_id):
+        """Returns the tract GEOID of `precinct_id`, or None."""
+        key = encode_precinct(precinct_id)
+        i = bisect_left(self._precincts, key)
+        if i < self.count and self._precincts[i] == key:
+            return decode_geoid(self._precinct_tracts[i])
+        return None
+
+    def precincts(self, geoid):
+        """Returns the sorted precinct IDs in tract `geoid`."""
+        key = encode_geoid(geoid)
+        start = bisect_left(self._tracts, key)
+        end = bisect_right(self._tracts, key, start)
+        return [decode_precinct(precinct) for precinct in self._tract_precincts[start:end]]
+
+    def tracts(self):
+        """Returns the sorted unique tract GEOIDs."""
+        return [decode_geoid(tract) for tract in dict.fromkeys(self._tracts)]
+
+    def items(self):
+        return [(decode_precinct(precinct), decode_geoid(tract)) for precinct, tract in zip(self._precincts, self._precinct_tracts)]
+
+def main(argv=None):
+    from . import census_geo
+
+    parser = argparse.ArgumentParser(description="Builds the binary precinct → tract index.")
+    parser.add_argument("source", nargs="?", default=census_geo.PRECINCT_TRACTS_PATH, help="Precinct_ID,Census_Tract CSV or tract_cache.json")
+    parser.add_argument("output", nargs="?", default=INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    precinct_tracts = census_geo.load_precinct_tracts(args.source)
+    write_index(precinct_tracts, args.output)
+    print(f"Indexed {len(precinct_tracts)} precincts in {len(set(precinct_tracts.values()))} tracts: {args.output}")
+
+if __name__ == "__main__":
+    main()
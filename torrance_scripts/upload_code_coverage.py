@@ -1,86 +1,133 @@
 from collections import defaultdict
-from datetime import datetime
-
-from datadog_api_client import ApiClient, Configuration
-from datadog_api_client.v2.api.metrics_api import MetricsApi
-from datadog_api_client.v2.model.metric_intake_type import MetricIntakeType
-from datadog_api_client.v2.model.metric_payload import MetricPayload
-from datadog_api_client.v2.model.metric_point import MetricPoint
-from datadog_api_client.v2.model.metric_resource import MetricResource
-from datadog_api_client.v2.model.metric_series import MetricSeries
 
+import argparse
 import json
 import os
+import re
+
+from . import coverage_report
+from . import datadog_client
+from . import datadog_spool
+from . import metrics_cache
+
+def bitrise_tags(scheme):
+    customTags = [
+        f"workflow_name:{os.environ['BITRISE_TRIGGERED_WORKFLOW_TITLE']}",
+        f"branch:{os.environ['BITRISE_GIT_BRANCH']}",
+        f"commit:{os.environ['BITRISE_GIT_COMMIT']}",
+        f"build_number:{os.environ['BITRISE_BUILD_NUMBER']}",
+        f"build_slug:{os.environ['BITRISE_BUILD_SLUG']}",
+        f"trigger_method:{os.environ['BITRISE_TRIGGER_METHOD']}",
+        f"triggered_by:{os.environ['BITRISE_TRIGGER_BY']}",
+        f"app_title:{os.environ['BITRISE_APP_TITLE']}",
+        f"scheme:{scheme}",
+    ]
+
+    try:
+        releaseTag = os.environ['BITRISE_GIT_TAG']
+        customTags.append(f"release_tag:{releaseTag}")
+    except KeyError:
+        print("Release tag not found.")
+
+    return customTags
+
+def total_coverage(totalCoverageReadout):
+    # Using xcresultparser in the previous step, the readout of total coverage is a large string containing extra characters.
+    # Retrieves the actual "total coverage" from it as a single percentage.
+    totalCoverageMatch = (
+        re.search(r":\s*(\d+(?:\.\d+)?)\s*%", totalCoverageReadout)
+        or re.search(r"(\d+(?:\.\d+)?)\s*%", totalCoverageReadout)
+    )
+    if not totalCoverageMatch:
+        raise ValueError(f"No coverage percentage found in TOTAL_COVERAGE_READOUT: {totalCoverageReadout!r}")
+    return float(totalCoverageMatch.group(1))
+
+def upload_code_coverage(currentScheme, reportPath, totalCoverageReadout, customTags, fileCoverageMode="delta", sourceDirectory=""):
+    coverageDict = defaultdict(float)
+
+    coverageDict["TotalCoverage"] = total_coverage(totalCoverageReadout)
+
+    # Per-file coverage
+    # -----------------
+    # "delta" (default) only submits files whose coverage changed since the previous build of this scheme, "all" submits
+    # every file, and "off" only submits target coverage. The previous build's per-file coverage is kept in the metrics
+    # cache directory, see `metrics_cache.py`.
+    previousFileCoveragePath = os.path.join(metrics_cache.CACHE_DIR, f"file_coverage_{currentScheme}.json")
+
+    previousFileCoverage = {}
+    if fileCoverageMode == "delta" and os.path.exists(previousFileCoveragePath):
+        with open(previousFileCoveragePath) as file:
+            previousFileCoverage = json.load(file)
+
+    fileCoverage = {}
+    fileSeries = []
+    # -----------------
+
+    # The report is stream-parsed, see `coverage_report.py`.
+    for kind, target, values in coverage_report.iter_coverage(reportPath):
+        # Malformed entries are skipped, so they don't abort the upload of everything else.
+        if kind == "target":
+            if target is None or values.get("lineCoverage") is None:
+                print(f"Warning: skipping a coverage target without a name or line coverage: {values}")
+                continue
+            coverageDict[target] = values.get("lineCoverage")
+            continue
+
+        if fileCoverageMode == "off":
+            continue
+
+        path = values.get("path") or values.get("name")
+        coverage = values.get("lineCoverage")
+        if path is None or coverage is None:
+            print(f"Warning: skipping a file of target {target} without a path or line coverage: {values}")
+            continue
+        if sourceDirectory and path.startswith(sourceDirectory):
+            path = os.path.relpath(path, sourceDirectory)
+
+        fileCoverage[path] = coverage
+
+        if previousFileCoverage.get(path) == coverage:
+            continue
+
+        fileSeries.append(datadog_client.metric_series(
+            f"mvn.codeCoverage.iOS.{currentScheme}.file",
+            coverage,
+            tags=customTags + [f"target:{target}", f"file:{path}"],
+        ))
+
+    print(f"Submitting coverage for {len(coverageDict)} targets and {len(fileSeries)} of {len(fileCoverage)} files.")
+
+    series = [
+        datadog_client.metric_series(f"mvn.codeCoverage.iOS.{currentScheme}." + target, coverage, tags=customTags)
+        for target, coverage in coverageDict.items()
+    ] + fileSeries
+
+    # Spooled and flushed in the background, see `datadog_spool.py`.
+    datadog_spool.spool_metrics(series)
+
+    if fileCoverageMode != "off":
+        os.makedirs(metrics_cache.CACHE_DIR, exist_ok=True)
+        with open(previousFileCoveragePath, "w") as file:
+            json.dump(fileCoverage, file)
+
+    return coverageDict
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Uploads the code coverage of a Bitrise build to Datadog.")
+    parser.add_argument("--scheme", default=os.environ.get("BITRISE_SCHEME"), help="Defaults to $BITRISE_SCHEME")
+    parser.add_argument("--report", help="xcresultparser JSON report, defaults to <scheme>-coverage-report.json")
+    args = parser.parse_args(argv)
+    if not args.scheme:
+        parser.error("--scheme or BITRISE_SCHEME is required")
+
+    upload_code_coverage(
+        args.scheme,
+        args.report or f"{args.scheme}-coverage-report.json",
+        os.environ['TOTAL_COVERAGE_READOUT'],
+        bitrise_tags(args.scheme),
+        fileCoverageMode=os.environ.get("COVERAGE_FILE_METRICS", "delta"),
+        sourceDirectory=os.environ.get('BITRISE_SOURCE_DIR', ''),
+    )
 
-currentScheme = os.environ['BITRISE_SCHEME']
-currentWorkflow = os.environ['BITRISE_TRIGGERED_WORKFLOW_TITLE']
-currentBranch = os.environ['BITRISE_GIT_BRANCH']
-currentCommit = os.environ['BITRISE_GIT_COMMIT']
-buildNumber = os.environ['BITRISE_BUILD_NUMBER']
-buildSlug = os.environ['BITRISE_BUILD_SLUG']
-triggerMethod = os.environ['BITRISE_TRIGGER_METHOD']
-triggeredBy = os.environ['BITRISE_TRIGGER_BY']
-appTitle = os.environ['BITRISE_APP_TITLE']
-
-customTags = [
-    f"workflow_name:{currentWorkflow}",
-    f"branch:{currentBranch}",
-    f"commit:{currentCommit}",
-    f"build_number:{buildNumber}",
-    f"build_slug:{buildSlug}",
-    f"trigger_method:{triggerMethod}",
-    f"triggered_by:{triggeredBy}",
-    f"app_title:{appTitle}",
-    f"scheme:{currentScheme}",
-]
-
-try:
-    releaseTag = os.environ['BITRISE_GIT_TAG']
-    customTags.append(f"release_tag:{releaseTag}")
-except KeyError:
-    print("Release tag not found.")
-
-# Using xcresultparser in the previous step, the readout of total coverage is a large string containing extra characters.
-# Splits of the larger readout to retrieve the actual "total coverage" as a single percentage.
-totalCoverageReadout = os.environ['TOTAL_COVERAGE_READOUT']
-a, totalCoverageSplit1 = totalCoverageReadout.split(': ', 1)
-totalCoveragePercentage, b = totalCoverageSplit1.split('%', 1)
-
-with open(f"{currentScheme}-coverage-report.json", "r") as file:
-  data = file.read()
-
-targetCoverage = json.loads(data)
-
-coverageDict = defaultdict(float)
-
-coverageDict["TotalCoverage"] = float(totalCoveragePercentage)
-
-for item in targetCoverage:
-    target = item.get("name")
-    coverage = item.get("lineCoverage")
-    coverageDict[target] = coverage
-
-series = [MetricSeries(
-            metric=f"mvn.codeCoverage.iOS.{currentScheme}." + target,
-            type=MetricIntakeType.UNSPECIFIED,
-            points=[
-                MetricPoint(
-                    timestamp=int(datetime.now().timestamp()),
-                    value=coverage,
-                ),
-            ],
-            tags=customTags,
-        ) for target, coverage in coverageDict.items()]
-
-body = MetricPayload(
-    series=series,
-)
-
-configuration = Configuration()
-configuration.api_key["apiKeyAuth"] = os.environ['DATADOG_API_KEY']
-configuration.server_variables["site"] = "datadoghq.com"
-
-with ApiClient(configuration) as api_client:
-    api_instance = MetricsApi(api_client)
-    response = api_instance.submit_metrics(body=body)
-    print(response)
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,73 @@
 from collections import defaultdict
+from functools import partial
 from pathlib import Path
-from datetime import datetime
-
-from datadog_api_client import ApiClient, Configuration
-from datadog_api_client.v2.api.metrics_api import MetricsApi
-from datadog_api_client.v2.model.metric_intake_type import MetricIntakeType
-from datadog_api_client.v2.model.metric_payload import MetricPayload
-from datadog_api_client.v2.model.metric_point import MetricPoint
-from datadog_api_client.v2.model.metric_resource import MetricResource
-from datadog_api_client.v2.model.metric_series import MetricSeries
 
+import argparse
 import os
-import re
-
-designSystemFilesPath = os.path.join(os.environ['BITRISE_SOURCE_DIR'], "Packages/DesignSystem/")
-codeFilesPath = os.environ['BITRISE_SOURCE_DIR']
-excludedDirectory = os.path.join(os.environ['BITRISE_SOURCE_DIR'], "Maven/_CORE/_UTILITIES/_PLAYBOOK")
 
-designSystemFiles = list(Path(designSystemFilesPath).rglob("*.swift"))
-codeFiles = list(Path(codeFilesPath).rglob("*.swift"))
-excludedFiles = list(Path(excludedDirectory).rglob("*.swift"))
+from . import datadog_client
+from . import datadog_spool
+from . import metrics_cache
+from . import swift_metrics
 
-pattern = re.compile(": View {")
-designSystemObjects = []
-for file in designSystemFiles:
-    for i, line in enumerate(open(file)):
-        for match in re.finditer(pattern, line):
-            designSystemObjects.append(file.stem)
+def design_system_usages(codeFilesPath):
+    """Returns {dso: number of usages} for every design system component, plus the "total"."""
+    designSystemFilesPath = os.path.join(codeFilesPath, "Packages/DesignSystem/")
+    excludedDirectory = os.path.join(codeFilesPath, "Maven/_CORE/_UTILITIES/_PLAYBOOK")
 
-for file in excludedFiles:
-    codeFiles.remove(file)
+    designSystemFiles = list(Path(designSystemFilesPath).rglob("*.swift"))
+    codeFiles = list(Path(codeFilesPath).rglob("*.swift"))
+    excludedFiles = list(Path(excludedDirectory).rglob("*.swift"))
 
-for file in designSystemFiles:
-    codeFiles.remove(file)
+    designSystemObjects = swift_metrics.design_system_objects(designSystemFiles)
 
-usageResults = defaultdict(list)
-for dso in designSystemObjects:
-    functions_pattern = '|'.join(re.escape(func) for func in [dso])
+    # The playbook and the design system itself don't count as usages.
+    ignoredFiles = set(excludedFiles) | set(designSystemFiles)
+    codeFiles = [file for file in codeFiles if file not in ignoredFiles]
 
-    pattern = fr'\s+{dso}\('
+    # Finds the design system usages in every code file, in parallel and cached per file content between builds, see
+    # `swift_metrics.py` and `metrics_cache.py`.
+    scanFile = partial(swift_metrics.scan_design_usages, design_system_objects=designSystemObjects)
+    scanResults = metrics_cache.cached_scan("design_analytics", codeFilesPath, codeFiles, scanFile, context=(swift_metrics.SCAN_VERSION, designSystemObjects))
 
-    usageResults[dso] = list()
+    usageResults = defaultdict(list)
+    for dso in designSystemObjects:
+        usageResults[dso] = list()
     for file in codeFiles:
-        for i, line in enumerate(open(file)):
-            if re.search(pattern, line):
+        for dso, usages in scanResults[file].items():
+            for i, line in usages:
                 usageResults[dso].append(str(file) + ":" + str(i) + " == " + line)
 
-usageCounter = defaultdict(int)
-series = []
-total = 0
-for key in usageResults.keys():
-    count = len(usageResults[key])
-    total += count
-    usageCounter[key] = count
-
-usageCounter["total"] = total
-
-series = [MetricSeries(
-            metric="designSystemUsage.iOS."+key,
-            type=MetricIntakeType.UNSPECIFIED,
-            points=[
-                MetricPoint(
-                    timestamp=int(datetime.now().timestamp()),
-                    value=count,
-                ),
-            ],
-            resources=[
-                MetricResource(
-                    name="dummyhost",
-                    type="host",
-                ),
-            ],
-        ) for key, count in usageCounter.items()]
-
-body = MetricPayload(
-    series=series,
-)
-
-configuration = Configuration()
-configuration.api_key["apiKeyAuth"] = os.environ['DATADOG_API_KEY']
-configuration.server_variables["site"] = "datadoghq.com"
-
-with ApiClient(configuration) as api_client:
-    api_instance = MetricsApi(api_client)
-    response = api_instance.submit_metrics(body=body)
+    usageCounter = defaultdict(int)
+    total = 0
+    for key in usageResults.keys():
+        count = len(usageResults[key])
+        total += count
+        usageCounter[key] = count
+
+    usageCounter["total"] = total
+    return usageCounter
+
+def upload_design_analytics(codeFilesPath):
+    usageCounter = design_system_usages(codeFilesPath)
+
+    series = [
+        datadog_client.metric_series("designSystemUsage.iOS." + key, count, resources=[("dummyhost", "host")])
+        for key, count in usageCounter.items()
+    ]
+
+    # Spooled and flushed in the background, see `datadog_spool.py`.
+    datadog_spool.spool_metrics(series)
+    return usageCounter
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Uploads the design system component usages of the iOS project to Datadog.")
+    parser.add_argument("--project-dir", default=os.environ.get("BITRISE_SOURCE_DIR"), help="Defaults to $BITRISE_SOURCE_DIR")
+    args = parser.parse_args(argv)
+    if not args.project_dir:
+        parser.error("--project-dir or BITRISE_SOURCE_DIR is required")
+
+    upload_design_analytics(args.project_dir)
+
+if __name__ == "__main__":
+    main()